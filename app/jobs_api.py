@@ -3,17 +3,25 @@ import datetime as dt
 import json
 import os
 import uuid
-from typing import Any, Dict, Optional
+from itertools import islice
+from typing import Any, Dict, Iterator, Optional
 
-from fastapi import APIRouter, File, HTTPException, UploadFile
-from google.cloud import firestore
-from google.cloud import pubsub_v1
-from google.cloud import storage
+from fastapi import APIRouter, File, Form, HTTPException, Request, UploadFile
+from google.api_core.exceptions import FailedPrecondition
+from fastapi.responses import StreamingResponse
+
+from shared.cancellation import CANCEL_FIELD
+from shared.cloud_clients import GCP_PROJECT_ID, get_firestore, get_publisher, get_storage
+from shared.export import CONTENT_TYPES, WRITERS, gzip_chunks, ndjson_chunks
+from shared.metrics import BYTES_UPLOADED, JOBS_TOTAL, in_flight
+from shared.result_blob import open_result_blob
+from shared.result_sink import iter_job_results
 
 # --- Config (задано пользователем) ---
-GCP_PROJECT_ID = "project-d245d8c8-8548-47d2-a04"
 PUBSUB_TOPIC = "ocr-jobs"
 UPLOAD_BUCKET = "ocr-checker-uploads-1018698441568"
+# Попыток отмены, если документ job'а меняется между чтением и записью
+CANCEL_ATTEMPTS = 3
 
 # GCS layout
 def job_gcs_path(job_id: str) -> str:
@@ -22,10 +30,10 @@ def job_gcs_path(job_id: str) -> str:
 
 router = APIRouter()
 
-db = firestore.Client(project=GCP_PROJECT_ID)
-publisher = pubsub_v1.PublisherClient()
-topic_path = publisher.topic_path(GCP_PROJECT_ID, PUBSUB_TOPIC)
-gcs = storage.Client(project=GCP_PROJECT_ID)
+# Клиенты создаются лениво (shared/cloud_clients.py): холодный старт не платит за них,
+# а отсутствие credentials не роняет контейнер при старте.
+def topic_path() -> str:
+    return get_publisher().topic_path(GCP_PROJECT_ID, PUBSUB_TOPIC)
 
 
 def _now_iso() -> str:
@@ -33,7 +41,12 @@ def _now_iso() -> str:
 
 
 @router.post("/jobs")
-async def create_job(zip_file: UploadFile = File(...)) -> Dict[str, Any]:
+async def create_job(
+    zip_file: UploadFile = File(...),
+    ocr_budget: Optional[int] = Form(None),
+    sample_seed: Optional[int] = Form(None),
+    base_job_id: Optional[str] = Form(None),
+) -> Dict[str, Any]:
     if not zip_file.filename:
         raise HTTPException(status_code=400, detail="Missing filename")
 
@@ -41,12 +54,16 @@ async def create_job(zip_file: UploadFile = File(...)) -> Dict[str, Any]:
     if not zip_file.filename.lower().endswith(".zip"):
         raise HTTPException(status_code=400, detail="Only .zip is supported for now")
 
+    # Инкрементальная перепроверка: неизменённые картинки берутся из результата base job
+    if base_job_id and not get_firestore().collection("jobs").document(base_job_id).get().exists:
+        raise HTTPException(status_code=404, detail="Base job not found")
+
     job_id = str(uuid.uuid4())
     gcs_object = job_gcs_path(job_id)
     gcs_uri = f"gs://{UPLOAD_BUCKET}/{gcs_object}"
 
     # 1) Создать job в Firestore
-    db.collection("jobs").document(job_id).set(
+    get_firestore().collection("jobs").document(job_id).set(
         {
             "job_id": job_id,
             "status": "PENDING",
@@ -56,25 +73,35 @@ async def create_job(zip_file: UploadFile = File(...)) -> Dict[str, Any]:
             "updated_at": _now_iso(),
             "error": None,
             "result": None,
+            "base_job_id": base_job_id or None,
         }
     )
 
     # 2) Загрузить ZIP в GCS (стриминг чанками → без загрузки целиком в память)
-    bucket = gcs.bucket(UPLOAD_BUCKET)
+    bucket = get_storage().bucket(UPLOAD_BUCKET)
     blob = bucket.blob(gcs_object)
 
     # Важно: blob.open("wb") поддерживает потоковую запись
-    with blob.open("wb") as f:
+    with in_flight("uploads"), blob.open("wb") as f:
         while True:
             chunk = await zip_file.read(1024 * 1024)  # 1MB
             if not chunk:
                 break
             f.write(chunk)
+            BYTES_UPLOADED.inc(len(chunk))
 
     # 3) Publish в Pub/Sub
     msg = {"job_id": job_id, "gcs_uri": gcs_uri}
-    future = publisher.publish(topic_path, json.dumps(msg).encode("utf-8"))
+    # Переопределения бюджета OCR на этот job (иначе воркер берёт OCR_BUDGET_PER_JOB)
+    if ocr_budget is not None:
+        msg["ocr_budget"] = ocr_budget
+    if sample_seed is not None:
+        msg["sample_seed"] = sample_seed
+    if base_job_id:
+        msg["base_job_id"] = base_job_id
+    future = get_publisher().publish(topic_path(), json.dumps(msg).encode("utf-8"))
     future.result()
+    JOBS_TOTAL.labels(status="PENDING").inc()
 
     return {"job_id": job_id}
 
@@ -82,7 +109,93 @@ async def create_job(zip_file: UploadFile = File(...)) -> Dict[str, Any]:
 
 @router.get("/jobs/{job_id}")
 def get_job(job_id: str) -> Dict[str, Any]:
-    doc = db.collection("jobs").document(job_id).get()
+    doc = get_firestore().collection("jobs").document(job_id).get()
     if not doc.exists:
         raise HTTPException(status_code=404, detail="Job not found")
     return doc.to_dict()  # формат согласован вами
+
+
+def _job_document(job_id: str) -> Dict[str, Any]:
+    doc = get_firestore().collection("jobs").document(job_id).get()
+    if not doc.exists:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return doc.to_dict() or {}
+
+
+@router.post("/jobs/{job_id}:cancel")
+def cancel_job(job_id: str) -> Dict[str, Any]:
+    """Request cancellation; a running job stops at the worker's next checkpoint."""
+    firestore = get_firestore()
+    ref = firestore.collection("jobs").document(job_id)
+    for _ in range(CANCEL_ATTEMPTS):
+        snapshot = ref.get()
+        if not snapshot.exists:
+            raise HTTPException(status_code=404, detail="Job not found")
+        status = (snapshot.to_dict() or {}).get("status")
+        if status in ("DONE", "FAILED"):
+            raise HTTPException(status_code=409, detail=f"Job is already {status}")
+
+        fields = {CANCEL_FIELD: True, "updated_at": _now_iso()}
+        # Воркер ещё не взял job — он увидит флаг и не станет его запускать
+        if status == "PENDING":
+            fields["status"] = status = "CANCELLED"
+        # Пишем, только если документ не менялся с чтения: иначе воркер мог успеть
+        # перевести job в DONE/FAILED, и CANCELLED затёр бы итог — перечитываем
+        try:
+            ref.update(fields, option=firestore.write_option(last_update_time=snapshot.update_time))
+        except FailedPrecondition:
+            continue
+        return {"job_id": job_id, "status": status, CANCEL_FIELD: True}
+    raise HTTPException(status_code=409, detail="Job is being updated concurrently, retry the cancel")
+
+
+def _stored_results(
+    job_id: str, job: Dict[str, Any], offset: int = 0, limit: Optional[int] = None
+) -> Iterator[Dict[str, Any]]:
+    stop = None if limit is None else offset + limit
+    pointer = (job.get("result") or {}).get("results_blob")
+    if pointer:
+        # Большие job'ы: читаются только чанки blob'а, попавшие в страницу
+        yield from open_result_blob(pointer).iter_rows(offset, stop)
+        return
+    yield from islice(_document_results(job_id, job), offset, stop)
+
+
+def _document_results(job_id: str, job: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    results = iter_job_results(job_id)
+    first = next(results, None)
+    if first is None:
+        # Старые job'ы хранили результаты только в документе job
+        yield from ((job.get("result") or {}).get("results") or {}).values()
+        return
+    yield first
+    yield from results
+
+
+@router.get("/jobs/{job_id}/results")
+def get_job_results(job_id: str, offset: int = 0, limit: Optional[int] = None) -> StreamingResponse:
+    """Per-image results as NDJSON, in archive order; `offset`/`limit` select a page."""
+    if offset < 0 or (limit is not None and limit < 0):
+        raise HTTPException(status_code=400, detail="offset and limit must be non-negative")
+    job = _job_document(job_id)
+    rows = _stored_results(job_id, job, offset, limit)
+    return StreamingResponse(ndjson_chunks(rows), media_type=CONTENT_TYPES["ndjson"])
+
+
+@router.get("/jobs/{job_id}/export")
+def export_job(job_id: str, request: Request, format: str = "csv") -> StreamingResponse:
+    """Report of a finished job as csv | ndjson | xlsx, streamed row by row (gzip if accepted)."""
+    if format not in WRITERS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format: {format}")
+    job = _job_document(job_id)
+    if job.get("status") != "DONE":
+        raise HTTPException(status_code=409, detail=f"Job is {job.get('status')}, not DONE")
+
+    chunks = WRITERS[format](_stored_results(job_id, job))
+    headers = {"Content-Disposition": f'attachment; filename="{job_id}.{format}"'}
+    # XLSX уже сжат (zip) — повторно не жмём
+    if format != "xlsx" and "gzip" in request.headers.get("accept-encoding", ""):
+        chunks = gzip_chunks(chunks)
+        headers["Content-Encoding"] = "gzip"
+        headers["Vary"] = "Accept-Encoding"
+    return StreamingResponse(chunks, media_type=CONTENT_TYPES[format], headers=headers)
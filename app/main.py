@@ -1,25 +1,45 @@
+import asyncio
+import hashlib
 import tempfile
 import os
 import shutil
 from pathlib import Path
 from typing import Optional
 
-from fastapi import FastAPI, UploadFile, File, Request, Form
-from fastapi.responses import HTMLResponse
+import jinja2
+
+from fastapi import FastAPI, UploadFile, File, Request, Form, HTTPException
+from fastapi.responses import HTMLResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
 
-from zip_processor import parse_zip_streaming
-from app.ocr import process_image
-from worker.normalization import normalize_strict, normalize_soft
+from zip_processor import ArchiveLimitError, parse_zip_streaming
+from app.ocr import process_image_async
+from worker.normalization import normalize_soft_cached, normalize_strict_cached
 from shared.docx_section_extractor import extract_section_candidates
 from shared.reference_matcher import select_best_section
+from shared.admission import AdmissionController, AdmissionMiddleware
+from shared.metrics import BYTES_UPLOADED, IMAGES_PROCESSED, IN_FLIGHT, metrics_response
+from shared.result_sink import ResultAggregates
+from shared.sampling import SamplingConfig, plan_sample
 
 # --- Определяем базовую директорию и шаблоны ---
 BASE_DIR = Path(__file__).resolve().parent
 templates = Jinja2Templates(directory=str(BASE_DIR / "templates"))
+# Тот же каталог шаблонов в async-режиме: страница результатов рендерится потоково
+stream_templates = Jinja2Templates(
+    env=jinja2.Environment(loader=jinja2.FileSystemLoader(str(BASE_DIR / "templates")), autoescape=True, enable_async=True)
+)
+
+# Сколько картинок синхронного UI обрабатывается параллельно (OCR + матчинг)
+UI_CONCURRENCY = int(os.environ.get("UI_CONCURRENCY", "4"))
 
 app = FastAPI()
 
+# Лимиты на загрузки (одновременные, байты в полёте, частота на клиента, размер архива):
+# проверяются до того, как Starlette начнёт складывать multipart во временный файл
+admission = AdmissionController()
+app.add_middleware(AdmissionMiddleware, routes={("POST", "/"), ("POST", "/jobs")}, controller=admission)
+
 from app.jobs_api import router as jobs_router
 app.include_router(jobs_router)
 
@@ -29,6 +49,118 @@ async def index(request: Request):
     return templates.TemplateResponse("index.html", {"request": request})
 
 
+@app.get("/metrics")
+def metrics():
+    return metrics_response()
+
+
+def _docx_filename(img_path: str) -> str:
+    # img_path format: "images/banner_01_(en).png"
+    # ref_path format: "texts/banner_01_(en).docx"
+    ref_path = img_path.replace("images/", "texts/").rsplit(".", 1)[0]
+    return os.path.basename(ref_path + ".docx")
+
+
+def _check_one(img_path, ocr_text, ref_text, candidates, section_number, section_name, ui_warnings) -> dict:
+    """Compare one OCR text with the best matching section (CPU part, runs in a thread)."""
+    if candidates:
+        selection = select_best_section(
+            ocr_text=ocr_text,
+            candidates=candidates,
+            normalize_strict_fn=normalize_strict_cached,
+            normalize_soft_fn=normalize_soft_cached,
+            section_number=section_number.strip() if section_number else None,
+            section_name=section_name.strip() if section_name else None,
+        )
+
+        selected_ref_text = selection.chosen_text
+        is_match = normalize_strict_cached(ocr_text) == normalize_strict_cached(selected_ref_text)
+
+        # Collect warnings
+        if selection.warnings:
+            ui_warnings.extend(selection.warnings)
+
+        # Status based on manual_required flag
+        status = "✅ PASS" if is_match and not selection.manual_required else "❓ MANUAL"
+
+        result = {
+            "image": img_path,
+            "reference": selected_ref_text,
+            "ocr": ocr_text,
+            "match": is_match,
+            "status": status,
+            "selection": selection.to_dict(),
+        }
+    else:
+        # Fallback to old behavior
+        is_match = ocr_text.strip() == ref_text.strip()
+        result = {
+            "image": img_path,
+            "reference": ref_text,
+            "ocr": ocr_text,
+            "match": is_match,
+            "status": "✅ PASS" if is_match else "❓ MANUAL",
+            "selection": {
+                "manual_required": not is_match,
+            },
+        }
+
+    manual = result["selection"].get("manual_required", False)
+    IMAGES_PROCESSED.labels(outcome="pass" if result["match"] and not manual else "manual").inc()
+    return result
+
+
+async def _completed(items, fn, limit: int):
+    """Yield fn(item) results as they finish, with at most `limit` in flight."""
+    items = iter(items)
+    pending = set()
+    try:
+        while True:
+            for item in items:
+                pending.add(asyncio.ensure_future(fn(item)))
+                if len(pending) >= limit:
+                    break
+            if not pending:
+                return
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result()
+    finally:
+        # клиент ушёл / ошибка: не оставляем висящих задач
+        for task in pending:
+            task.cancel()
+
+
+class _CleanupStreamingResponse(StreamingResponse):
+    """StreamingResponse that runs `cleanup` however the response ends.
+
+    If the client is gone before the first chunk, the body generator is never
+    started and its own finally never runs.
+    """
+
+    def __init__(self, content, cleanup, **kwargs):
+        super().__init__(content, **kwargs)
+        self._cleanup = cleanup
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self._cleanup()
+
+
+async def _flush_rows(pieces):
+    """Coalesce Jinja output into one chunk per table row (plus the page head)."""
+    buf = []
+    async for piece in pieces:
+        buf.append(piece)
+        if "</tr>" in piece or "<tbody>" in piece:
+            yield "".join(buf)
+            buf = []
+    if buf:
+        yield "".join(buf)
+
+
 @app.post("/", response_class=HTMLResponse)
 async def upload_zip(
     request: Request, 
@@ -38,6 +170,23 @@ async def upload_zip(
 ):
     tmp_path = None
     work_dir = None
+    uploads_in_flight = IN_FLIGHT.labels(kind="sync_uploads")
+    uploads_in_flight.inc()
+
+    cleaned = False
+
+    def cleanup():
+        # Вызывается и из body(), и самим ответом (см. _CleanupStreamingResponse) — срабатывает один раз
+        nonlocal cleaned
+        if cleaned:
+            return
+        cleaned = True
+        uploads_in_flight.dec()
+        # Гарантированно чистим временный ZIP и распакованные картинки
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        if work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
 
     try:
         # 1. Пишем ZIP во временный файл, НЕ в память
@@ -49,103 +198,84 @@ async def upload_zip(
                 if not chunk:
                     break
                 tmp.write(chunk)
+                BYTES_UPLOADED.inc(len(chunk))
 
             tmp.flush()
 
-        # 2. Стриминговый парсинг ZIP (extended mode)
-        matches, work_dir = parse_zip_streaming(tmp_path, return_work_dir=True, return_extended=True)
-
-        results = {}
-        ui_warnings = []
-
-        # Ограничиваемся первыми 10 файлами для теста / снижения нагрузки
-        for img_path, img_file_path, ref_text, ref_bytes, language in list(matches)[:10]:
-            with open(img_file_path, "rb") as f:
-                img_bytes = f.read()
-
-            # 1. Extract OCR text
-            ocr_text = process_image(img_bytes)
-            
-            # Derive DOCX filename from img_path
-            # img_path format: "images/banner_01_(en).png"
-            # ref_path format: "texts/banner_01_(en).docx"
-            ref_path = img_path.replace("images/", "texts/").rsplit(".", 1)[0]
-            docx_filename = os.path.basename(ref_path + ".docx")
-            
-            # 2. Extract section candidates from reference DOCX
-            candidates = []
-            if ref_bytes and ref_bytes[:2] == b'PK':  # Check if it's a ZIP/DOCX
-                try:
-                    candidates = extract_section_candidates(ref_bytes, docx_filename, language)
-                except Exception as e:
-                    ui_warnings.append(f"Failed to extract sections from {docx_filename}: {str(e)}")
-            
-            # 3. Select best section
-            if candidates:
-                selection = select_best_section(
-                    ocr_text=ocr_text,
-                    candidates=candidates,
-                    normalize_strict_fn=normalize_strict,
-                    normalize_soft_fn=normalize_soft,
-                    section_number=section_number.strip() if section_number else None,
-                    section_name=section_name.strip() if section_name else None,
-                )
-                
-                selected_ref_text = selection.chosen_text
-                is_match = normalize_strict(ocr_text) == normalize_strict(selected_ref_text)
-                
-                # Collect warnings
-                if selection.warnings:
-                    ui_warnings.extend(selection.warnings)
-                
-                # Status based on manual_required flag
-                status = "✅ PASS" if is_match and not selection.manual_required else "❓ MANUAL"
-                
-                results[img_path] = {
-                    "image": img_path,
-                    "reference": selected_ref_text,
-                    "ocr": ocr_text,
-                    "match": is_match,
-                    "status": status,
-                    "selection": selection.to_dict(),
-                }
-            else:
-                # Fallback to old behavior
-                is_match = ocr_text.strip() == ref_text.strip()
-                results[img_path] = {
-                    "image": img_path,
-                    "reference": ref_text,
-                    "ocr": ocr_text,
-                    "match": is_match,
-                    "status": "✅ PASS" if is_match else "❓ MANUAL",
-                    "selection": {
-                        "manual_required": not is_match,
-                    },
-                }
-
-        total = len(matches)
-        # Count manual_required from selection metadata
-        manual_count = sum(
-            1 for r in results.values()
-            if r.get("selection", {}).get("manual_required", False)
+        # 2. Стриминговый парсинг ZIP (extended mode) — в потоке, event loop не блокируем
+        matches, work_dir = await asyncio.to_thread(
+            parse_zip_streaming, tmp_path, return_work_dir=True, return_extended=True
         )
+    except ArchiveLimitError as e:
+        # Zip-bomb / слишком большой архив: понятная причина вместо 500
+        cleanup()
+        raise HTTPException(status_code=413, detail=str(e))
+    except BaseException:
+        cleanup()
+        raise
 
-        return templates.TemplateResponse(
-            "index.html",
-            {
-                "request": request,
-                "results": results,
-                "total_files": total,
-                "manual_count": manual_count,
-                "warnings": ui_warnings,
-                "section_number": section_number,
-                "section_name": section_name,
-            },
+    ui_warnings = []
+    summary = ResultAggregates()
+    # Бюджет OCR: стратифицированная выборка по языку/референсу вместо первых 10 файлов
+    plan = plan_sample(matches, SamplingConfig.from_env())
+    references = {}  # sha256 DOCX -> Task со списком секций (разбираем один раз на запрос)
+
+    def parse_reference(ref_bytes, docx_filename, language):
+        try:
+            return extract_section_candidates(ref_bytes, docx_filename, language)
+        except Exception as e:
+            ui_warnings.append(f"Failed to extract sections from {docx_filename}: {str(e)}")
+            return []
+
+    async def check(match):
+        img_path, img_file_path, ref_text, ref_bytes, language = match
+        img_bytes = await asyncio.to_thread(Path(img_file_path).read_bytes)
+
+        # 1. Extract OCR text
+        ocr_text = await process_image_async(img_bytes)
+
+        # 2. Extract section candidates from reference DOCX
+        candidates = []
+        if ref_bytes and ref_bytes[:2] == b'PK':  # Check if it's a ZIP/DOCX
+            key = hashlib.sha256(ref_bytes).hexdigest()
+            if key not in references:
+                references[key] = asyncio.ensure_future(
+                    asyncio.to_thread(parse_reference, ref_bytes, _docx_filename(img_path), language)
+                )
+            candidates = await references[key]
+
+        # 3. Select best section
+        return await asyncio.to_thread(
+            _check_one, img_path, ocr_text, ref_text, candidates, section_number, section_name, ui_warnings
         )
 
-    finally:
-        # 3. Гарантированно чистим временный ZIP
-        if tmp_path and os.path.exists(tmp_path):
-            os.remove(tmp_path)
-        if work_dir:
-            shutil.rmtree(work_dir, ignore_errors=True)
+    async def rows():
+        # Строки уходят клиенту по мере готовности картинок (порядок завершения)
+        sample = ResultAggregates()
+        async for result in _completed([matches[pos] for pos in plan.selected], check, UI_CONCURRENCY):
+            sample.add(result)
+            summary.add(result)
+            yield result
+        if plan.decide_escalation(sample):
+            async for result in _completed([matches[pos] for pos in plan.skipped], check, UI_CONCURRENCY):
+                summary.add(result)
+                yield result
+
+    async def body():
+        try:
+            page = stream_templates.get_template("index.html").generate_async(
+                request=request,
+                results=rows(),
+                summary=summary,
+                total_files=len(matches),
+                ui_warnings=ui_warnings,
+                section_number=section_number,
+                section_name=section_name,
+                sampling=plan,
+            )
+            async for chunk in _flush_rows(page):
+                yield chunk
+        finally:
+            cleanup()
+
+    return _CleanupStreamingResponse(body(), cleanup, media_type="text/html; charset=utf-8")
@@ -1,16 +1,38 @@
-from google.cloud import vision
+from typing import List, Sequence
 
+from shared.metrics import OCR_ERRORS, observe_ocr
+from shared.ocr_backends import VISION_ERROR_PREFIX, get_ocr_backend
+from shared.tracing import span, traced
 
+
+def _count_api_errors(backend_name: str, texts: Sequence[str]) -> None:
+    errors = sum(1 for t in texts if t.startswith(VISION_ERROR_PREFIX))
+    if errors:
+        OCR_ERRORS.labels(backend=backend_name).inc(errors)
+
+
+@traced("ocr")
 def process_image(image_bytes: bytes) -> str:
-    client = vision.ImageAnnotatorClient()
-    image = vision.Image(content=image_bytes)
-    response = client.text_detection(image=image)
+    # Движок выбирается через OCR_BACKEND (vision по умолчанию), см. shared/ocr_backends.py
+    backend = get_ocr_backend()
+    with observe_ocr(backend.name):
+        text = backend.recognize(image_bytes)
+    _count_api_errors(backend.name, [text])
+    return text
+
 
-    if response.error.message:
-        # В проде — логировать; для новичка — вернуть текст ошибки
-        return f"Vision API error: {response.error.message}"
+@traced("ocr_batch")
+def process_images(images: Sequence[bytes]) -> List[str]:
+    backend = get_ocr_backend()
+    with observe_ocr(backend.name):
+        texts = backend.recognize_batch(images)
+    _count_api_errors(backend.name, texts)
+    return texts
 
-    if not response.text_annotations:
-        return "No text detected."
 
-    return response.text_annotations[0].description
+async def process_image_async(image_bytes: bytes) -> str:
+    backend = get_ocr_backend()
+    with span("ocr"), observe_ocr(backend.name):
+        text = await backend.recognize_async(image_bytes)
+    _count_api_errors(backend.name, [text])
+    return text
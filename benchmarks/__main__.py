@@ -0,0 +1,51 @@
+"""
+Run the micro-benchmarks.
+
+    python -m benchmarks                      # run and print
+    python -m benchmarks --compare            # fail (exit 1) on regressions vs baselines.json
+    python -m benchmarks --save               # record/refresh baselines.json
+    python -m benchmarks -k 'select_best*'    # subset by glob
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+
+from benchmarks import core
+from benchmarks import bench_hot_paths  # noqa: F401  (registers benchmarks)
+
+
+def main(argv=None) -> int:
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("-k", "--filter", default="*", help="glob over benchmark names")
+    p.add_argument("--compare", action="store_true", help="compare with baselines and fail on regressions")
+    p.add_argument("--save", action="store_true", help="write results into baselines.json")
+    p.add_argument("--threshold", type=float, default=core.DEFAULT_THRESHOLD)
+    p.add_argument("--rounds", type=int, default=5)
+    p.add_argument("--min-time", type=float, default=0.2, help="seconds per timing round")
+    args = p.parse_args(argv)
+
+    report = core.run(args.filter, rounds=args.rounds, min_time=args.min_time)
+
+    if args.save:
+        core.save_baselines(report)
+        print(f"Baselines written to {core.BASELINES_PATH}")
+
+    if args.compare:
+        baseline = core.load_baselines()
+        if baseline is None:
+            print("No baselines.json yet; run with --save first", file=sys.stderr)
+            return 2
+        regressions = core.compare(report, baseline, threshold=args.threshold)
+        if regressions:
+            print("\nREGRESSIONS:", file=sys.stderr)
+            for line in regressions:
+                print(f"  {line}", file=sys.stderr)
+            return 1
+        print("\nNo regressions.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
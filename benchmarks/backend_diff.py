@@ -0,0 +1,99 @@
+"""
+Decision differences between similarity backends on the benchmark corpus.
+
+Runs select_best_section over OCR-like variants of every fixture section
+(see benchmarks.recall.ocr_variants) once per backend and reports where the
+chosen section or the MANUAL decision differ.
+
+    python -m benchmarks.backend_diff
+    python -m benchmarks.backend_diff --json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import time
+from typing import Dict, List, Tuple
+
+from benchmarks import fixtures
+from benchmarks.recall import ocr_variants
+from shared.reference_matcher import select_best_sections_batch
+from shared.similarity import BACKENDS, set_similarity_backend
+from worker.normalization import normalize_soft_cached, normalize_strict_cached
+
+# (section count, language, stride)
+CORPUS: List[Tuple[int, str, int]] = [
+    (100, "en", 2), (100, "de", 2), (100, "he", 2), (100, "ja", 2), (100, "zh-Hans", 2), (500, "en", 25),
+]
+
+
+def _decisions(backend_name: str, cands, ocrs):
+    set_similarity_backend(BACKENDS[backend_name]())
+    try:
+        started = time.perf_counter()
+        results = select_best_sections_batch(ocrs, cands, normalize_strict_cached, normalize_soft_cached)
+        return results, time.perf_counter() - started
+    finally:
+        set_similarity_backend(None)
+
+
+def compare(baseline: str = "sequencematcher", other: str = "levenshtein") -> List[Dict[str, object]]:
+    reports = []
+    for count, language, stride in CORPUS:
+        cands = fixtures.candidates(count, language)
+        rng = random.Random(count)
+        labels, ocrs = [], []
+        for pos in range(0, count, stride):
+            for kind, ocr in ocr_variants(cands[pos].content_text, rng):
+                labels.append((pos, kind))
+                ocrs.append(ocr)
+        base, base_s = _decisions(baseline, cands, ocrs)
+        alt, alt_s = _decisions(other, cands, ocrs)
+
+        chosen_diff, manual_diff, own_hits = [], [], {baseline: 0, other: 0}
+        for (pos, kind), a, b in zip(labels, base, alt):
+            own_hits[baseline] += a.chosen_section is cands[pos]
+            own_hits[other] += b.chosen_section is cands[pos]
+            if a.chosen_section is not b.chosen_section:
+                chosen_diff.append(f"{pos}:{kind}")
+            if a.manual_required != b.manual_required:
+                manual_diff.append(f"{pos}:{kind}")
+        reports.append({
+            "fixture": f"{language}_{count}",
+            "queries": len(ocrs),
+            "chosen_differs": len(chosen_diff),
+            "manual_differs": len(manual_diff),
+            # how often each backend picked the section the OCR text was derived from
+            "source_section_hits": own_hits,
+            "seconds": {baseline: round(base_s, 3), other: round(alt_s, 3)},
+            "examples": chosen_diff[:10],
+        })
+    return reports
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.backend_diff", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--baseline", default="sequencematcher", choices=sorted(BACKENDS))
+    parser.add_argument("--other", default="levenshtein", choices=sorted(BACKENDS))
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args(argv)
+
+    reports = compare(args.baseline, args.other)
+    if args.json:
+        print(json.dumps(reports, indent=2))
+        return 0
+    for r in reports:
+        hits = r["source_section_hits"]
+        print(
+            f"{r['fixture']:<12} queries={r['queries']:<4} chosen_differs={r['chosen_differs']:<4} "
+            f"manual_differs={r['manual_differs']:<4} source_hits "
+            + " ".join(f"{k}={v}" for k, v in hits.items())
+            + "  time " + " ".join(f"{k}={v}s" for k, v in r["seconds"].items())
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
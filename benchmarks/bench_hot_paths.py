@@ -0,0 +1,131 @@
+"""
+Benchmarks for the matching hot paths: normalization, DOCX extraction, selection.
+"""
+
+from __future__ import annotations
+
+from benchmarks import fixtures
+from benchmarks.core import benchmark
+from shared.candidate_index import CandidateIndex
+from shared.docx_section_extractor import extract_section_candidates
+from shared.reference_matcher import select_best_section, select_best_sections_batch
+from shared.similarity import LevenshteinBackend, SequenceMatcherBackend
+from worker.normalization import (
+    _both_uncached,
+    normalize_batch,
+    normalize_cache_clear,
+    normalize_soft,
+    normalize_soft_cached,
+    normalize_strict,
+    normalize_strict_cached,
+)
+
+
+def _normalize_setup(fn, key):
+    text = fixtures.TEXTS[key]
+    return lambda: fn(text)
+
+
+for _key in fixtures.TEXTS:
+    benchmark(f"normalize_strict[{_key}]", "normalization")(
+        lambda key=_key: _normalize_setup(normalize_strict, key)
+    )
+    benchmark(f"normalize_soft[{_key}]", "normalization")(
+        lambda key=_key: _normalize_setup(normalize_soft, key)
+    )
+    benchmark(f"normalize_both_uncached[{_key}]", "normalization")(
+        lambda key=_key: _normalize_setup(_both_uncached, key)
+    )
+
+
+@benchmark("normalize_batch[candidates_100_warm]", "normalization")
+def _normalize_batch_warm():
+    texts = [c.content_text for c in fixtures.candidates(100)]
+    normalize_batch(texts, "both")
+    return lambda: normalize_batch(texts, "both")
+
+
+@benchmark("extract_section_candidates[paragraphs_30]", "extraction")
+def _extract_paragraphs():
+    data = fixtures.paragraph_docx(30)
+    return lambda: extract_section_candidates(data, "campaign_(en).docx", "en")
+
+
+@benchmark("extract_section_candidates[paragraphs_30_ja]", "extraction")
+def _extract_paragraphs_ja():
+    data = fixtures.paragraph_docx(30, "ja")
+    return lambda: extract_section_candidates(data, "campaign_(ja).docx", "ja")
+
+
+@benchmark("extract_section_candidates[table_80]", "extraction")
+def _extract_table():
+    data = fixtures.table_docx(80)
+    return lambda: extract_section_candidates(data, "brief_(en).docx", "en")
+
+
+def _select_setup(count: int, language: str = "en", cached: bool = False, indexed: bool = False):
+    cands = fixtures.candidates(count, language)
+    ocr = fixtures.ocr_for(cands, count // 2)
+    strict_fn, soft_fn = (normalize_strict_cached, normalize_soft_cached) if cached else (normalize_strict, normalize_soft)
+    normalize_cache_clear()
+    index = CandidateIndex(cands, soft_fn) if indexed else None
+    return lambda: select_best_section(
+        ocr_text=ocr,
+        candidates=cands,
+        normalize_strict_fn=strict_fn,
+        normalize_soft_fn=soft_fn,
+        candidate_index=index,
+    )
+
+
+for _count in (1, 10, 100, 500):
+    benchmark(f"select_best_section[{_count}]", "matching")(lambda count=_count: _select_setup(count))
+
+benchmark("select_best_section[100_ja]", "matching")(lambda: _select_setup(100, "ja"))
+benchmark("select_best_section[100_cached_norm]", "matching")(lambda: _select_setup(100, cached=True))
+
+for _count in (100, 500):
+    benchmark(f"select_best_section[{_count}_indexed]", "matching")(
+        lambda count=_count: _select_setup(count, cached=True, indexed=True)
+    )
+
+
+def _select_batch_setup(images: int, count: int, batched: bool):
+    cands = fixtures.candidates(count)
+    ocrs = [fixtures.ocr_for(cands, (i * 7) % count) for i in range(images)]
+    if batched:
+        return lambda: select_best_sections_batch(ocrs, cands, normalize_strict_cached, normalize_soft_cached)
+    return lambda: [
+        select_best_section(
+            ocr_text=ocr,
+            candidates=cands,
+            normalize_strict_fn=normalize_strict_cached,
+            normalize_soft_fn=normalize_soft_cached,
+        )
+        for ocr in ocrs
+    ]
+
+
+for _count in (100, 500):
+    benchmark(f"select_20_images[{_count}_loop]", "matching")(lambda count=_count: _select_batch_setup(20, count, False))
+    benchmark(f"select_20_images[{_count}_batch]", "matching")(lambda count=_count: _select_batch_setup(20, count, True))
+
+
+def _similarity_setup(backend, length: int, cutoff: float = 0.0):
+    text = (fixtures.TEXTS["newsletter_en"] * (length // len(fixtures.TEXTS["newsletter_en"]) + 1))[:length]
+    ocr = text[: length // 3] + text[length // 3 + 1:]
+    other = text[::-1]
+    if cutoff:
+        # a non-matching pair: what the early exit is for
+        return lambda: backend.ratio(ocr, other, cutoff)
+    return lambda: backend.ratio(ocr, text)
+
+
+for _backend in (SequenceMatcherBackend(), LevenshteinBackend()):
+    for _length in (50, 200, 1000):
+        benchmark(f"similarity[{_backend.name}_{_length}]", "similarity")(
+            lambda backend=_backend, length=_length: _similarity_setup(backend, length)
+        )
+    benchmark(f"similarity[{_backend.name}_1000_cutoff]", "similarity")(
+        lambda backend=_backend: _similarity_setup(backend, 1000, cutoff=0.9)
+    )
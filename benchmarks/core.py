@@ -0,0 +1,157 @@
+"""
+Tiny benchmark runner: registry, measurement and baseline comparison.
+
+Each benchmark is a zero-argument callable produced by a setup function, so
+fixture construction is never timed. For every benchmark we record:
+
+- ops_per_sec: best of several timeit rounds (autoranged to >= ~0.2s each)
+- peak_kib: peak traced allocation (tracemalloc) during a single call
+
+A calibration loop is recorded alongside, and comparisons scale baseline
+numbers by the calibration ratio so baselines stored in the repo stay
+meaningful on a faster or slower machine.
+"""
+
+from __future__ import annotations
+
+import fnmatch
+import gc
+import json
+import platform
+import timeit
+import tracemalloc
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+BASELINES_PATH = Path(__file__).resolve().parent / "baselines.json"
+
+# Fail a comparison when a benchmark is this much slower than its (calibrated) baseline
+DEFAULT_THRESHOLD = 0.25
+
+
+@dataclass
+class Benchmark:
+    name: str
+    group: str
+    setup: Callable[[], Callable[[], object]]
+
+
+REGISTRY: Dict[str, Benchmark] = {}
+
+
+def benchmark(name: str, group: str = "misc"):
+    """Register `setup` (returning the callable to time) under `name`."""
+    def decorator(setup: Callable[[], Callable[[], object]]):
+        if name in REGISTRY:
+            raise ValueError(f"Duplicate benchmark: {name}")
+        REGISTRY[name] = Benchmark(name=name, group=group, setup=setup)
+        return setup
+    return decorator
+
+
+def _calibration_loop() -> int:
+    total = 0
+    for i in range(2000):
+        total += len(str(i)) * (i & 7)
+    return total
+
+
+def measure(fn: Callable[[], object], *, rounds: int = 5, min_time: float = 0.2) -> Dict[str, float]:
+    """Return ops/sec (best round) and peak allocation of one call in KiB."""
+    timer = timeit.Timer(fn)
+    number, elapsed = timer.autorange()
+    if elapsed < min_time:
+        number = max(1, int(number * min_time / max(elapsed, 1e-9)))
+
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        best = min(timer.repeat(repeat=rounds, number=number)) / number
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        base, _ = tracemalloc.get_traced_memory()
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {"ops_per_sec": 1.0 / best if best else float("inf"), "peak_kib": max(peak - base, 0) / 1024}
+
+
+def run(pattern: str = "*", *, rounds: int = 5, min_time: float = 0.2, log=print) -> dict:
+    """Run all registered benchmarks whose name matches the glob `pattern`."""
+    results: Dict[str, Dict[str, float]] = {}
+    for name in sorted(REGISTRY):
+        if not fnmatch.fnmatch(name, pattern):
+            continue
+        fn = REGISTRY[name].setup()
+        fn()  # warm caches / imports outside the timed region
+        results[name] = measure(fn, rounds=rounds, min_time=min_time)
+        log(f"{name:<48} {results[name]['ops_per_sec']:>14,.1f} ops/s  {results[name]['peak_kib']:>10.1f} KiB")
+
+    return {
+        "calibration_ops_per_sec": measure(_calibration_loop, rounds=rounds, min_time=min_time)["ops_per_sec"],
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": results,
+    }
+
+
+def load_baselines(path: Path = BASELINES_PATH) -> Optional[dict]:
+    if not path.exists():
+        return None
+    with path.open("r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_baselines(report: dict, path: Path = BASELINES_PATH, *, merge: bool = True) -> None:
+    """Write `report` as the new baseline; with merge, untouched benchmarks are kept."""
+    existing = load_baselines(path) if merge else None
+    if existing and existing.get("calibration_ops_per_sec"):
+        # Rescale kept entries to this run's calibration so the file stays consistent
+        scale = report["calibration_ops_per_sec"] / existing["calibration_ops_per_sec"]
+        merged = {
+            name: dict(r, ops_per_sec=r["ops_per_sec"] * scale)
+            for name, r in existing.get("results", {}).items()
+        }
+        merged.update(report["results"])
+        report = dict(report, results=merged)
+
+    rounded = dict(report, results={
+        name: {k: round(v, 2) for k, v in r.items()} for name, r in sorted(report["results"].items())
+    })
+    with path.open("w", encoding="utf-8") as f:
+        json.dump(rounded, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def compare(report: dict, baseline: dict, *, threshold: float = DEFAULT_THRESHOLD) -> List[str]:
+    """
+    Compare a run with the baseline; return a list of regression messages.
+
+    Baseline ops/sec are scaled by the calibration ratio of the two machines.
+    Benchmarks without a baseline are ignored (they show up after --save).
+    """
+    scale = 1.0
+    if baseline.get("calibration_ops_per_sec") and report.get("calibration_ops_per_sec"):
+        scale = report["calibration_ops_per_sec"] / baseline["calibration_ops_per_sec"]
+
+    regressions = []
+    for name, current in report["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if not base:
+            continue
+        expected = base["ops_per_sec"] * scale
+        ratio = current["ops_per_sec"] / expected if expected else 1.0
+        if ratio < 1.0 - threshold:
+            regressions.append(
+                f"{name}: {current['ops_per_sec']:,.1f} ops/s vs expected {expected:,.1f} "
+                f"({(1 - ratio) * 100:.0f}% slower, threshold {threshold * 100:.0f}%)"
+            )
+    return regressions
@@ -0,0 +1,80 @@
+"""
+Throughput of DOCX parsing + batched matching, in-thread vs. process pool.
+
+Simulates `--concurrency` jobs running at once in one container (as several
+Pub/Sub pushes would), each parsing its own reference DOCX and matching
+`--images` OCR texts against it. The pool run uses `--cpus` workers; pass the
+container profile you deploy with (Cloud Run 4 vCPU -> --cpus 4). On a
+machine with fewer cores than --cpus the pool can only add overhead, so the
+report includes the CPUs actually available.
+
+    python -m benchmarks.cpu_pool_throughput --cpus 4 --jobs 16
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict
+
+from benchmarks import fixtures
+from shared.cpu_pool import CpuPool, available_cpus
+
+
+def _job(pool: CpuPool, data: bytes, images: int) -> None:
+    cands = pool.parse_reference(data, "campaign_(en).docx", "en")
+    ocrs = [fixtures.ocr_for(cands, (i * 7) % len(cands)) for i in range(images)]
+    pool.select_batch(ocrs, cands)
+
+
+def run(pool: CpuPool, jobs: int, images: int, sections: int, concurrency: int) -> Dict[str, float]:
+    docs = [fixtures.paragraph_docx(sections, "en")] * jobs
+    pool.start()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as threads:
+        list(threads.map(lambda data: _job(pool, data, images), docs))
+    elapsed = time.perf_counter() - started
+    return {"seconds": round(elapsed, 3), "jobs_per_sec": round(jobs / elapsed, 3)}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.cpu_pool_throughput", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--cpus", type=int, default=4, help="container vCPU profile (pool size)")
+    parser.add_argument("--jobs", type=int, default=16)
+    parser.add_argument("--images", type=int, default=10)
+    parser.add_argument("--sections", type=int, default=30)
+    parser.add_argument("--concurrency", type=int, default=None, help="concurrent jobs (default: --cpus)")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args(argv)
+    concurrency = args.concurrency or args.cpus
+
+    inline = CpuPool(workers=1)
+    pooled = CpuPool(workers=args.cpus, min_docx_bytes=0, min_cells=0)
+    try:
+        report = {
+            "available_cpus": available_cpus(),
+            "profile_cpus": args.cpus,
+            "jobs": args.jobs,
+            "images_per_job": args.images,
+            "sections_per_doc": args.sections,
+            "inline": run(inline, args.jobs, args.images, args.sections, concurrency),
+            "pool": run(pooled, args.jobs, args.images, args.sections, concurrency),
+        }
+    finally:
+        pooled.shutdown()
+    report["speedup"] = round(report["pool"]["jobs_per_sec"] / report["inline"]["jobs_per_sec"], 2)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"available CPUs: {report['available_cpus']}  profile: {args.cpus} vCPU  concurrency: {concurrency}")
+        for mode in ("inline", "pool"):
+            print(f"{mode:<7} {report[mode]['jobs_per_sec']:>8.2f} jobs/s  ({report[mode]['seconds']}s)")
+        print(f"speedup {report['speedup']}x")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,81 @@
+"""
+Deterministic fixtures for the micro-benchmarks.
+
+Texts cover the shapes we see in production: short Latin banners, CJK
+without word boundaries, RTL Hebrew with mixed punctuation, long newsletter
+bodies with CRLF line breaks, and table-heavy reference documents.
+"""
+
+from __future__ import annotations
+
+import functools
+import io
+import random
+from typing import Dict, List
+
+from loadtest.synth import build_docx, build_sections
+from shared.docx_section_extractor import SectionCandidate
+
+SEED = 1234
+
+TEXTS: Dict[str, str] = {
+    "banner_en": "BUY NOW – Limited “Offer”\nFree shipping today only  ",
+    "banner_ja": "今すぐ購入\r\n期間限定　送料無料「本日のみ」",
+    "banner_zh": "立即购买 限时优惠\n免费送货“仅限今天”",
+    "banner_he": "קנה עכשיו – הצעה מוגבלת!\n“משלוח חינם” רק היום",
+}
+
+
+def _newsletter(language: str, paragraphs: int) -> str:
+    rng = random.Random(SEED)
+    body = [content for _, content in build_sections(rng, language, paragraphs)]
+    return "\r\n\r\n".join(body)
+
+
+TEXTS["newsletter_en"] = _newsletter("en", 40)
+TEXTS["newsletter_ja"] = _newsletter("ja", 40)
+
+
+@functools.lru_cache(maxsize=None)
+def paragraph_docx(sections: int = 30, language: str = "en") -> bytes:
+    return build_docx(build_sections(random.Random(SEED), language, sections))
+
+
+@functools.lru_cache(maxsize=None)
+def table_docx(rows: int = 80) -> bytes:
+    """Reference laid out as a two-column table (section name | text), as many briefs are."""
+    from docx import Document
+
+    rng = random.Random(SEED)
+    sections = build_sections(rng, "en", rows)
+    doc = Document()
+    doc.add_paragraph("CAMPAIGN BRIEF")
+    table = doc.add_table(rows=rows, cols=2)
+    for i, (header, content) in enumerate(sections):
+        table.rows[i].cells[0].text = header
+        table.rows[i].cells[1].text = content
+    bio = io.BytesIO()
+    doc.save(bio)
+    return bio.getvalue()
+
+
+@functools.lru_cache(maxsize=None)
+def candidates(count: int, language: str = "en") -> List[SectionCandidate]:
+    rng = random.Random(SEED + count)
+    return [
+        SectionCandidate(
+            header_text=header,
+            content_text=content,
+            source_path=f"campaign_({language}).docx",
+            language=language,
+            section_number=header.split(")")[0],
+            section_name=header.split(") ")[1],
+        )
+        for header, content in build_sections(rng, language, count)
+    ]
+
+
+def ocr_for(cands: List[SectionCandidate], index: int = 0) -> str:
+    """OCR-like text for a candidate: same content with an OCR slip and a line break."""
+    text = cands[index].content_text.replace("\n", " \n")
+    return text[:5] + text[6:] if len(text) > 6 else text
@@ -0,0 +1,130 @@
+"""
+Shortlist recall of the n-gram candidate index on the benchmark fixtures.
+
+For every section of a fixture document we derive OCR-like texts (one slip,
+first half only, scattered substitutions) and find the true winner by scoring
+all candidates. Reported per fixture:
+
+- recall: indexed selection returned the same winner and metadata (must be 1.0)
+- shortlist_recall: winner was already among the top-K by estimated score
+- scored: share of candidates the indexed path actually scored exactly
+
+    python -m benchmarks.recall
+    python -m benchmarks.recall --top-k 10 --json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+from typing import Dict, Iterator, List, Tuple
+
+from benchmarks import fixtures
+from shared.candidate_index import DEFAULT_TOP_K, CandidateIndex
+from shared.reference_matcher import select_best_section
+from worker.normalization import normalize_soft_cached, normalize_strict_cached
+
+# (section count, language, stride): every `stride`-th section is queried
+FIXTURES: List[Tuple[int, str, int]] = [
+    (100, "en", 1), (500, "en", 10), (100, "ja", 1), (100, "zh-Hans", 1), (100, "he", 1), (100, "de", 1),
+]
+
+
+def ocr_variants(text: str, rng: random.Random) -> Iterator[Tuple[str, str]]:
+    yield "slip", text[:5] + text[6:] if len(text) > 6 else text
+    yield "half", text[: max(len(text) // 2, 1)]
+    chars = list(text)
+    for _ in range(max(len(chars) // 15, 1)):
+        i = rng.randrange(len(chars))
+        chars[i] = rng.choice("ilo01 .")
+    yield "noisy", "".join(chars)
+
+
+def measure(count: int, language: str, top_k: int = DEFAULT_TOP_K, stride: int = 1) -> Dict[str, object]:
+    cands = fixtures.candidates(count, language)
+    index = CandidateIndex(cands, normalize_soft_cached, top_k=top_k)
+    rng = random.Random(count)
+    total = shortlist_hits = identical = 0
+    scored = 0
+    misses: List[str] = []
+
+    def select(ocr, candidate_index=None):
+        return select_best_section(
+            ocr_text=ocr,
+            candidates=cands,
+            normalize_strict_fn=normalize_strict_cached,
+            normalize_soft_fn=normalize_soft_cached,
+            candidate_index=candidate_index,
+        )
+
+    counting = _CountingScore()
+    for pos in range(0, count, stride):
+        for kind, ocr in ocr_variants(cands[pos].content_text, rng):
+            full = select(ocr)
+            with counting:
+                indexed = select(ocr, index)
+            scored += counting.calls
+            total += 1
+            shortlist = index.shortlist(normalize_soft_cached(ocr)) or cands
+            if any(c is full.chosen_section for c in shortlist):
+                shortlist_hits += 1
+            else:
+                misses.append(f"{pos}:{kind}")
+            identical += indexed.chosen_section is full.chosen_section and indexed.to_dict() == full.to_dict()
+    return {
+        "fixture": f"{language}_{count}",
+        "top_k": top_k,
+        "queries": total,
+        # winner among the top-K by estimate alone
+        "shortlist_recall": shortlist_hits / total if total else 1.0,
+        # winner among the candidates actually scored (shortlist + bound check)
+        "recall": identical / total if total else 1.0,
+        "scored_fraction": scored / (total * count) if total else 0.0,
+        "shortlist_misses": misses,
+    }
+
+
+class _CountingScore:
+    """Counts exact scoring calls made by select_best_section inside the block."""
+
+    def __enter__(self):
+        import shared.reference_matcher as rm
+
+        self.calls = 0
+        self._module = rm
+        self._original = rm._score_candidate
+
+        def counted(*args, **kwargs):
+            self.calls += 1
+            return self._original(*args, **kwargs)
+
+        rm._score_candidate = counted
+        return self
+
+    def __exit__(self, *exc):
+        self._module._score_candidate = self._original
+        return False
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.recall", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--top-k", type=int, default=DEFAULT_TOP_K)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args(argv)
+
+    reports = [measure(count, lang, args.top_k, stride) for count, lang, stride in FIXTURES]
+    if args.json:
+        print(json.dumps(reports, indent=2))
+    else:
+        for r in reports:
+            print(
+                f"{r['fixture']:<14} top_k={r['top_k']:<4} queries={r['queries']:<5} "
+                f"recall={r['recall']:.4f} shortlist_recall={r['shortlist_recall']:.4f} "
+                f"scored={r['scored_fraction']:.1%}"
+            )
+    return 0 if all(r["recall"] == 1.0 for r in reports) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,128 @@
+"""
+Time-to-first-row of the synchronous HTML upload (POST /) with the fake OCR backend.
+
+Drives the checker ASGI app directly (no test client buffering) and records
+when each body chunk leaves the app. With the streamed page the first result
+row is sent as soon as the first image is checked; a buffered page would
+send everything at `total_s`.
+
+    python -m benchmarks.ui_first_row --images 20 --latency-ms 50
+    python -m benchmarks.ui_first_row --concurrency 1 4 8 --json
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import time
+from typing import Dict, List, Tuple
+
+import httpx
+
+from loadtest.cloud_fakes import CloudFakes
+from loadtest.synth import build_campaign_zip
+from shared.ocr_backends import FakeOcrBackend, set_ocr_backend
+
+# A result row (the table head has no <td>)
+_ROW_MARKER = b"<td>"
+
+
+async def post_archive(app, zip_bytes: bytes, fields: Dict[str, str] = None) -> Tuple[List[Tuple[float, bytes]], int]:
+    """POST the archive to `/` and return ([(seconds since start, body chunk)], status)."""
+    request = httpx.Request(
+        "POST", "http://checker/", data=fields or {}, files={"zip_file": ("campaign.zip", zip_bytes, "application/zip")}
+    )
+    body = request.read()
+    started = time.perf_counter()
+    chunks: List[Tuple[float, bytes]] = []
+    status = 0
+    delivered = False
+
+    async def receive():
+        nonlocal delivered
+        if not delivered:
+            delivered = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await asyncio.Event().wait()  # the client never disconnects
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body" and message.get("body"):
+            chunks.append((time.perf_counter() - started, message["body"]))
+
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": "/",
+        "raw_path": b"/",
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in request.headers.items()],
+        "client": ("bench", 1),
+        "server": ("checker", 80),
+    }
+    await app(scope, receive, send)
+    return chunks, status
+
+
+def measure(images: int, latency_ms: float, concurrency: int, seed: int = 0) -> Dict[str, float]:
+    import app.main as checker_main
+
+    campaign = build_campaign_zip(seed=seed, images=images, languages=["en", "de", "ja"])
+    fakes = CloudFakes()
+    fakes.install()
+    set_ocr_backend(FakeOcrBackend(latency="fixed", latency_ms=latency_ms))
+    previous = (checker_main.UI_CONCURRENCY, os.environ.get("OCR_BUDGET_PER_JOB"))
+    checker_main.UI_CONCURRENCY = concurrency
+    os.environ["OCR_BUDGET_PER_JOB"] = "0"
+    try:
+        chunks, status = asyncio.run(post_archive(checker_main.app, campaign.zip_bytes))
+    finally:
+        set_ocr_backend(None)
+        checker_main.UI_CONCURRENCY = previous[0]
+        if previous[1] is None:
+            os.environ.pop("OCR_BUDGET_PER_JOB", None)
+        else:
+            os.environ["OCR_BUDGET_PER_JOB"] = previous[1]
+    if status != 200:
+        raise RuntimeError(f"POST / returned {status}")
+    rows = [t for t, chunk in chunks if _ROW_MARKER in chunk]
+    return {
+        "concurrency": concurrency,
+        "images": images,
+        "first_byte_s": round(chunks[0][0], 4),
+        "first_row_s": round(rows[0], 4) if rows else None,
+        "total_s": round(chunks[-1][0], 4),
+        "row_chunks": len(rows),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.ui_first_row", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--images", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args(argv)
+
+    reports = [measure(args.images, args.latency_ms, c) for c in args.concurrency]
+    if args.json:
+        print(json.dumps(reports, indent=2))
+        return 0
+    for r in reports:
+        print(
+            f"concurrency={r['concurrency']:<3} images={r['images']:<4} first_byte={r['first_byte_s']}s "
+            f"first_row={r['first_row_s']}s total={r['total_s']}s"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
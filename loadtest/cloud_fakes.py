@@ -0,0 +1,336 @@
+"""
+In-memory stand-ins for the Google Cloud clients used by the checker and worker.
+
+Only the API surface the services actually touch is implemented:
+
+- Firestore: collection/document refs, set/update/get, sub-collections, stream, batch,
+  update_time preconditions (client.write_option(last_update_time=...))
+- Cloud Storage: bucket/blob with open("wb"/"rb"), upload/download helpers
+- Pub/Sub: PublisherClient.topic_path/publish; messages are queued for the harness
+
+Everything is thread-safe and deep-copies data on write/read, so callers
+can't mutate stored documents by accident (the real services serialize too).
+"""
+
+from __future__ import annotations
+
+import copy
+import datetime as dt
+import io
+import itertools
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+
+
+def _is_server_timestamp(value: Any) -> bool:
+    try:
+        from google.cloud.firestore import SERVER_TIMESTAMP
+    except ImportError:  # pragma: no cover - google-cloud-firestore always present in the images
+        return False
+    return value is SERVER_TIMESTAMP
+
+
+def _resolve_sentinels(data: Dict[str, Any]) -> Dict[str, Any]:
+    now = dt.datetime.now(dt.timezone.utc)
+    return {k: (now if _is_server_timestamp(v) else v) for k, v in data.items()}
+
+
+# --- Firestore ---------------------------------------------------------------
+
+class _LastUpdateOption:
+    def __init__(self, last_update_time: dt.datetime):
+        self.last_update_time = last_update_time
+
+
+class FakeDocumentSnapshot:
+    def __init__(
+        self,
+        reference: "FakeDocumentReference",
+        data: Optional[Dict[str, Any]],
+        update_time: Optional[dt.datetime] = None,
+    ):
+        self.reference = reference
+        self.id = reference.id
+        self._data = data
+        self.update_time = update_time
+
+    @property
+    def exists(self) -> bool:
+        return self._data is not None
+
+    def to_dict(self) -> Optional[Dict[str, Any]]:
+        return copy.deepcopy(self._data)
+
+    def get(self, field: str) -> Any:
+        return copy.deepcopy((self._data or {}).get(field))
+
+
+class FakeDocumentReference:
+    def __init__(self, store: "FakeFirestore", path: Tuple[str, ...]):
+        self._store = store
+        self._path = path
+        self.id = path[-1]
+
+    @property
+    def path(self) -> str:
+        return "/".join(self._path)
+
+    def collection(self, name: str) -> "FakeCollectionReference":
+        return FakeCollectionReference(self._store, self._path + (name,))
+
+    def set(self, data: Dict[str, Any], merge: bool = False) -> None:
+        data = _resolve_sentinels(copy.deepcopy(data))
+        with self._store._lock:
+            if merge and self._path in self._store._docs:
+                self._store._docs[self._path].update(data)
+            else:
+                self._store._docs[self._path] = data
+            self._store._touch(self._path)
+
+    def update(self, fields: Dict[str, Any], option: Optional[_LastUpdateOption] = None) -> None:
+        fields = _resolve_sentinels(copy.deepcopy(fields))
+        with self._store._lock:
+            if self._path not in self._store._docs:
+                raise KeyError(f"No document to update: {self.path}")
+            if option is not None and self._store._updated.get(self._path) != option.last_update_time:
+                from google.api_core.exceptions import FailedPrecondition
+
+                raise FailedPrecondition(f"Document changed since {option.last_update_time}: {self.path}")
+            doc = self._store._docs[self._path]
+            for key, value in fields.items():
+                # Dotted keys are nested field paths, as in the real client
+                target = doc
+                *parents, leaf = key.split(".")
+                for part in parents:
+                    target = target.setdefault(part, {})
+                target[leaf] = value
+            self._store._touch(self._path)
+
+    def get(self) -> FakeDocumentSnapshot:
+        with self._store._lock:
+            data = copy.deepcopy(self._store._docs.get(self._path))
+            update_time = self._store._updated.get(self._path)
+            self._store.reads += 1
+        return FakeDocumentSnapshot(self, data, update_time)
+
+    def delete(self) -> None:
+        with self._store._lock:
+            self._store._docs.pop(self._path, None)
+            self._store._updated.pop(self._path, None)
+
+
+class FakeCollectionReference:
+    def __init__(self, store: "FakeFirestore", path: Tuple[str, ...]):
+        self._store = store
+        self._path = path
+        self.id = path[-1]
+
+    def document(self, document_id: Optional[str] = None) -> FakeDocumentReference:
+        if document_id is None:
+            document_id = f"auto-{next(self._store._ids)}"
+        return FakeDocumentReference(self._store, self._path + (document_id,))
+
+    def stream(self) -> Iterator[FakeDocumentSnapshot]:
+        depth = len(self._path) + 1
+        with self._store._lock:
+            keys = sorted(k for k in self._store._docs if len(k) == depth and k[:-1] == self._path)
+        for key in keys:
+            yield FakeDocumentReference(self._store, key).get()
+
+
+class FakeWriteBatch:
+    """client.batch(): buffered set() calls applied on commit()."""
+
+    def __init__(self, store: "FakeFirestore"):
+        self._store = store
+        self._writes: List[Tuple[FakeDocumentReference, Dict[str, Any], bool]] = []
+
+    def set(self, reference: FakeDocumentReference, data: Dict[str, Any], merge: bool = False) -> None:
+        self._writes.append((reference, data, merge))
+
+    def commit(self) -> None:
+        with self._store._lock:
+            for reference, data, merge in self._writes:
+                reference.set(data, merge=merge)
+        self._writes = []
+
+
+class FakeFirestore:
+    """Minimal thread-safe in-memory Firestore client."""
+
+    def __init__(self):
+        self._docs: Dict[Tuple[str, ...], Dict[str, Any]] = {}
+        self._updated: Dict[Tuple[str, ...], dt.datetime] = {}
+        self._last_update = dt.datetime.min.replace(tzinfo=dt.timezone.utc)
+        self._lock = threading.RLock()
+        self._ids = itertools.count(1)
+        self.reads = 0
+        self.writes = 0
+
+    def collection(self, name: str) -> FakeCollectionReference:
+        return FakeCollectionReference(self, (name,))
+
+    def batch(self) -> FakeWriteBatch:
+        return FakeWriteBatch(self)
+
+    @staticmethod
+    def write_option(last_update_time: dt.datetime) -> _LastUpdateOption:
+        return _LastUpdateOption(last_update_time)
+
+    def _touch(self, path: Tuple[str, ...]) -> None:
+        # Strictly increasing, like the server's commit times (caller holds the lock)
+        now = dt.datetime.now(dt.timezone.utc)
+        self._last_update = max(now, self._last_update + dt.timedelta(microseconds=1))
+        self._updated[path] = self._last_update
+        self.writes += 1
+
+
+# --- Cloud Storage -----------------------------------------------------------
+
+class _BlobWriter(io.BytesIO):
+    def __init__(self, blob: "FakeBlob"):
+        super().__init__()
+        self._blob = blob
+
+    def close(self) -> None:
+        if not self.closed:
+            self._blob._put(self.getvalue())
+        super().close()
+
+
+class FakeBlob:
+    def __init__(self, bucket: "FakeBucket", name: str):
+        self.bucket = bucket
+        self.name = name
+
+    def _put(self, data: bytes) -> None:
+        with self.bucket._storage._lock:
+            self.bucket._objects[self.name] = bytes(data)
+            self.bucket._storage.bytes_uploaded += len(data)
+
+    def _get(self, start: Optional[int] = None, end: Optional[int] = None) -> bytes:
+        with self.bucket._storage._lock:
+            try:
+                data = self.bucket._objects[self.name]
+            except KeyError:
+                raise FileNotFoundError(f"gs://{self.bucket.name}/{self.name}") from None
+            if start is not None or end is not None:
+                # GCS ranges are inclusive of `end`; only the range counts as downloaded
+                data = data[start or 0:(end + 1) if end is not None else None]
+            self.bucket._storage.bytes_downloaded += len(data)
+            return data
+
+    @property
+    def size(self) -> Optional[int]:
+        data = self.bucket._objects.get(self.name)
+        return None if data is None else len(data)
+
+    def exists(self) -> bool:
+        return self.name in self.bucket._objects
+
+    def open(self, mode: str = "rb"):
+        if "w" in mode:
+            return _BlobWriter(self)
+        return io.BytesIO(self._get())
+
+    def upload_from_string(self, data, content_type: Optional[str] = None) -> None:
+        self._put(data.encode("utf-8") if isinstance(data, str) else data)
+
+    def upload_from_file(self, file_obj, content_type: Optional[str] = None) -> None:
+        self._put(file_obj.read())
+
+    def upload_from_filename(self, filename: str, content_type: Optional[str] = None) -> None:
+        with open(filename, "rb") as f:
+            self._put(f.read())
+
+    def download_to_file(self, file_obj) -> None:
+        file_obj.write(self._get())
+
+    def download_as_bytes(self, start: Optional[int] = None, end: Optional[int] = None) -> bytes:
+        return self._get(start, end)
+
+    def delete(self) -> None:
+        with self.bucket._storage._lock:
+            self.bucket._objects.pop(self.name, None)
+
+
+class FakeBucket:
+    def __init__(self, storage: "FakeStorage", name: str):
+        self._storage = storage
+        self.name = name
+        self._objects: Dict[str, bytes] = storage._buckets.setdefault(name, {})
+
+    def blob(self, name: str) -> FakeBlob:
+        return FakeBlob(self, name)
+
+    def list_blobs(self, prefix: str = "") -> List[FakeBlob]:
+        with self._storage._lock:
+            names = sorted(n for n in self._objects if n.startswith(prefix))
+        return [FakeBlob(self, n) for n in names]
+
+
+class FakeStorage:
+    """Minimal thread-safe in-memory Cloud Storage client."""
+
+    def __init__(self):
+        self._buckets: Dict[str, Dict[str, bytes]] = {}
+        self._lock = threading.RLock()
+        self.bytes_uploaded = 0
+        self.bytes_downloaded = 0
+
+    def bucket(self, name: str) -> FakeBucket:
+        with self._lock:
+            return FakeBucket(self, name)
+
+    def list_blobs(self, bucket_or_name, prefix: str = "") -> List[FakeBlob]:
+        bucket = bucket_or_name if isinstance(bucket_or_name, FakeBucket) else self.bucket(bucket_or_name)
+        return bucket.list_blobs(prefix=prefix)
+
+
+# --- Pub/Sub -----------------------------------------------------------------
+
+class _DoneFuture:
+    def __init__(self, value: str):
+        self._value = value
+
+    def result(self, timeout: Optional[float] = None) -> str:
+        return self._value
+
+
+class FakePublisher:
+    """PublisherClient stand-in; published messages wait in `messages` for the harness."""
+
+    def __init__(self):
+        self.messages: Deque[Tuple[str, bytes, Dict[str, str]]] = deque()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def topic_path(project: str, topic: str) -> str:
+        return f"projects/{project}/topics/{topic}"
+
+    def publish(self, topic: str, data: bytes, **attrs: str) -> _DoneFuture:
+        with self._lock:
+            message_id = str(next(self._ids))
+            self.messages.append((topic, data, dict(attrs, message_id=message_id)))
+        return _DoneFuture(message_id)
+
+    def pop(self) -> Optional[Tuple[str, bytes, Dict[str, str]]]:
+        with self._lock:
+            return self.messages.popleft() if self.messages else None
+
+
+class CloudFakes:
+    """Bundle of stand-ins shared by the checker and the worker in one process."""
+
+    def __init__(self):
+        self.firestore = FakeFirestore()
+        self.storage = FakeStorage()
+        self.publisher = FakePublisher()
+
+    def install(self) -> None:
+        """Make the checker and worker use these stand-ins (see shared.cloud_clients)."""
+        from shared.cloud_clients import override_clients
+
+        override_clients(firestore=self.firestore, storage=self.storage, publisher=self.publisher)
@@ -0,0 +1,356 @@
+"""
+End-to-end load-test harness.
+
+Drives the real checker (`POST /jobs`) and worker (`POST /pubsub/push`)
+FastAPI apps in-process with in-memory GCS/Firestore/Pub/Sub stand-ins and
+a latency-injecting fake OCR backend. No network, no credentials.
+
+Usage:
+    python -m loadtest.harness --jobs 20 --images 10 --ocr-latency-ms 150 --concurrency 4
+
+    # first-job latency with vs. without the worker warm-up
+    python -m loadtest.harness --jobs 5 --cold-start
+    python -m loadtest.harness --jobs 5 --cold-start --no-warmup
+
+    # mixed workload: a large job, then small ones submitted right after it
+    python -m loadtest.harness --jobs 4 --image-mix 1000,10 --ocr-budget 0 --concurrency 4
+
+Reports throughput (jobs/hour, images/sec), job latency percentiles,
+peak RSS and cumulative time per pipeline stage.
+"""
+
+from __future__ import annotations
+
+import argparse
+import base64
+import dataclasses
+import json
+import math
+import multiprocessing
+import os
+import resource
+import statistics
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence
+
+from loadtest.cloud_fakes import CloudFakes
+from loadtest.synth import build_campaign_zip
+from shared.ocr_backends import FakeOcrBackend, set_ocr_backend
+
+
+def percentile(values: Sequence[float], pct: float) -> float:
+    """Nearest-rank percentile; 0.0 for an empty sample."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+@dataclass
+class LoadTestConfig:
+    jobs: int = 10
+    images: int = 10
+    languages: Optional[List[str]] = None
+    sections_per_doc: int = 6
+    mismatch_rate: float = 0.2
+    ocr_latency: str = "lognormal"
+    ocr_latency_ms: float = 100.0
+    ocr_jitter_ms: float = 40.0
+    ocr_error_rate: float = 0.0
+    concurrency: int = 1
+    submit_interval_s: float = 0.0
+    seed: int = 0
+    warmup: bool = True
+    # Build archives in a spawned child so this process stays cold (no python-docx
+    # imported yet); needed to measure first-job latency honestly
+    cold_start: bool = False
+    # Per-job archive sizes, cycled over the jobs (overrides `images`)
+    image_mix: Optional[List[int]] = None
+    # Per-job OCR budget sent with each job (0 = check every image); None = worker default
+    ocr_budget: Optional[int] = None
+
+    def images_for(self, job_index: int) -> int:
+        return self.image_mix[job_index % len(self.image_mix)] if self.image_mix else self.images
+
+
+@dataclass
+class LoadTestReport:
+    config: LoadTestConfig
+    wall_s: float
+    jobs_done: int
+    jobs_failed: int
+    images_processed: int
+    job_latencies_s: List[float]
+    submit_latencies_s: List[float]
+    stage_totals_s: Dict[str, float]
+    stage_counts: Dict[str, int]
+    peak_rss_mb: float
+    statuses: Dict[str, int] = field(default_factory=dict)
+    push_durations_s: List[float] = field(default_factory=list)
+    warmup_report: Optional[dict] = None
+    latencies_by_images_s: Dict[int, List[float]] = field(default_factory=dict)
+
+    def to_dict(self) -> dict:
+        lat = self.job_latencies_s
+        return {
+            "jobs_done": self.jobs_done,
+            "jobs_failed": self.jobs_failed,
+            "images_processed": self.images_processed,
+            "wall_s": round(self.wall_s, 3),
+            "jobs_per_hour": round(self.jobs_done / self.wall_s * 3600, 1) if self.wall_s else 0.0,
+            "images_per_s": round(self.images_processed / self.wall_s, 2) if self.wall_s else 0.0,
+            "job_latency_s": {
+                "p50": round(percentile(lat, 50), 3),
+                "p95": round(percentile(lat, 95), 3),
+                "p99": round(percentile(lat, 99), 3),
+                "max": round(max(lat), 3) if lat else 0.0,
+                "mean": round(statistics.fmean(lat), 3) if lat else 0.0,
+            },
+            "submit_latency_s_p95": round(percentile(self.submit_latencies_s, 95), 4),
+            "first_job_processing_s": round(self.push_durations_s[0], 3) if self.push_durations_s else None,
+            "later_jobs_processing_s_p50": round(percentile(self.push_durations_s[1:], 50), 3),
+            "warmup_ms": (self.warmup_report or {}).get("total_ms"),
+            "peak_rss_mb": round(self.peak_rss_mb, 1),
+            "stages_s": {k: round(v, 3) for k, v in sorted(self.stage_totals_s.items(), key=lambda kv: -kv[1])},
+            "stage_calls": dict(self.stage_counts),
+            "statuses": self.statuses,
+            "job_latency_by_images_s": {
+                str(size): {"p50": round(percentile(v, 50), 3), "max": round(max(v), 3), "jobs": len(v)}
+                for size, v in sorted(self.latencies_by_images_s.items())
+            },
+        }
+
+    def format(self) -> str:
+        d = self.to_dict()
+        lines = [
+            f"jobs: {d['jobs_done']} done, {d['jobs_failed']} failed, {d['images_processed']} images in {d['wall_s']}s",
+            f"throughput: {d['jobs_per_hour']} jobs/hour, {d['images_per_s']} images/s",
+            "job latency (s): " + ", ".join(f"{k}={v}" for k, v in d["job_latency_s"].items()),
+        ]
+        if len(d["job_latency_by_images_s"]) > 1:
+            lines += [
+                f"  {size:>6}-image jobs: p50={v['p50']} max={v['max']} ({v['jobs']} jobs)"
+                for size, v in d["job_latency_by_images_s"].items()
+            ]
+        lines += [
+            f"submit latency p95: {d['submit_latency_s_p95']}s",
+            f"worker processing: first job {d['first_job_processing_s']}s, "
+            f"later jobs p50 {d['later_jobs_processing_s_p50']}s, warm-up {d['warmup_ms']} ms",
+            f"peak RSS: {d['peak_rss_mb']} MiB",
+            "stage time (s, summed over all jobs; nested stages are included in their parents):",
+        ]
+        for stage, total in d["stages_s"].items():
+            lines.append(f"  {stage:<28} {total:>9.3f}  ({d['stage_calls'].get(stage, 0)} calls)")
+        return "\n".join(lines)
+
+
+def _push_envelope(data: bytes, message_id: str) -> dict:
+    return {
+        "message": {"data": base64.b64encode(data).decode("ascii"), "messageId": message_id},
+        "subscription": "projects/loadtest/subscriptions/ocr-worker-push",
+    }
+
+
+def _build_campaigns(config: LoadTestConfig) -> list:
+    return [
+        build_campaign_zip(
+            seed=config.seed + i,
+            images=config.images_for(i),
+            languages=config.languages,
+            sections_per_doc=config.sections_per_doc,
+            mismatch_rate=config.mismatch_rate,
+        )
+        for i in range(config.jobs)
+    ]
+
+
+def run_load_test(config: LoadTestConfig, *, fakes: Optional[CloudFakes] = None) -> LoadTestReport:
+    """Generate archives, submit them through the checker and drain them through the worker."""
+    from fastapi.testclient import TestClient
+
+    fakes = fakes or CloudFakes()
+    fakes.install()
+
+    import app.main as checker_main
+    import worker.main as worker_main
+
+    set_ocr_backend(FakeOcrBackend(
+        latency=config.ocr_latency,
+        latency_ms=config.ocr_latency_ms,
+        jitter_ms=config.ocr_jitter_ms,
+        error_rate=config.ocr_error_rate,
+        seed=config.seed,
+    ))
+
+    if config.cold_start:
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=1, mp_context=ctx) as pool:
+            campaigns = pool.submit(_build_campaigns, config).result()
+    else:
+        campaigns = _build_campaigns(config)
+
+    submitted_at: Dict[str, float] = {}
+    job_images: Dict[str, int] = {}
+    finished_at: Dict[str, float] = {}
+    submit_latencies: List[float] = []
+    push_durations: List[float] = []
+    submissions_done = threading.Event()
+
+    previous_warmup_env = os.environ.get("WORKER_WARMUP")
+    os.environ["WORKER_WARMUP"] = "1" if config.warmup else "0"
+    # All submissions come from one test client; a per-client rate limit would throttle the test itself
+    previous_limits = checker_main.admission.limits
+    checker_main.admission.limits = dataclasses.replace(previous_limits, rate_per_min=0)
+    try:
+        with TestClient(checker_main.app) as checker, TestClient(worker_main.app) as worker:
+            started = time.perf_counter()
+
+            def submit_all() -> None:
+                try:
+                    for i, campaign in enumerate(campaigns):
+                        t0 = time.perf_counter()
+                        resp = checker.post(
+                            "/jobs",
+                            files={"zip_file": (f"campaign_{i}.zip", campaign.zip_bytes, "application/zip")},
+                            data={} if config.ocr_budget is None else {"ocr_budget": str(config.ocr_budget)},
+                        )
+                        resp.raise_for_status()
+                        submitted_at[resp.json()["job_id"]] = t0
+                        job_images[resp.json()["job_id"]] = config.images_for(i)
+                        submit_latencies.append(time.perf_counter() - t0)
+                        if config.submit_interval_s:
+                            time.sleep(config.submit_interval_s)
+                finally:
+                    submissions_done.set()
+
+            def consume() -> None:
+                while True:
+                    item = fakes.publisher.pop()
+                    if item is None:
+                        if submissions_done.is_set() and not fakes.publisher.messages:
+                            return
+                        time.sleep(0.001)
+                        continue
+                    _, data, attrs = item
+                    job_id = json.loads(data)["job_id"]
+                    t0 = time.perf_counter()
+                    resp = worker.post("/pubsub/push", json=_push_envelope(data, attrs["message_id"]))
+                    resp.raise_for_status()
+                    finished_at[job_id] = time.perf_counter()
+                    push_durations.append(finished_at[job_id] - t0)
+
+            producer = threading.Thread(target=submit_all, name="loadtest-submit")
+            producer.start()
+            with ThreadPoolExecutor(max_workers=config.concurrency, thread_name_prefix="loadtest-push") as pool:
+                consumers = [pool.submit(consume) for _ in range(config.concurrency)]
+                for c in consumers:
+                    c.result()
+            producer.join()
+            wall = time.perf_counter() - started
+    finally:
+        set_ocr_backend(None)
+        checker_main.admission.limits = previous_limits
+        if previous_warmup_env is None:
+            os.environ.pop("WORKER_WARMUP", None)
+        else:
+            os.environ["WORKER_WARMUP"] = previous_warmup_env
+
+    statuses: Dict[str, int] = defaultdict(int)
+    stage_totals: Dict[str, float] = defaultdict(float)
+    stage_counts: Dict[str, int] = defaultdict(int)
+    images_processed = 0
+    for job_id in submitted_at:
+        job = fakes.firestore.collection("jobs").document(job_id).get().to_dict() or {}
+        statuses[job.get("status", "MISSING")] += 1
+        result = job.get("result") or {}
+        images_processed += (result.get("summary") or {}).get("total", len(result.get("results") or {}))
+        # Per-stage time comes from the worker's own tracing (job["timings"])
+        for path, stats in ((job.get("timings") or {}).get("spans") or {}).items():
+            stage = path.split("/", 1)[1] if "/" in path else path
+            stage_totals[stage] += stats["total_ms"] / 1000.0
+            stage_counts[stage] += stats["count"]
+
+    latencies_by_images: Dict[int, List[float]] = defaultdict(list)
+    for job_id, finished in finished_at.items():
+        latencies_by_images[job_images[job_id]].append(finished - submitted_at[job_id])
+
+    return LoadTestReport(
+        config=config,
+        wall_s=wall,
+        jobs_done=statuses.get("DONE", 0),
+        jobs_failed=statuses.get("FAILED", 0),
+        images_processed=images_processed,
+        job_latencies_s=[finished_at[j] - submitted_at[j] for j in submitted_at if j in finished_at],
+        submit_latencies_s=submit_latencies,
+        stage_totals_s=dict(stage_totals),
+        stage_counts=dict(stage_counts),
+        peak_rss_mb=peak_rss_mb(),
+        statuses=dict(statuses),
+        push_durations_s=push_durations,
+        warmup_report=worker_main.warmup_state.report if config.warmup else None,
+        latencies_by_images_s=dict(latencies_by_images),
+    )
+
+
+def _parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Offline end-to-end load test for the OCR checker + worker")
+    p.add_argument("--jobs", type=int, default=10)
+    p.add_argument("--images", type=int, default=10, help="images per archive")
+    p.add_argument("--image-mix", default=None, help="per-job archive sizes, cycled, e.g. 1000,10")
+    p.add_argument("--ocr-budget", type=int, default=None, help="per-job OCR budget, 0 = check every image")
+    p.add_argument("--languages", default=None, help="comma separated, e.g. en,ru,ja")
+    p.add_argument("--sections", type=int, default=6, help="sections per reference DOCX")
+    p.add_argument("--mismatch-rate", type=float, default=0.2)
+    p.add_argument("--ocr-latency", choices=["fixed", "uniform", "lognormal"], default="lognormal")
+    p.add_argument("--ocr-latency-ms", type=float, default=100.0)
+    p.add_argument("--ocr-jitter-ms", type=float, default=40.0)
+    p.add_argument("--ocr-error-rate", type=float, default=0.0)
+    p.add_argument("--concurrency", type=int, default=1, help="concurrent Pub/Sub pushes")
+    p.add_argument("--submit-interval", type=float, default=0.0, help="seconds between job submissions")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--no-warmup", action="store_true", help="skip the worker's startup warm-up")
+    p.add_argument("--cold-start", action="store_true",
+                   help="generate archives in a child process so first-job latency includes cold imports")
+    p.add_argument("--json", action="store_true", help="print the report as JSON")
+    return p.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    args = _parse_args(argv)
+    config = LoadTestConfig(
+        jobs=args.jobs,
+        images=args.images,
+        languages=args.languages.split(",") if args.languages else None,
+        sections_per_doc=args.sections,
+        mismatch_rate=args.mismatch_rate,
+        ocr_latency=args.ocr_latency,
+        ocr_latency_ms=args.ocr_latency_ms,
+        ocr_jitter_ms=args.ocr_jitter_ms,
+        ocr_error_rate=args.ocr_error_rate,
+        concurrency=args.concurrency,
+        submit_interval_s=args.submit_interval,
+        seed=args.seed,
+        warmup=not args.no_warmup,
+        cold_start=args.cold_start,
+        image_mix=[int(n) for n in args.image_mix.split(",")] if args.image_mix else None,
+        ocr_budget=args.ocr_budget,
+    )
+    report = run_load_test(config)
+    print(json.dumps(report.to_dict(), indent=2, ensure_ascii=False) if args.json else report.format())
+    return 0 if report.jobs_failed == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
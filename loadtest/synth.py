@@ -0,0 +1,131 @@
+"""
+Synthetic campaign archives for load tests and benchmarks.
+
+A campaign zip follows the production layout:
+
+    images/banner_01_(en).png ... images/banner_NN_(lang).png
+    texts/campaign_(en).docx  ... one multi-section DOCX per language
+
+Each DOCX holds numbered sections (BANNER, POPUP, EMAIL, NEWS ...). Every
+image "shows" one section: its expected OCR text is embedded in the PNG
+(see shared.ocr_backends.make_fake_png), optionally perturbed so that a
+share of images ends up in MANUAL review like real OCR noise does.
+"""
+
+from __future__ import annotations
+
+import io
+import random
+import zipfile
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from shared.ocr_backends import make_fake_png
+
+# Small per-language vocabularies; enough to make sections distinct and realistic in length
+VOCABULARY: Dict[str, List[str]] = {
+    "en": "buy now limited offer free shipping today only new collection sale ends soon discover more exclusive deal".split(),
+    "ru": "купить сейчас ограниченное предложение бесплатная доставка только сегодня новая коллекция скидки успейте".split(),
+    "de": "jetzt kaufen begrenztes angebot kostenloser versand nur heute neue kollektion rabatt entdecken".split(),
+    "he": "קנה עכשיו הצעה מוגבלת משלוח חינם רק היום קולקציה חדשה מבצע גלה עוד".split(),
+    "ja": list("今すぐ購入期間限定送料無料本日のみ新作コレクションセール終了間近詳しくはこちら"),
+    "zh-Hans": list("立即购买限时优惠免费送货仅限今天新品系列促销即将结束了解更多"),
+}
+
+CJK_LANGUAGES = {"ja", "zh-Hans"}
+
+SECTION_NAMES = ["BANNER", "POPUP", "PIC", "IM", "EMAIL", "NEWS", "LETTER"]
+
+
+@dataclass
+class SyntheticCampaign:
+    """A generated archive plus what the pipeline is expected to find in it."""
+
+    zip_bytes: bytes
+    image_count: int
+    languages: List[str]
+    expected_sections: Dict[str, str]  # image path -> section content the image shows
+
+
+def _phrase(rng: random.Random, language: str, length: int) -> str:
+    words = VOCABULARY[language]
+    tokens = [rng.choice(words) for _ in range(length)]
+    return ("" if language in CJK_LANGUAGES else " ").join(tokens)
+
+
+def build_sections(rng: random.Random, language: str, count: int) -> List[Tuple[str, str]]:
+    """Return [(header, content)] with a mix of short banner-like and long newsletter-like sections."""
+    sections = []
+    for i in range(count):
+        name = SECTION_NAMES[i % len(SECTION_NAMES)]
+        long_section = name in ("NEWS", "LETTER", "EMAIL")
+        length = rng.randint(40, 90) if long_section else rng.randint(4, 12)
+        if language in CJK_LANGUAGES:
+            length *= 3
+        lines = [_phrase(rng, language, max(1, length // 2)), _phrase(rng, language, max(1, length - length // 2))]
+        sections.append((f"{i + 1:02d}) {name}", "\n".join(lines)))
+    return sections
+
+
+def build_docx(sections: Sequence[Tuple[str, str]]) -> bytes:
+    from docx import Document
+
+    doc = Document()
+    for header, content in sections:
+        doc.add_paragraph(header)
+        for line in content.split("\n"):
+            doc.add_paragraph(line)
+        doc.add_paragraph("")
+    bio = io.BytesIO()
+    doc.save(bio)
+    return bio.getvalue()
+
+
+def _perturb(rng: random.Random, text: str) -> str:
+    """Simulate an OCR slip: drop or swap one character."""
+    if len(text) < 4:
+        return text + "?"
+    i = rng.randrange(1, len(text) - 1)
+    if rng.random() < 0.5:
+        return text[:i] + text[i + 1:]
+    return text[:i] + text[i + 1] + text[i] + text[i + 2:]
+
+
+def build_campaign_zip(
+    *,
+    seed: int = 0,
+    images: int = 10,
+    languages: Optional[Sequence[str]] = None,
+    sections_per_doc: int = 6,
+    mismatch_rate: float = 0.2,
+) -> SyntheticCampaign:
+    """Build one campaign archive; `images` are spread round-robin over `languages`."""
+    rng = random.Random(seed)
+    languages = list(languages or ["en", "ru", "de", "he", "ja", "zh-Hans"])
+
+    docs: Dict[str, List[Tuple[str, str]]] = {
+        lang: build_sections(rng, lang, sections_per_doc) for lang in languages
+    }
+    expected: Dict[str, str] = {}
+
+    bio = io.BytesIO()
+    with zipfile.ZipFile(bio, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for lang, sections in docs.items():
+            zf.writestr(f"texts/campaign_({lang}).docx", build_docx(sections))
+
+        for n in range(images):
+            lang = languages[n % len(languages)]
+            # Banners mostly show short sections
+            short = [s for s in docs[lang] if not s[0].endswith(("NEWS", "LETTER", "EMAIL"))] or docs[lang]
+            _, content = rng.choice(short)
+            shown = _perturb(rng, content) if rng.random() < mismatch_rate else content
+            path = f"images/banner_{n + 1:03d}_({lang}).png"
+            zf.writestr(path, make_fake_png(shown, seed=seed * 100003 + n))
+            expected[path] = content
+
+    return SyntheticCampaign(
+        zip_bytes=bio.getvalue(),
+        image_count=images,
+        languages=languages,
+        expected_sections=expected,
+    )
@@ -0,0 +1,233 @@
+"""
+Admission control and load shedding for archive uploads.
+
+Starlette spools a multipart upload to a temporary file (tmpfs on Cloud Run,
+i.e. memory) before the endpoint runs, so limits have to be applied in front
+of the route, while the body is still arriving. AdmissionMiddleware wraps the
+upload routes and, per request:
+
+  1. rejects bodies whose Content-Length exceeds the archive size limit (413)
+  2. admits at most `max_concurrent` uploads at a time (429)
+  3. reserves the declared Content-Length against the instance-wide in-flight
+     byte budget (429); bodies without a length, or longer than declared,
+     reserve as they stream
+  4. applies a per-client token bucket (429); checked last, so an upload shed
+     for instance capacity does not use up the client's rate budget
+  5. enforces the archive size limit on the bytes actually received (413)
+
+Rejections carry `Retry-After`. The reservation is released when the
+request finishes (for streamed responses, after the last chunk), by which
+time the route has removed its temporary files.
+
+Clients are identified by the first X-Forwarded-For hop (set by the Cloud Run
+front end), else the peer address.
+
+Env:
+    UPLOAD_MAX_CONCURRENT      concurrent uploads per instance, default 4
+    UPLOAD_MAX_INFLIGHT_BYTES  admitted upload bytes per instance, default 1 GiB
+    UPLOAD_MAX_BYTES           max request body (archive) size, default 512 MiB
+    UPLOAD_RATE_PER_MIN        uploads per client per minute, default 30 (0 = no limit)
+    UPLOAD_RATE_BURST          token bucket size, default 10
+    UPLOAD_RETRY_AFTER         Retry-After (s) when the instance is full, default 5
+"""
+
+from __future__ import annotations
+
+import math
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Collection, Dict, Optional, Tuple
+
+from fastapi import HTTPException
+from starlette.responses import JSONResponse
+
+from shared.metrics import IN_FLIGHT, UPLOAD_BYTES_IN_FLIGHT, UPLOADS_REJECTED
+
+_MiB = 1024 * 1024
+
+
+@dataclass(frozen=True)
+class UploadLimits:
+    max_concurrent: int = 4
+    max_inflight_bytes: int = 1024 * _MiB
+    max_bytes: int = 512 * _MiB
+    rate_per_min: float = 30.0
+    rate_burst: int = 10
+    retry_after: int = 5
+
+    @classmethod
+    def from_env(cls) -> "UploadLimits":
+        env = os.environ
+        return cls(
+            max_concurrent=int(env.get("UPLOAD_MAX_CONCURRENT", cls.max_concurrent)),
+            max_inflight_bytes=int(env.get("UPLOAD_MAX_INFLIGHT_BYTES", cls.max_inflight_bytes)),
+            max_bytes=int(env.get("UPLOAD_MAX_BYTES", cls.max_bytes)),
+            rate_per_min=float(env.get("UPLOAD_RATE_PER_MIN", cls.rate_per_min)),
+            rate_burst=int(env.get("UPLOAD_RATE_BURST", cls.rate_burst)),
+            retry_after=int(env.get("UPLOAD_RETRY_AFTER", cls.retry_after)),
+        )
+
+
+@dataclass(frozen=True)
+class Rejection:
+    status_code: int
+    reason: str  # metrics label: too_large | rate | concurrency | bytes
+    detail: str
+    retry_after: Optional[int] = None
+
+    def headers(self) -> Dict[str, str]:
+        return {"Retry-After": str(self.retry_after)} if self.retry_after is not None else {}
+
+
+class AdmissionController:
+    """Upload slots, in-flight byte budget and per-client token buckets of one process."""
+
+    # Full buckets are dropped once this many clients are tracked
+    MAX_TRACKED_CLIENTS = 10000
+
+    def __init__(self, limits: Optional[UploadLimits] = None, clock: Callable[[], float] = time.monotonic):
+        self.limits = limits or UploadLimits.from_env()
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._buckets: Dict[str, Tuple[float, float]] = {}  # client -> (tokens, updated_at)
+        self.active = 0
+        self.inflight_bytes = 0
+        self.peak_inflight_bytes = 0
+
+    def _take_token(self, client: str) -> Optional[int]:
+        """None if the client may upload now, else seconds until it may."""
+        limits = self.limits
+        if limits.rate_per_min <= 0:
+            return None
+        rate = limits.rate_per_min / 60.0
+        now = self._clock()
+        tokens, updated = self._buckets.get(client, (float(limits.rate_burst), now))
+        tokens = min(float(limits.rate_burst), tokens + (now - updated) * rate)
+        if tokens < 1.0:
+            self._buckets[client] = (tokens, now)
+            return max(1, math.ceil((1.0 - tokens) / rate))
+        if len(self._buckets) >= self.MAX_TRACKED_CLIENTS and client not in self._buckets:
+            self._prune(now, rate)
+        self._buckets[client] = (tokens - 1.0, now)
+        return None
+
+    def _prune(self, now: float, rate: float) -> None:
+        burst = float(self.limits.rate_burst)
+        for key, (tokens, updated) in list(self._buckets.items()):
+            if tokens + (now - updated) * rate >= burst:
+                del self._buckets[key]
+
+    def _reject(self, status_code: int, reason: str, detail: str, retry_after: Optional[int] = None) -> Rejection:
+        UPLOADS_REJECTED.labels(reason=reason).inc()
+        return Rejection(status_code, reason, detail, retry_after)
+
+    def admit(self, client: str, content_length: Optional[int]) -> Optional[Rejection]:
+        """Take an upload slot (and reserve `content_length` bytes), or say why not."""
+        limits = self.limits
+        if content_length is not None and content_length > limits.max_bytes:
+            return self._reject(413, "too_large", f"Archive exceeds {limits.max_bytes} bytes")
+        with self._lock:
+            if self.active >= limits.max_concurrent:
+                return self._reject(429, "concurrency", "Too many uploads in progress", limits.retry_after)
+            if not self._fits(content_length or 0):
+                return self._reject(429, "bytes", "Upload capacity exhausted", limits.retry_after)
+            wait = self._take_token(client)
+            if wait is not None:
+                return self._reject(429, "rate", "Too many uploads from this client", wait)
+            self.active += 1
+            self._add_bytes(content_length or 0)
+        return None
+
+    def _fits(self, nbytes: int) -> bool:
+        return self.inflight_bytes + nbytes <= self.limits.max_inflight_bytes
+
+    def _add_bytes(self, nbytes: int) -> None:
+        self.inflight_bytes += nbytes
+        self.peak_inflight_bytes = max(self.peak_inflight_bytes, self.inflight_bytes)
+        UPLOAD_BYTES_IN_FLIGHT.inc(nbytes)
+
+    def reserve(self, nbytes: int) -> bool:
+        """Grow an admitted upload's reservation (body longer than declared / no length)."""
+        with self._lock:
+            if not self._fits(nbytes):
+                return False
+            self._add_bytes(nbytes)
+            return True
+
+    def release(self, nbytes: int) -> None:
+        with self._lock:
+            self.active -= 1
+            self.inflight_bytes -= nbytes
+        UPLOAD_BYTES_IN_FLIGHT.dec(nbytes)
+
+
+def client_key(scope) -> str:
+    for name, value in scope.get("headers") or []:
+        if name == b"x-forwarded-for":
+            return value.decode("latin-1").split(",")[0].strip()
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+def _content_length(scope) -> Optional[int]:
+    for name, value in scope.get("headers") or []:
+        if name == b"content-length":
+            try:
+                return int(value)
+            except ValueError:
+                return None
+    return None
+
+
+class AdmissionMiddleware:
+    """ASGI middleware applying an AdmissionController to (method, path) routes."""
+
+    def __init__(self, app, routes: Collection[Tuple[str, str]], controller: Optional[AdmissionController] = None):
+        self.app = app
+        self.routes = set(routes)
+        self.controller = controller or AdmissionController()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or (scope["method"], scope["path"]) not in self.routes:
+            await self.app(scope, receive, send)
+            return
+
+        controller = self.controller
+        declared = _content_length(scope)
+        rejection = controller.admit(client_key(scope), declared)
+        if rejection is not None:
+            response = JSONResponse({"detail": rejection.detail}, rejection.status_code, rejection.headers())
+            await response(scope, receive, send)
+            return
+
+        reserved = declared or 0
+        received = 0
+
+        async def limited_receive():
+            nonlocal reserved, received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                limits = controller.limits
+                if received > limits.max_bytes:
+                    UPLOADS_REJECTED.labels(reason="too_large").inc()
+                    raise HTTPException(status_code=413, detail=f"Archive exceeds {limits.max_bytes} bytes")
+                if received > reserved:
+                    if not controller.reserve(received - reserved):
+                        UPLOADS_REJECTED.labels(reason="bytes").inc()
+                        raise HTTPException(
+                            status_code=429, detail="Upload capacity exhausted",
+                            headers={"Retry-After": str(limits.retry_after)},
+                        )
+                    reserved = received
+            return message
+
+        uploads = IN_FLIGHT.labels(kind="admitted_uploads")
+        uploads.inc()
+        try:
+            await self.app(scope, limited_receive, send)
+        finally:
+            uploads.dec()
+            controller.release(reserved)
@@ -0,0 +1,67 @@
+"""
+Cooperative cancellation of running jobs.
+
+`POST /jobs/{job_id}:cancel` sets `cancel_requested` on the job document.
+The worker polls the flag through a CancelToken at checkpoints in its
+pipeline (before each OCR chunk and between images) and raises
+JobCancelled there; the job is then finished as CANCELLED with the counts
+of what was checked so far. An OCR call already in progress is not
+interrupted, so at most one more call is spent after the flag is set.
+
+Env:
+    CANCEL_POLL_SECONDS  minimum interval between Firestore reads of the
+                         flag, default 2.0 (0 = read at every checkpoint)
+"""
+
+from __future__ import annotations
+
+import os
+import time
+from typing import Any, Dict, Optional
+
+CANCEL_FIELD = "cancel_requested"
+
+
+class JobCancelled(Exception):
+    """Raised at a checkpoint once the job's cancel flag is set."""
+
+    def __init__(self, job_id: str, partial: Optional[Dict[str, Any]] = None):
+        super().__init__(f"Job {job_id} was cancelled")
+        self.job_id = job_id
+        # Partial job result (counts of what was checked before the checkpoint)
+        self.partial = partial
+
+
+class CancelToken:
+    """Reads a job's cancel flag, at most once per `poll_interval` seconds."""
+
+    def __init__(self, job_id: str, firestore=None, poll_interval: Optional[float] = None, clock=time.monotonic):
+        self.job_id = job_id
+        self._firestore = firestore
+        self.poll_interval = (
+            float(os.environ.get("CANCEL_POLL_SECONDS", "2.0")) if poll_interval is None else poll_interval
+        )
+        self._clock = clock
+        self._last_poll: Optional[float] = None
+        self._cancelled = False
+
+    def _read_flag(self) -> bool:
+        from shared.cloud_clients import get_firestore
+
+        snapshot = (self._firestore or get_firestore()).collection("jobs").document(self.job_id).get()
+        return bool(snapshot.exists and (snapshot.to_dict() or {}).get(CANCEL_FIELD))
+
+    @property
+    def cancelled(self) -> bool:
+        if self._cancelled:
+            return True
+        now = self._clock()
+        if self._last_poll is None or now - self._last_poll >= self.poll_interval:
+            self._last_poll = now
+            self._cancelled = self._read_flag()
+        return self._cancelled
+
+    def check(self) -> None:
+        """Checkpoint: raise JobCancelled if the job was cancelled."""
+        if self.cancelled:
+            raise JobCancelled(self.job_id)
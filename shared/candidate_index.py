@@ -0,0 +1,210 @@
+"""
+Character n-gram inverted index for shortlisting reference sections.
+
+Full campaign briefs can have hundreds of sections, and scoring every one of
+them with SequenceMatcher for every image dominates matching time. The index
+keeps, per reference document, the soft-normalized character n-grams of each
+section and returns the top-K sections by n-gram overlap with the OCR text.
+`select_best_section(..., candidate_index=...)` then applies the full scoring
+only to that shortlist.
+
+N-grams are script-aware:
+  - runs of CJK / kana / hangul / Thai (no word separators) -> character bigrams
+  - everything else -> character trigrams of each space-padded word
+
+Candidates are ranked by an estimate of their full score: the multiset Dice
+coefficient 2*|A∩B| / (|A|+|B|) (which follows SequenceMatcher.ratio(), 2*M/T)
+times the same priority / placeholder / length multipliers the matcher uses.
+
+The estimate alone misses the true winner now and then (SequenceMatcher's
+autojunk makes scores of 200+ char texts erratic, and bag-of-grams can't see
+word order), so the matcher doesn't trust it blindly: after scoring the
+shortlist it also scores every other candidate whose *upper bound* could still
+reach the top two. The bound is SequenceMatcher.quick_ratio() (character
+multiset overlap, always >= ratio()) times the same multipliers. Selection
+results are therefore identical to scoring everything.
+
+Env:
+    CANDIDATE_INDEX_TOP_K           shortlist size, default 20
+    CANDIDATE_INDEX_MIN_CANDIDATES  below this many sections no index is built, default 40
+"""
+
+from __future__ import annotations
+
+import os
+from collections import Counter
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from shared.docx_section_extractor import SectionCandidate
+
+DEFAULT_TOP_K = int(os.environ.get("CANDIDATE_INDEX_TOP_K", "20"))
+MIN_CANDIDATES = int(os.environ.get("CANDIDATE_INDEX_MIN_CANDIDATES", "40"))
+
+# Scripts written without spaces between words
+_UNSPACED_RANGES = (
+    (0x0E00, 0x0E7F),  # Thai
+    (0x3040, 0x30FF),  # Hiragana, Katakana
+    (0x3400, 0x4DBF),  # CJK Extension A
+    (0x4E00, 0x9FFF),  # CJK Unified Ideographs
+    (0xAC00, 0xD7AF),  # Hangul syllables
+    (0xF900, 0xFAFF),  # CJK Compatibility Ideographs
+    (0xFF66, 0xFF9F),  # Halfwidth Katakana
+)
+
+
+def _is_unspaced(ch: str) -> bool:
+    cp = ord(ch)
+    if cp < 0x0E00:
+        return False
+    for lo, hi in _UNSPACED_RANGES:
+        if lo <= cp <= hi:
+            return True
+    return False
+
+
+def _run_grams(run: str, unspaced: bool, out: List[str]) -> None:
+    if unspaced:
+        if len(run) == 1:
+            out.append(run)
+        else:
+            out.extend(run[i:i + 2] for i in range(len(run) - 1))
+    else:
+        padded = f" {run} "
+        out.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+def ngrams(text: str) -> List[str]:
+    """Script-aware character n-grams of an (already soft-normalized) text."""
+    grams: List[str] = []
+    for word in text.split():
+        start = 0
+        unspaced = _is_unspaced(word[0])
+        for i in range(1, len(word)):
+            u = _is_unspaced(word[i])
+            if u != unspaced:
+                _run_grams(word[start:i], unspaced, grams)
+                start, unspaced = i, u
+        _run_grams(word[start:], unspaced, grams)
+    return grams
+
+
+class CandidateIndex:
+    """Inverted n-gram index over the sections of one reference document."""
+
+    def __init__(
+        self,
+        candidates: Sequence[SectionCandidate],
+        normalize_soft_fn: Callable[[str], str],
+        top_k: int = DEFAULT_TOP_K,
+    ):
+        from shared.reference_matcher import _length_units, _remove_cta_brackets, _static_multiplier
+
+        self.candidates = list(candidates)
+        self.top_k = top_k
+        self._postings: Dict[str, List[Tuple[int, int]]] = {}
+        self._sizes: List[int] = []
+        self._multipliers: List[float] = []
+        self._lengths: List[int] = []
+        self._chars: List[Counter] = []
+        self._soft_lens: List[int] = []
+        for pos, candidate in enumerate(self.candidates):
+            soft = normalize_soft_fn(_remove_cta_brackets(candidate.content_text))
+            counts = Counter(ngrams(soft))
+            self._sizes.append(sum(counts.values()))
+            self._multipliers.append(_static_multiplier(candidate))
+            self._lengths.append(_length_units(soft, candidate.language))
+            self._chars.append(Counter(soft))
+            self._soft_lens.append(len(soft))
+            for gram, n in counts.items():
+                self._postings.setdefault(gram, []).append((pos, n))
+        self._positions = {id(c): pos for pos, c in enumerate(self.candidates)}
+
+    def __len__(self) -> int:
+        return len(self.candidates)
+
+    def scores(self, ocr_soft: str) -> Optional[List[float]]:
+        """Estimated score of every candidate (None if the OCR has no n-grams)."""
+        from shared.reference_matcher import _get_length_mismatch_penalty, _length_units
+
+        query = Counter(ngrams(ocr_soft))
+        if not query:
+            return None
+        overlap = [0] * len(self.candidates)
+        for gram, qn in query.items():
+            for pos, cn in self._postings.get(gram, ()):
+                overlap[pos] += qn if qn < cn else cn
+        q_size = sum(query.values())
+        ocr_lens: Dict[str, int] = {}
+        estimates = []
+        for pos, candidate in enumerate(self.candidates):
+            language = candidate.language
+            if language not in ocr_lens:
+                ocr_lens[language] = _length_units(ocr_soft, language)
+            dice = 2.0 * overlap[pos] / (q_size + self._sizes[pos])
+            estimates.append(
+                dice * self._multipliers[pos] * _get_length_mismatch_penalty(ocr_lens[language], self._lengths[pos])
+            )
+        return estimates
+
+    def upper_bound(self, candidate: SectionCandidate, ocr_soft: str, ocr_chars: Optional[Counter] = None) -> float:
+        """Upper bound of the matcher's score for `candidate` (quick_ratio x multipliers)."""
+        from shared.reference_matcher import _get_length_mismatch_penalty, _length_units
+
+        pos = self._positions[id(candidate)]
+        if ocr_chars is None:
+            ocr_chars = Counter(ocr_soft)
+        total = len(ocr_soft) + self._soft_lens[pos]
+        if not total:
+            return 1.0
+        cand_chars = self._chars[pos]
+        common = sum(n if n < cand_chars[ch] else cand_chars[ch] for ch, n in ocr_chars.items() if ch in cand_chars)
+        mismatch = _get_length_mismatch_penalty(_length_units(ocr_soft, candidate.language), self._lengths[pos])
+        return min(2.0 * common / total * self._multipliers[pos] * mismatch, 1.0)
+
+    def shortlist(
+        self,
+        ocr_soft: str,
+        among: Optional[Iterable[SectionCandidate]] = None,
+        k: Optional[int] = None,
+    ) -> Optional[List[SectionCandidate]]:
+        """
+        Top-k candidates by estimated score, in their original document order.
+
+        Args:
+            ocr_soft: Soft-normalized OCR text
+            among: Restrict to these candidates (must come from the indexed list)
+            k: Shortlist size (defaults to the index's top_k)
+
+        Returns:
+            The shortlist, or None when the index can't rank (empty OCR, or a
+            candidate that isn't indexed) and the caller should score everything.
+        """
+        k = self.top_k if k is None else k
+        if among is None:
+            positions = range(len(self.candidates))
+        else:
+            positions = []
+            for c in among:
+                pos = self._positions.get(id(c))
+                if pos is None:
+                    return None
+                positions.append(pos)
+        if len(positions) <= k:
+            return None
+        scores = self.scores(ocr_soft)
+        if scores is None:
+            return None
+        best = sorted(positions, key=lambda p: scores[p], reverse=True)[:k]
+        return [self.candidates[p] for p in sorted(best)]
+
+
+def build_candidate_index(
+    candidates: Sequence[SectionCandidate],
+    normalize_soft_fn: Callable[[str], str],
+    top_k: int = DEFAULT_TOP_K,
+    min_candidates: int = MIN_CANDIDATES,
+) -> Optional[CandidateIndex]:
+    """Build an index when the document is big enough for it to pay off, else None."""
+    if len(candidates) < max(min_candidates, top_k + 1):
+        return None
+    return CandidateIndex(candidates, normalize_soft_fn, top_k=top_k)
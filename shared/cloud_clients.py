@@ -0,0 +1,89 @@
+"""
+Lazily constructed Google Cloud clients.
+
+Clients (and the google-cloud packages themselves) are created on first use
+instead of at import time, so a cold start only pays for what the first
+request needs and a missing credential surfaces as a failed request rather
+than a container that never starts listening on $PORT.
+
+Tests and the load-test harness can swap in stand-ins with `override_clients`.
+With STORAGE_LOCAL_DIR set, storage is a local-filesystem stand-in
+(shared.local_storage) instead of Cloud Storage.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from typing import Any, Callable, Dict, Optional
+
+GCP_PROJECT_ID = "project-d245d8c8-8548-47d2-a04"
+
+_clients: Dict[str, Any] = {}
+_lock = threading.Lock()
+
+
+def _get(name: str, factory: Callable[[], Any]) -> Any:
+    client = _clients.get(name)
+    if client is None:
+        with _lock:
+            client = _clients.get(name)
+            if client is None:
+                client = factory()
+                _clients[name] = client
+    return client
+
+
+def _firestore():
+    from google.cloud import firestore
+
+    return firestore.Client(project=GCP_PROJECT_ID)
+
+
+def _storage():
+    local_dir = os.environ.get("STORAGE_LOCAL_DIR")
+    if local_dir:
+        from shared.local_storage import LocalStorage
+
+        return LocalStorage(local_dir)
+
+    from google.cloud import storage
+
+    return storage.Client(project=GCP_PROJECT_ID)
+
+
+def _publisher():
+    from google.cloud import pubsub_v1
+
+    return pubsub_v1.PublisherClient()
+
+
+def get_firestore():
+    return _get("firestore", _firestore)
+
+
+def get_storage():
+    return _get("storage", _storage)
+
+
+def get_publisher():
+    return _get("publisher", _publisher)
+
+
+def override_clients(
+    *,
+    firestore: Optional[Any] = None,
+    storage: Optional[Any] = None,
+    publisher: Optional[Any] = None,
+) -> None:
+    """Install pre-built clients (e.g. in-memory stand-ins)."""
+    with _lock:
+        for name, client in (("firestore", firestore), ("storage", storage), ("publisher", publisher)):
+            if client is not None:
+                _clients[name] = client
+
+
+def reset_clients() -> None:
+    """Forget all clients; the next use builds real ones again."""
+    with _lock:
+        _clients.clear()
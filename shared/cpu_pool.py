@@ -0,0 +1,292 @@
+"""
+Process-pool offload for CPU-bound DOCX parsing and matching.
+
+python-docx parsing and select_best_sections_batch are pure CPU work; run in
+the request thread they hold the GIL, so one container uses one core no
+matter how many vCPUs it has. `CpuPool` runs them in a process pool sized to
+the CPUs the container may actually use (affinity mask and cgroup quota), and
+keeps small inputs in-thread where pickling + IPC would cost more than the
+work itself.
+
+Only compact tuples cross the process boundary:
+  candidate record: (header_text, content_text, section_number, section_name)
+  selection record: (chosen_pos, score_top1, score_top2, delta, warnings, manual_required)
+and the parent rebuilds SectionCandidate / SelectionResult objects around its
+own candidate list (chosen_text is re-derived from the chosen candidate).
+
+Env:
+    CPU_POOL_WORKERS        pool size; default = usable CPUs, 0/1 disables the pool
+    CPU_POOL_MIN_DOCX_BYTES offload DOCX parsing from this size, default 65536
+    CPU_POOL_MIN_CELLS      offload matching from images x candidates, default 2000
+    CPU_POOL_START_METHOD   multiprocessing start method, default forkserver
+"""
+
+from __future__ import annotations
+
+import functools
+import math
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Sequence, Tuple
+
+from shared.docx_section_extractor import SectionCandidate
+from shared.metrics import DOCX_PARSE_SECONDS, MATCH_SECONDS_PER_CANDIDATE
+from shared.tracing import span
+
+CandidateRecord = Tuple[Optional[str], str, Optional[str], Optional[str]]
+SelectionRecord = Tuple[Optional[int], float, float, float, List[str], bool]
+
+
+def available_cpus() -> int:
+    """CPUs this process may use: affinity mask, capped by a cgroup CPU quota."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:  # pragma: no cover - non-Linux
+        cpus = os.cpu_count() or 1
+    quota = _cgroup_cpu_quota()
+    if quota is not None:
+        cpus = min(cpus, max(1, math.ceil(quota)))
+    return max(cpus, 1)
+
+
+def _cgroup_cpu_quota() -> Optional[float]:
+    # cgroup v2: "max 100000" or "200000 100000"
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()[:2]
+        return None if quota == "max" else int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    # cgroup v1
+    try:
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+            quota_us = int(f.read())
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+            period_us = int(f.read())
+        return None if quota_us <= 0 else quota_us / period_us
+    except (OSError, ValueError):
+        return None
+
+
+def to_records(candidates: Sequence[SectionCandidate]) -> List[CandidateRecord]:
+    return [(c.header_text, c.content_text, c.section_number, c.section_name) for c in candidates]
+
+
+def from_records(records: Sequence[CandidateRecord], source_path: str, language: str) -> List[SectionCandidate]:
+    return [
+        SectionCandidate(
+            header_text=header,
+            content_text=content,
+            source_path=source_path,
+            language=language,
+            section_number=number,
+            section_name=name,
+        )
+        for header, content, number, name in records
+    ]
+
+
+# --- functions executed in pool processes -------------------------------------
+
+def selection_to_record(result, positions) -> SelectionRecord:
+    """Compact form of a SelectionResult; `positions` maps id(candidate) -> index."""
+    chosen = positions[id(result.chosen_section)] if result.chosen_section is not None else None
+    return (chosen, result.score_top1, result.score_top2, result.delta, result.warnings, result.manual_required)
+
+
+def selection_from_record(record: SelectionRecord, candidates: Sequence[SectionCandidate]):
+    """SelectionResult around the parent's own candidate list."""
+    from shared.reference_matcher import SelectionResult, _remove_cta_brackets
+
+    pos, top1, top2, delta, warnings, manual = record
+    chosen = candidates[pos] if pos is not None else None
+    return SelectionResult(
+        chosen_section=chosen,
+        chosen_text=_remove_cta_brackets(chosen.content_text) if chosen else "",
+        score_top1=top1,
+        score_top2=top2,
+        delta=delta,
+        warnings=list(warnings),
+        manual_required=manual,
+        chosen_section_name=chosen.section_name if chosen else None,
+        chosen_section_number=chosen.section_number if chosen else None,
+    )
+
+
+def _parse_task(docx_bytes: bytes, filename: str, language: str) -> List[CandidateRecord]:
+    from shared.docx_section_extractor import extract_section_candidates
+
+    return to_records(extract_section_candidates(docx_bytes, filename, language))
+
+
+@functools.lru_cache(maxsize=8)
+def _child_reference(
+    records: Tuple[CandidateRecord, ...], source_path: str, language: str, with_index: bool,
+):
+    """(candidates, index) rebuilt in the worker process, kept for the next batch of the same document."""
+    from shared.candidate_index import build_candidate_index
+    from worker.normalization import normalize_soft_cached
+
+    candidates = from_records(records, source_path, language)
+    # The index is keyed by id(candidate), so it can't cross the process boundary; it is rebuilt here
+    index = build_candidate_index(candidates, normalize_soft_cached) if with_index else None
+    return candidates, index
+
+
+def _select_task(
+    ocr_texts: List[str],
+    records: List[CandidateRecord],
+    source_path: str,
+    language: str,
+    section_number: Optional[str],
+    section_name: Optional[str],
+    similarity_backend: str,
+    with_index: bool = False,
+) -> List[SelectionRecord]:
+    from shared.reference_matcher import select_best_sections_batch
+    from shared.similarity import BACKENDS, get_similarity_backend, set_similarity_backend
+    from worker.normalization import normalize_soft_cached, normalize_strict_cached
+
+    if get_similarity_backend().name != similarity_backend:
+        set_similarity_backend(BACKENDS[similarity_backend]())
+    candidates, candidate_index = _child_reference(tuple(map(tuple, records)), source_path, language, with_index)
+    positions = {id(c): pos for pos, c in enumerate(candidates)}
+    results = select_best_sections_batch(
+        ocr_texts, candidates, normalize_strict_cached, normalize_soft_cached,
+        section_number=section_number, section_name=section_name, candidate_index=candidate_index,
+    )
+    return [selection_to_record(r, positions) for r in results]
+
+
+def _noop() -> None:
+    return None
+
+
+# --- parent side --------------------------------------------------------------
+
+class CpuPool:
+    """Runs DOCX parsing / batched matching in worker processes when it pays off."""
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        min_docx_bytes: Optional[int] = None,
+        min_cells: Optional[int] = None,
+        start_method: Optional[str] = None,
+    ):
+        env = os.environ
+        self.workers = int(env.get("CPU_POOL_WORKERS", available_cpus())) if workers is None else workers
+        self.min_docx_bytes = int(env.get("CPU_POOL_MIN_DOCX_BYTES", "65536")) if min_docx_bytes is None else min_docx_bytes
+        self.min_cells = int(env.get("CPU_POOL_MIN_CELLS", "2000")) if min_cells is None else min_cells
+        self.start_method = start_method or env.get("CPU_POOL_START_METHOD", "forkserver")
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.offloaded = 0
+        self.inline = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.workers > 1
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context(self.start_method),
+                    )
+        return self._executor
+
+    def start(self) -> None:
+        """Spawn the worker processes now (warm-up) instead of on first use."""
+        if self.enabled:
+            pool = self._pool()
+            for future in [pool.submit(_noop) for _ in range(self.workers)]:
+                future.result()
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True, cancel_futures=True)
+                self._executor = None
+
+    def _count(self, offloaded: bool) -> None:
+        with self._lock:
+            if offloaded:
+                self.offloaded += 1
+            else:
+                self.inline += 1
+
+    def parse_reference(self, docx_bytes: bytes, filename: str, language: str) -> List[SectionCandidate]:
+        """extract_section_candidates, in a worker process for large DOCX files."""
+        if not self.enabled or len(docx_bytes) < self.min_docx_bytes:
+            from shared.docx_section_extractor import extract_section_candidates
+
+            self._count(False)
+            return extract_section_candidates(docx_bytes, filename, language)
+
+        self._count(True)
+        started = time.perf_counter()
+        with span("docx_parse"):
+            records = self._pool().submit(_parse_task, docx_bytes, filename, language).result()
+        DOCX_PARSE_SECONDS.observe(time.perf_counter() - started)
+        return from_records(records, filename, language)
+
+    def select_batch(
+        self,
+        ocr_texts: Sequence[str],
+        candidates: List[SectionCandidate],
+        section_number: Optional[str] = None,
+        section_name: Optional[str] = None,
+        candidate_index=None,
+    ):
+        """select_best_sections_batch, in a worker process for large images x candidates."""
+        from shared.reference_matcher import select_best_sections_batch
+        from worker.normalization import normalize_soft_cached, normalize_strict_cached
+
+        if not self.enabled or len(ocr_texts) * len(candidates) < self.min_cells:
+            self._count(False)
+            return select_best_sections_batch(
+                ocr_texts, candidates, normalize_strict_cached, normalize_soft_cached,
+                section_number=section_number, section_name=section_name, candidate_index=candidate_index,
+            )
+
+        from shared.similarity import get_similarity_backend
+
+        self._count(True)
+        first = candidates[0]
+        started = time.perf_counter()
+        with span("match_batch"):
+            records = self._pool().submit(
+                _select_task, list(ocr_texts), to_records(candidates), first.source_path, first.language,
+                section_number, section_name, get_similarity_backend().name, candidate_index is not None,
+            ).result()
+        MATCH_SECONDS_PER_CANDIDATE.observe((time.perf_counter() - started) / max(len(ocr_texts) * len(candidates), 1))
+        return [selection_from_record(record, candidates) for record in records]
+
+
+_pool: Optional[CpuPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_cpu_pool() -> CpuPool:
+    """Process-wide pool, configured from env on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = CpuPool()
+    return _pool
+
+
+def set_cpu_pool(pool: Optional[CpuPool]) -> None:
+    """Replace the process-wide pool (None resets to env configuration)."""
+    global _pool
+    with _pool_lock:
+        old, _pool = _pool, pool
+    if old is not None and old is not pool:
+        old.shutdown()
@@ -11,9 +11,13 @@ import re
 from dataclasses import dataclass
 from typing import List, Optional
 
-from docx import Document
-from docx.oxml.table import CT_Tbl
-from docx.oxml.text.paragraph import CT_P
+from shared.metrics import DOCX_PARSE_SECONDS
+from shared.tracing import span, traced
+
+
+# Bump whenever extraction/segmentation output can change for the same DOCX
+# (invalidates persisted reference-store entries, see shared.reference_store).
+EXTRACTOR_VERSION = "1"
 
 
 @dataclass
@@ -53,6 +57,11 @@ def _extract_text_from_docx(docx_bytes: bytes) -> List[str]:
     
     Returns list of text lines in document order.
     """
+    # Deferred: python-docx/lxml dominate import time and only jobs need them
+    from docx import Document
+    from docx.oxml.table import CT_Tbl
+    from docx.oxml.text.paragraph import CT_P
+
     doc = Document(io.BytesIO(docx_bytes))
     lines = []
     
@@ -190,6 +199,8 @@ def _segment_by_blank_lines(lines: List[str]) -> List[tuple[Optional[str], List[
     return sections
 
 
+@traced("docx_parse")
+@DOCX_PARSE_SECONDS.time()
 def extract_section_candidates(
     docx_bytes: bytes,
     source_path: str,
@@ -206,7 +217,8 @@ def extract_section_candidates(
     Returns:
         List of SectionCandidate objects
     """
-    lines = _extract_text_from_docx(docx_bytes)
+    with span("load"):
+        lines = _extract_text_from_docx(docx_bytes)
     
     if not lines:
         return []
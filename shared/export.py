@@ -0,0 +1,223 @@
+"""
+Streaming report export of per-image results (CSV, NDJSON, XLSX).
+
+Every writer takes an iterator of result dicts and yields byte chunks of
+roughly CHUNK_BYTES, holding one chunk in memory regardless of the number
+of rows. XLSX is written without a spreadsheet library: the workbook is a
+zip whose single worksheet is streamed row by row with inline strings
+(zipfile writes data descriptors when the output isn't seekable).
+
+Row layout (EXPORT_COLUMNS) flattens SelectionResult.to_dict() next to the
+image/OCR/reference fields; warnings are joined with "; ".
+"""
+
+from __future__ import annotations
+
+import csv
+import io
+import json
+import re
+import zipfile
+import zlib
+from typing import Any, Dict, Iterable, Iterator, List, Mapping
+from xml.sax.saxutils import escape
+
+CHUNK_BYTES = 64 * 1024
+
+EXPORT_COLUMNS: List[str] = [
+    "image",
+    "status",
+    "match",
+    "manual_required",
+    "reference",
+    "ocr",
+    "chosen_section_number",
+    "chosen_section_name",
+    "score_top1",
+    "score_top2",
+    "delta",
+    "warnings",
+    "reused",
+]
+
+CONTENT_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+# Excel's per-cell limit
+_XLSX_MAX_CELL = 32767
+# Characters XML 1.0 does not allow
+_XML_INVALID = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]")
+
+
+def export_row(result: Mapping[str, Any]) -> Dict[str, Any]:
+    """One flat export row for a stored per-image result."""
+    selection = result.get("selection") or {}
+    manual = bool(selection.get("manual_required"))
+    return {
+        "image": result.get("image"),
+        "status": "PASS" if result.get("match") and not manual else "MANUAL",
+        "match": bool(result.get("match")),
+        "manual_required": manual,
+        "reference": result.get("reference"),
+        "ocr": result.get("ocr"),
+        "chosen_section_number": selection.get("chosen_section_number"),
+        "chosen_section_name": selection.get("chosen_section_name"),
+        "score_top1": selection.get("score_top1"),
+        "score_top2": selection.get("score_top2"),
+        "delta": selection.get("delta"),
+        "warnings": "; ".join(selection.get("warnings") or []),
+        "reused": bool(result.get("reused")),
+    }
+
+
+def _chunked(pieces: Iterable[bytes]) -> Iterator[bytes]:
+    buf: List[bytes] = []
+    size = 0
+    for piece in pieces:
+        buf.append(piece)
+        size += len(piece)
+        if size >= CHUNK_BYTES:
+            yield b"".join(buf)
+            buf, size = [], 0
+    if buf:
+        yield b"".join(buf)
+
+
+def ndjson_chunks(results: Iterable[Mapping[str, Any]]) -> Iterator[bytes]:
+    """Stored results as-is, one JSON object per line."""
+    return _chunked((json.dumps(r, ensure_ascii=False) + "\n").encode("utf-8") for r in results)
+
+
+def csv_chunks(results: Iterable[Mapping[str, Any]]) -> Iterator[bytes]:
+    """UTF-8 CSV with a BOM (so Excel detects the encoding) and a header row."""
+    out = io.StringIO()
+    writer = csv.DictWriter(out, fieldnames=EXPORT_COLUMNS, extrasaction="ignore")
+
+    def pieces() -> Iterator[bytes]:
+        yield "\ufeff".encode("utf-8")
+        writer.writeheader()
+        for result in results:
+            writer.writerow(export_row(result))
+            if out.tell() >= CHUNK_BYTES:
+                yield out.getvalue().encode("utf-8")
+                out.seek(0)
+                out.truncate()
+        yield out.getvalue().encode("utf-8")
+
+    return _chunked(pieces())
+
+
+# --- XLSX ---------------------------------------------------------------------
+
+_XLSX_STATIC = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        "</Types>"
+    ),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        "</Relationships>"
+    ),
+    "xl/workbook.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Results" sheetId="1" r:id="rId1"/></sheets>'
+        "</workbook>"
+    ),
+    "xl/_rels/workbook.xml.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        "</Relationships>"
+    ),
+}
+
+
+def _xlsx_cell(value: Any) -> str:
+    if value is None or value == "":
+        return "<c/>"
+    if isinstance(value, bool):
+        return f'<c t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float)):
+        return f"<c><v>{value!r}</v></c>"
+    text = _XML_INVALID.sub("", str(value))[:_XLSX_MAX_CELL]
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{escape(text)}</t></is></c>'
+
+
+def _xlsx_row(values: Iterable[Any]) -> bytes:
+    return ("<row>" + "".join(_xlsx_cell(v) for v in values) + "</row>").encode("utf-8")
+
+
+class _Spool(io.RawIOBase):
+    """Write-only, non-seekable target that hands out what was written so far."""
+
+    def __init__(self):
+        self._parts: List[bytes] = []
+        self.size = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        self._parts.append(bytes(b))
+        self.size += len(b)
+        return len(b)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts = []
+        self.size = 0
+        return data
+
+
+def xlsx_chunks(results: Iterable[Mapping[str, Any]]) -> Iterator[bytes]:
+    """Single-sheet workbook, header row + one row per result."""
+    spool = _Spool()
+    with zipfile.ZipFile(spool, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for name, xml in _XLSX_STATIC.items():
+            zf.writestr(name, xml)
+        with zf.open("xl/worksheets/sheet1.xml", "w", force_zip64=True) as sheet:
+            sheet.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+            )
+            sheet.write(_xlsx_row(EXPORT_COLUMNS))
+            for result in results:
+                row = export_row(result)
+                sheet.write(_xlsx_row(row[c] for c in EXPORT_COLUMNS))
+                if spool.size >= CHUNK_BYTES:
+                    yield spool.drain()
+            sheet.write(b"</sheetData></worksheet>")
+    tail = spool.drain()
+    if tail:
+        yield tail
+
+
+WRITERS = {"csv": csv_chunks, "ndjson": ndjson_chunks, "xlsx": xlsx_chunks}
+
+
+def gzip_chunks(chunks: Iterable[bytes], level: int = 6) -> Iterator[bytes]:
+    """gzip-compress a chunk stream on the fly."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
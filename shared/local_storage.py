@@ -0,0 +1,145 @@
+"""
+Local-filesystem stand-in for the Cloud Storage client.
+
+Buckets are directories under a root, objects are files; only the subset of
+the google-cloud-storage API this project uses is implemented (blob open /
+upload / download with byte ranges / exists / size / delete / list).
+Writes go to a temporary file that is renamed into place on close, so
+readers never see a half-written object.
+
+Enable with STORAGE_LOCAL_DIR=<dir> (see shared.cloud_clients) for local
+development without GCS, or pass an instance to `override_clients`.
+"""
+
+from __future__ import annotations
+
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import List, Optional
+
+_COPY_CHUNK = 1024 * 1024
+
+
+class _AtomicWriter:
+    """Binary file that becomes the object only when closed without error."""
+
+    def __init__(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, self._tmp = tempfile.mkstemp(dir=path.parent, prefix=".upload-")
+        self._file = os.fdopen(fd, "wb")
+        self._path = path
+
+    def write(self, data) -> int:
+        return self._file.write(data)
+
+    def flush(self) -> None:
+        self._file.flush()
+
+    def writable(self) -> bool:
+        return True
+
+    @property
+    def closed(self) -> bool:
+        return self._file.closed
+
+    def close(self) -> None:
+        if not self._file.closed:
+            self._file.close()
+            os.replace(self._tmp, self._path)
+
+    def __enter__(self) -> "_AtomicWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self._file.close()
+            os.remove(self._tmp)
+
+
+class LocalBlob:
+    def __init__(self, bucket: "LocalBucket", name: str):
+        self.bucket = bucket
+        self.name = name
+        self.path = bucket.root / name
+
+    def _require(self) -> Path:
+        if not self.path.is_file():
+            raise FileNotFoundError(f"gs://{self.bucket.name}/{self.name}")
+        return self.path
+
+    @property
+    def size(self) -> Optional[int]:
+        return self.path.stat().st_size if self.path.is_file() else None
+
+    def exists(self) -> bool:
+        return self.path.is_file()
+
+    def open(self, mode: str = "rb"):
+        if "w" in mode:
+            return _AtomicWriter(self.path)
+        return open(self._require(), "rb")
+
+    def upload_from_string(self, data, content_type: Optional[str] = None) -> None:
+        with self.open("wb") as f:
+            f.write(data.encode("utf-8") if isinstance(data, str) else data)
+
+    def upload_from_file(self, file_obj, content_type: Optional[str] = None) -> None:
+        with self.open("wb") as f:
+            shutil.copyfileobj(file_obj, f, _COPY_CHUNK)
+
+    def upload_from_filename(self, filename: str, content_type: Optional[str] = None) -> None:
+        with open(filename, "rb") as src:
+            self.upload_from_file(src)
+
+    def download_to_file(self, file_obj) -> None:
+        with open(self._require(), "rb") as src:
+            shutil.copyfileobj(src, file_obj, _COPY_CHUNK)
+
+    def download_as_bytes(self, start: Optional[int] = None, end: Optional[int] = None) -> bytes:
+        # Like GCS: `end` is inclusive; only the requested range is read
+        with open(self._require(), "rb") as f:
+            f.seek(start or 0)
+            return f.read() if end is None else f.read(end + 1 - (start or 0))
+
+    def delete(self) -> None:
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class LocalBucket:
+    def __init__(self, storage: "LocalStorage", name: str):
+        self.name = name
+        self.root = storage.root / name
+
+    def blob(self, name: str) -> LocalBlob:
+        return LocalBlob(self, name)
+
+    def list_blobs(self, prefix: str = "") -> List[LocalBlob]:
+        if not self.root.is_dir():
+            return []
+        names = sorted(
+            p.relative_to(self.root).as_posix()
+            for p in self.root.rglob("*")
+            if p.is_file() and not p.name.startswith(".upload-")
+        )
+        return [LocalBlob(self, n) for n in names if n.startswith(prefix)]
+
+
+class LocalStorage:
+    """Storage client whose buckets are directories under `root`."""
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+
+    def bucket(self, name: str) -> LocalBucket:
+        return LocalBucket(self, name)
+
+    def list_blobs(self, bucket_or_name, prefix: str = "") -> List[LocalBlob]:
+        bucket = bucket_or_name if isinstance(bucket_or_name, LocalBucket) else self.bucket(bucket_or_name)
+        return bucket.list_blobs(prefix=prefix)
@@ -0,0 +1,166 @@
+"""
+Content manifests for incremental re-checks against a previous job.
+
+Each job stores a manifest of what it checked: per image the SHA-256 of the
+image bytes and of its reference file (DOCX bytes, else reference text), plus
+the job-wide inputs that affect a result (section hints, matcher version).
+A job created with `base_job_id` diffs its manifest against the base job's
+and reuses the base job's stored per-image result when image hash, reference
+hash and language are unchanged and the job-wide inputs are identical; only
+the remaining images are OCR'd and matched.
+
+Reuse is by content, not by path, so renamed images are reused too.
+
+Manifests live next to the uploaded archive: gs://<bucket>/jobs/<job_id>/manifest.json
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+from shared.docx_section_extractor import EXTRACTOR_VERSION
+
+MANIFEST_VERSION = 1
+
+# (image_sha256, reference_sha256, language)
+ContentKey = Tuple[str, str, str]
+
+
+def job_manifest_path(job_id: str) -> str:
+    return f"jobs/{job_id}/manifest.json"
+
+
+def matcher_version() -> str:
+    """Everything besides the inputs that can change a stored per-image result."""
+    from shared.ocr_backends import get_ocr_backend
+    from shared.selection_cache import matcher_fingerprint
+    from worker.normalization import NORMALIZATION_VERSION
+
+    # The fingerprint covers matcher/extractor source, so code changes invalidate reuse too
+    return f"x{EXTRACTOR_VERSION}-n{NORMALIZATION_VERSION}-{matcher_fingerprint()}-{get_ocr_backend().name}"
+
+
+def _sha256_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+@dataclass
+class Manifest:
+    section_number: Optional[str]
+    section_name: Optional[str]
+    matcher_version: str
+    # img_path -> {"image_sha256", "reference_sha256", "language"}
+    images: Dict[str, Dict[str, str]] = field(default_factory=dict)
+
+    def key(self, img_path: str) -> ContentKey:
+        entry = self.images[img_path]
+        return entry["image_sha256"], entry["reference_sha256"], entry["language"]
+
+    def compatible_with(self, other: "Manifest") -> bool:
+        return (
+            self.matcher_version == other.matcher_version
+            and self.section_number == other.section_number
+            and self.section_name == other.section_name
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "version": MANIFEST_VERSION,
+            "section_number": self.section_number,
+            "section_name": self.section_name,
+            "matcher_version": self.matcher_version,
+            "images": self.images,
+        }
+
+    @classmethod
+    def from_dict(cls, raw: Mapping[str, Any]) -> "Manifest":
+        if raw.get("version") != MANIFEST_VERSION:
+            raise ValueError(f"Unsupported manifest version: {raw.get('version')!r}")
+        return cls(
+            section_number=raw.get("section_number"),
+            section_name=raw.get("section_name"),
+            matcher_version=raw["matcher_version"],
+            images=dict(raw["images"]),
+        )
+
+
+def build_manifest(
+    matches: Sequence[Sequence[Any]],
+    section_number: Optional[str],
+    section_name: Optional[str],
+    version: Optional[str] = None,
+) -> Manifest:
+    """Manifest of parse_zip_streaming extended tuples (images are hashed from disk)."""
+    manifest = Manifest(section_number, section_name, version or matcher_version())
+    # Many images share one reference object; hash each once (matches keeps them alive)
+    ref_hashes: Dict[Any, str] = {}
+    for img_path, img_file_path, ref_text, ref_bytes, language in matches:
+        ref_id = id(ref_bytes) if ref_bytes else ref_text or ""
+        ref_hash = ref_hashes.get(ref_id)
+        if ref_hash is None:
+            ref = ref_bytes if ref_bytes else (ref_text or "").encode("utf-8")
+            ref_hash = ref_hashes[ref_id] = hashlib.sha256(ref).hexdigest()
+        manifest.images[img_path] = {
+            "image_sha256": _sha256_file(img_file_path),
+            "reference_sha256": ref_hash,
+            "language": language,
+        }
+    return manifest
+
+
+def reuse_plan(current: Manifest, base: Optional[Manifest]) -> Dict[ContentKey, List[str]]:
+    """Content key -> current images with that content, for the keys the base job also checked."""
+    if base is None or not current.compatible_with(base):
+        return {}
+    base_keys = {base.key(img_path) for img_path in base.images}
+    plan: Dict[ContentKey, List[str]] = {}
+    for img_path in current.images:
+        key = current.key(img_path)
+        if key in base_keys:
+            plan.setdefault(key, []).append(img_path)
+    return plan
+
+
+def iter_reused(plan: Dict[ContentKey, List[str]], base: Manifest, base_rows: Iterable[dict]) -> Iterator[dict]:
+    """
+    Reused results for the current images, streamed from the base job's rows.
+
+    Rows whose content is not in `plan` are dropped as they are read, so only
+    the reused results are ever held. The first row per content key wins; the
+    plan is consumed, and reading stops once every key has been found.
+    """
+    if not plan:
+        return
+    for row in base_rows:
+        img_path = row.get("image")
+        if img_path not in base.images:
+            continue
+        for reused_path in plan.pop(base.key(img_path), ()):
+            yield dict(row, image=reused_path, reused=True)
+        if not plan:
+            return
+
+
+def save_manifest(bucket, job_id: str, manifest: Manifest) -> None:
+    bucket.blob(job_manifest_path(job_id)).upload_from_string(
+        json.dumps(manifest.to_dict(), ensure_ascii=False, separators=(",", ":")),
+        content_type="application/json",
+    )
+
+
+def load_manifest(bucket, job_id: str) -> Optional[Manifest]:
+    """Base job's manifest, or None if it has none (older job, failed before matching)."""
+    try:
+        data = bucket.blob(job_manifest_path(job_id)).download_as_bytes()
+    except Exception as e:
+        if type(e).__name__ in ("NotFound", "FileNotFoundError"):
+            return None
+        raise
+    return Manifest.from_dict(json.loads(data))
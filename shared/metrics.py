@@ -0,0 +1,113 @@
+"""
+Prometheus metrics shared by the checker and the worker.
+
+Both services expose `GET /metrics`. Updates are plain prometheus_client
+counter/histogram operations (a lock and an add), cheap enough for the
+per-image hot path.
+
+Multiple uvicorn workers: set PROMETHEUS_MULTIPROC_DIR to an empty,
+writable directory before the processes start. prometheus_client then
+keeps per-process values in mmap'ed files and `/metrics` aggregates them
+(gauges are summed over live processes). Without the variable, the
+default in-process registry is used.
+"""
+
+from __future__ import annotations
+
+import functools
+import os
+import time
+from contextlib import contextmanager
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+)
+
+# Latency buckets sized for API calls / DOCX parsing (seconds)
+_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Per-candidate matching cost is much smaller
+_PER_CANDIDATE_BUCKETS = (1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 5e-3, 1e-2)
+
+JOBS_TOTAL = Counter("ocr_jobs_total", "Jobs by status transition", ["status"])
+IMAGES_PROCESSED = Counter("ocr_images_processed_total", "Images checked, by outcome", ["outcome"])
+IMAGES_SKIPPED = Counter("ocr_images_skipped_total", "Images left unchecked by the per-job OCR budget")
+OCR_LATENCY = Histogram("ocr_backend_latency_seconds", "OCR call latency", ["backend"], buckets=_LATENCY_BUCKETS)
+OCR_ERRORS = Counter("ocr_backend_errors_total", "OCR calls that failed or returned an API error", ["backend"])
+CACHE_REQUESTS = Counter("ocr_cache_requests_total", "Cache lookups", ["cache", "result"])
+DOCX_PARSE_SECONDS = Histogram("ocr_docx_parse_seconds", "extract_section_candidates duration", buckets=_LATENCY_BUCKETS)
+MATCH_SECONDS_PER_CANDIDATE = Histogram(
+    "ocr_match_seconds_per_candidate",
+    "select_best_section duration divided by candidate count",
+    buckets=_PER_CANDIDATE_BUCKETS,
+)
+BYTES_DOWNLOADED = Counter("ocr_bytes_downloaded_total", "Archive bytes downloaded from storage")
+BYTES_UPLOADED = Counter("ocr_bytes_uploaded_total", "Archive bytes received from clients")
+IN_FLIGHT = Gauge("ocr_in_flight", "Work currently in progress", ["kind"], multiprocess_mode="livesum")
+UPLOAD_BYTES_IN_FLIGHT = Gauge(
+    "ocr_upload_bytes_in_flight", "Upload bytes admitted and not yet released", multiprocess_mode="livesum"
+)
+UPLOADS_REJECTED = Counter("ocr_uploads_rejected_total", "Uploads refused by admission control", ["reason"])
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    CACHE_REQUESTS.labels(cache=cache, result="hit" if hit else "miss").inc()
+
+
+@contextmanager
+def in_flight(kind: str):
+    gauge = IN_FLIGHT.labels(kind=kind)
+    gauge.inc()
+    try:
+        yield
+    finally:
+        gauge.dec()
+
+
+@contextmanager
+def observe_ocr(backend: str):
+    """Time one OCR call; exceptions count as errors and propagate."""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        OCR_ERRORS.labels(backend=backend).inc()
+        raise
+    finally:
+        OCR_LATENCY.labels(backend=backend).observe(time.perf_counter() - start)
+
+
+def timed_match(fn):
+    """Decorator for select_best_section: observe duration per candidate."""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            candidates = kwargs["candidates"] if "candidates" in kwargs else args[1]
+            MATCH_SECONDS_PER_CANDIDATE.observe((time.perf_counter() - start) / max(len(candidates), 1))
+    return wrapper
+
+
+def _registry():
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    from prometheus_client import REGISTRY
+
+    return REGISTRY
+
+
+def metrics_response():
+    """Starlette response with the Prometheus text exposition."""
+    from fastapi import Response
+
+    return Response(content=generate_latest(_registry()), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,456 @@
+"""
+Pluggable OCR backends.
+
+`process_image` used to talk to Google Vision directly. Backends make the
+engine swappable and allow running the whole pipeline offline:
+
+- VisionOcrBackend: Google Cloud Vision (production)
+- FakeOcrBackend: deterministic fake with configurable latency/error distributions
+- RecordReplayOcrBackend: stores real responses on disk keyed by image hash
+  and replays them later (record / replay / read-through cache modes)
+
+Every backend returns text with the same contract as the original
+`process_image`: recognized text, "No text detected." or "Vision API error: ...".
+
+Backend selection (env):
+    OCR_BACKEND          vision | fake | record | replay | cache   (default: vision)
+    OCR_RECORD_DIR       directory for record/replay/cache          (default: .ocr_recordings)
+    OCR_FAKE_LATENCY     fixed | uniform | lognormal                (default: fixed)
+    OCR_FAKE_LATENCY_MS  mean latency in milliseconds               (default: 0)
+    OCR_FAKE_JITTER_MS   uniform: +/- spread; lognormal: std dev    (default: 0)
+    OCR_FAKE_ERROR_RATE  share of images answered with an API error (default: 0)
+    OCR_FAKE_SEED        seed for latency/error draws               (default: 0)
+"""
+
+from __future__ import annotations
+
+import abc
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+import struct
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Protocol, Sequence, runtime_checkable
+
+from shared.metrics import record_cache
+
+NO_TEXT_DETECTED = "No text detected."
+VISION_ERROR_PREFIX = "Vision API error: "
+
+# Vision accepts at most 16 images per batch_annotate_images request
+VISION_MAX_BATCH = 16
+
+# PNG tEXt keyword synthetic images use to carry their expected OCR text
+FAKE_TEXT_PNG_KEYWORD = b"ocr-text"
+
+
+def image_digest(image_bytes: bytes) -> str:
+    """Content hash used to key recordings and fake responses."""
+    return hashlib.sha256(image_bytes).hexdigest()
+
+
+@runtime_checkable
+class OcrBackend(Protocol):
+    """OCR engine interface: single + batch, sync + async."""
+
+    name: str
+
+    def recognize(self, image_bytes: bytes) -> str:
+        ...
+
+    def recognize_batch(self, images: Sequence[bytes]) -> List[str]:
+        ...
+
+    async def recognize_async(self, image_bytes: bytes) -> str:
+        ...
+
+    async def recognize_batch_async(self, images: Sequence[bytes]) -> List[str]:
+        ...
+
+    def warmup(self) -> None:
+        ...
+
+
+class BaseOcrBackend(abc.ABC):
+    """Default batch/async implementations on top of `recognize`."""
+
+    name = "base"
+
+    @abc.abstractmethod
+    def recognize(self, image_bytes: bytes) -> str:
+        """OCR text of one image."""
+
+    def recognize_batch(self, images: Sequence[bytes]) -> List[str]:
+        return [self.recognize(img) for img in images]
+
+    async def recognize_async(self, image_bytes: bytes) -> str:
+        return await asyncio.to_thread(self.recognize, image_bytes)
+
+    async def recognize_batch_async(self, images: Sequence[bytes]) -> List[str]:
+        return await asyncio.to_thread(self.recognize_batch, list(images))
+
+    def warmup(self) -> None:
+        """Pay one-time setup costs (clients, channels, credentials) up front."""
+
+
+class VisionOcrBackend(BaseOcrBackend):
+    """Google Cloud Vision text detection with a reused client."""
+
+    name = "vision"
+
+    SCOPES = ("https://www.googleapis.com/auth/cloud-platform",)
+
+    def __init__(self, client=None, credentials=None):
+        self._client = client
+        self._credentials = credentials
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    import google.auth
+                    from google.cloud import vision
+
+                    # The client gets credentials we hold, so warmup() can refresh them through google.auth
+                    if self._credentials is None:
+                        self._credentials, _ = google.auth.default(scopes=self.SCOPES)
+                    self._client = vision.ImageAnnotatorClient(credentials=self._credentials)
+        return self._client
+
+    def warmup(self) -> None:
+        self.client
+        # Fetch an access token now rather than on the first Vision call
+        credentials = self._credentials
+        if credentials is not None and not credentials.valid:
+            import google.auth.transport.requests
+
+            credentials.refresh(google.auth.transport.requests.Request())
+
+    @staticmethod
+    def _response_to_text(response) -> str:
+        if response.error.message:
+            # В проде — логировать; для новичка — вернуть текст ошибки
+            return f"{VISION_ERROR_PREFIX}{response.error.message}"
+
+        if not response.text_annotations:
+            return NO_TEXT_DETECTED
+
+        return response.text_annotations[0].description
+
+    def recognize(self, image_bytes: bytes) -> str:
+        from google.cloud import vision
+
+        image = vision.Image(content=image_bytes)
+        response = self.client.text_detection(image=image)
+        return self._response_to_text(response)
+
+    def recognize_batch(self, images: Sequence[bytes]) -> List[str]:
+        from google.cloud import vision
+
+        texts: List[str] = []
+        feature = vision.Feature(type_=vision.Feature.Type.TEXT_DETECTION)
+        for start in range(0, len(images), VISION_MAX_BATCH):
+            requests = [
+                vision.AnnotateImageRequest(image=vision.Image(content=img), features=[feature])
+                for img in images[start:start + VISION_MAX_BATCH]
+            ]
+            batch = self.client.batch_annotate_images(requests=requests)
+            texts.extend(self._response_to_text(r) for r in batch.responses)
+        return texts
+
+
+def _png_text_chunk(image_bytes: bytes, keyword: bytes) -> Optional[str]:
+    """Return the value of a PNG tEXt chunk with the given keyword, if any."""
+    if not image_bytes.startswith(b"\x89PNG\r\n\x1a\n"):
+        return None
+    pos = 8
+    while pos + 8 <= len(image_bytes):
+        length, ctype = struct.unpack(">I4s", image_bytes[pos:pos + 8])
+        data = image_bytes[pos + 8:pos + 8 + length]
+        if ctype == b"tEXt":
+            key, _, value = data.partition(b"\x00")
+            if key == keyword:
+                return value.decode("utf-8", errors="replace")
+        if ctype == b"IEND":
+            break
+        pos += 12 + length
+    return None
+
+
+def make_fake_png(text: str, *, width: int = 8, height: int = 8, seed: int = 0) -> bytes:
+    """
+    Build a tiny valid PNG whose tEXt chunk carries `text`.
+
+    FakeOcrBackend "recognizes" that text, so synthetic archives need no
+    shared lookup table between the generator and the OCR fake.
+    """
+    def chunk(ctype: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + ctype + data + struct.pack(">I", zlib.crc32(ctype + data) & 0xFFFFFFFF)
+
+    rng = random.Random(f"{seed}:{text}")
+    raw = b"".join(b"\x00" + bytes(rng.randrange(256) for _ in range(width * 3)) for _ in range(height))
+    ihdr = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    # tEXt is latin-1 by spec; we smuggle UTF-8 bytes through it
+    text_data = FAKE_TEXT_PNG_KEYWORD + b"\x00" + text.encode("utf-8")
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", ihdr)
+        + chunk(b"tEXt", text_data)
+        + chunk(b"IDAT", zlib.compress(raw))
+        + chunk(b"IEND", b"")
+    )
+
+
+class FakeOcrBackend(BaseOcrBackend):
+    """
+    Deterministic OCR fake for offline runs and load tests.
+
+    Text resolution order:
+      1) `texts` mapping keyed by image sha256
+      2) `text_fn(image_bytes)` if given
+      3) PNG tEXt chunk written by `make_fake_png`
+      4) "No text detected."
+
+    Latency and errors are drawn from an RNG seeded by (seed, image hash), so
+    the same image always gets the same latency and the same error outcome.
+    """
+
+    name = "fake"
+
+    MAX_LATENCY_FACTOR = 10.0
+
+    def __init__(
+        self,
+        texts: Optional[Dict[str, str]] = None,
+        *,
+        text_fn: Optional[Callable[[bytes], Optional[str]]] = None,
+        latency: str = "fixed",
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        error_rate: float = 0.0,
+        seed: int = 0,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        if latency not in ("fixed", "uniform", "lognormal"):
+            raise ValueError(f"Unknown latency distribution: {latency}")
+        self.texts = dict(texts or {})
+        self.text_fn = text_fn
+        self.latency = latency
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.seed = seed
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def _rng(self, digest: str) -> random.Random:
+        return random.Random(f"{self.seed}:{digest}")
+
+    def latency_for(self, image_bytes: bytes) -> float:
+        """Latency in seconds this backend injects for the given image."""
+        rng = self._rng(image_digest(image_bytes))
+        if self.latency == "uniform":
+            ms = self.latency_ms + rng.uniform(-self.jitter_ms, self.jitter_ms)
+        elif self.latency == "lognormal":
+            # Heavy right tail like real API latencies; mean latency_ms, standard deviation jitter_ms
+            if self.latency_ms > 0:
+                s2 = math.log1p((self.jitter_ms / self.latency_ms) ** 2)
+                mu = math.log(self.latency_ms) - s2 / 2
+                ms = math.exp(rng.gauss(mu, math.sqrt(s2)))
+            else:
+                ms = 0.0
+        else:
+            ms = self.latency_ms
+        # A single draw never exceeds MAX_LATENCY_FACTOR x the mean (a huge jitter must not hang a run)
+        return min(max(ms, 0.0), self.latency_ms * self.MAX_LATENCY_FACTOR) / 1000.0
+
+    def _resolve(self, image_bytes: bytes) -> str:
+        digest = image_digest(image_bytes)
+        rng = self._rng(digest)
+        rng.random()  # keep error draw independent from the latency draw
+        if self.error_rate and rng.random() < self.error_rate:
+            return f"{VISION_ERROR_PREFIX}injected fake error"
+
+        if digest in self.texts:
+            return self.texts[digest]
+        if self.text_fn is not None:
+            text = self.text_fn(image_bytes)
+            if text is not None:
+                return text
+        text = _png_text_chunk(image_bytes, FAKE_TEXT_PNG_KEYWORD)
+        if text is not None:
+            return text
+        return NO_TEXT_DETECTED
+
+    def recognize(self, image_bytes: bytes) -> str:
+        with self._lock:
+            self.calls += 1
+        delay = self.latency_for(image_bytes)
+        if delay:
+            self._sleep(delay)
+        return self._resolve(image_bytes)
+
+    async def recognize_async(self, image_bytes: bytes) -> str:
+        with self._lock:
+            self.calls += 1
+        delay = self.latency_for(image_bytes)
+        if delay:
+            await asyncio.sleep(delay)
+        return self._resolve(image_bytes)
+
+    async def recognize_batch_async(self, images: Sequence[bytes]) -> List[str]:
+        return list(await asyncio.gather(*(self.recognize_async(img) for img in images)))
+
+
+class OcrRecordingMissing(KeyError):
+    """Replay mode has no recording for the requested image."""
+
+
+class RecordReplayOcrBackend(BaseOcrBackend):
+    """
+    Stores OCR responses on disk keyed by image sha256.
+
+    Modes:
+      - record: always call `inner`, store the response
+      - replay: only read recordings, raise OcrRecordingMissing on a miss
+      - cache:  read-through; call `inner` on a miss and store the response
+
+    Layout: <root>/<sha[:2]>/<sha>.json with {"sha256", "backend", "text"}.
+    Error responses are never stored so transient failures are not replayed.
+    """
+
+    name = "record_replay"
+
+    MODES = ("record", "replay", "cache")
+
+    def __init__(self, root: str, *, mode: str = "replay", inner: Optional[OcrBackend] = None):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown record/replay mode: {mode}")
+        if mode != "replay" and inner is None:
+            raise ValueError(f"Mode {mode!r} requires an inner backend")
+        self.root = Path(root)
+        self.mode = mode
+        self.inner = inner
+        self.hits = 0
+        self.misses = 0
+
+    def warmup(self) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        if self.inner is not None:
+            self.inner.warmup()
+
+    def _path(self, digest: str) -> Path:
+        return self.root / digest[:2] / f"{digest}.json"
+
+    def lookup(self, image_bytes: bytes) -> Optional[str]:
+        path = self._path(image_digest(image_bytes))
+        try:
+            with path.open("r", encoding="utf-8") as f:
+                return json.load(f)["text"]
+        except FileNotFoundError:
+            return None
+
+    def store(self, image_bytes: bytes, text: str) -> None:
+        if text.startswith(VISION_ERROR_PREFIX):
+            return
+        digest = image_digest(image_bytes)
+        path = self._path(digest)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        record = {"sha256": digest, "backend": getattr(self.inner, "name", None), "text": text}
+        # Atomic publish so concurrent readers never see a partial file
+        tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            json.dump(record, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def recognize(self, image_bytes: bytes) -> str:
+        if self.mode != "record":
+            text = self.lookup(image_bytes)
+            record_cache("ocr", text is not None)
+            if text is not None:
+                self.hits += 1
+                return text
+            self.misses += 1
+            if self.mode == "replay":
+                raise OcrRecordingMissing(image_digest(image_bytes))
+
+        text = self.inner.recognize(image_bytes)
+        self.store(image_bytes, text)
+        return text
+
+    def recognize_batch(self, images: Sequence[bytes]) -> List[str]:
+        if self.mode == "replay":
+            return [self.recognize(img) for img in images]
+
+        texts: List[Optional[str]] = [None] * len(images)
+        pending: List[int] = []
+        for i, img in enumerate(images):
+            cached = self.lookup(img) if self.mode == "cache" else None
+            if self.mode == "cache":
+                record_cache("ocr", cached is not None)
+            if cached is not None:
+                self.hits += 1
+                texts[i] = cached
+            else:
+                if self.mode == "cache":
+                    self.misses += 1
+                pending.append(i)
+
+        if pending:
+            fresh = self.inner.recognize_batch([images[i] for i in pending])
+            for i, text in zip(pending, fresh):
+                self.store(images[i], text)
+                texts[i] = text
+        return texts  # type: ignore[return-value]
+
+
+def backend_from_env(env: Optional[Dict[str, str]] = None) -> OcrBackend:
+    """Build the OCR backend selected by OCR_BACKEND and friends."""
+    env = os.environ if env is None else env
+    kind = env.get("OCR_BACKEND", "vision").strip().lower()
+
+    if kind == "vision":
+        return VisionOcrBackend()
+    if kind == "fake":
+        return FakeOcrBackend(
+            latency=env.get("OCR_FAKE_LATENCY", "fixed"),
+            latency_ms=float(env.get("OCR_FAKE_LATENCY_MS", "0")),
+            jitter_ms=float(env.get("OCR_FAKE_JITTER_MS", "0")),
+            error_rate=float(env.get("OCR_FAKE_ERROR_RATE", "0")),
+            seed=int(env.get("OCR_FAKE_SEED", "0")),
+        )
+    if kind in RecordReplayOcrBackend.MODES:
+        inner = None if kind == "replay" else VisionOcrBackend()
+        return RecordReplayOcrBackend(env.get("OCR_RECORD_DIR", ".ocr_recordings"), mode=kind, inner=inner)
+
+    raise ValueError(f"Unknown OCR_BACKEND: {kind}")
+
+
+_backend: Optional[OcrBackend] = None
+_backend_lock = threading.Lock()
+
+
+def get_ocr_backend() -> OcrBackend:
+    """Process-wide OCR backend, created from env on first use."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = backend_from_env()
+    return _backend
+
+
+def set_ocr_backend(backend: Optional[OcrBackend]) -> None:
+    """Override the process-wide backend (None resets to env configuration)."""
+    global _backend
+    with _backend_lock:
+        _backend = backend
@@ -8,15 +8,22 @@ length penalties, and confidence thresholds.
 from __future__ import annotations
 
 import re
+import time
+from collections import Counter
 from dataclasses import dataclass
-from difflib import SequenceMatcher
-from typing import List, Optional
+from typing import TYPE_CHECKING, List, Optional, Sequence
 
 from shared.docx_section_extractor import (
     SectionCandidate,
     HIGH_PRIORITY_KEYWORDS,
     LOW_PRIORITY_KEYWORDS,
 )
+from shared.metrics import MATCH_SECONDS_PER_CANDIDATE, timed_match
+from shared.similarity import get_similarity_backend
+from shared.tracing import traced
+
+if TYPE_CHECKING:
+    from shared.candidate_index import CandidateIndex
 
 
 @dataclass
@@ -46,6 +53,9 @@ class SelectionResult:
         }
 
 
+# Slack for float rounding between score bounds / cutoffs and exact scores
+_BOUND_EPSILON = 1e-9
+
 # CTA bracket characters to remove
 CTA_BRACKETS = re.compile(r"[\[\]<>]")
 
@@ -86,13 +96,16 @@ def _count_chars_no_whitespace(text: str) -> int:
     return len(re.sub(r"\s+", "", cleaned))
 
 
-def _compute_similarity(text1: str, text2: str) -> float:
+def _compute_similarity(text1: str, text2: str, cutoff: float = 0.0) -> float:
     """
-    Compute similarity score using SequenceMatcher (deterministic).
+    Compute similarity score with the active backend (deterministic).
+    
+    SequenceMatcher by default; see shared.similarity / SIMILARITY_BACKEND.
+    Below `cutoff` the backend may return any smaller value.
     
     Returns float in [0, 1].
     """
-    return SequenceMatcher(None, text1, text2).ratio()
+    return get_similarity_backend().ratio(text1, text2, cutoff)
 
 
 def _get_priority_multiplier(candidate: SectionCandidate) -> float:
@@ -165,11 +178,28 @@ def _get_length_mismatch_penalty(ocr_len: int, candidate_len: int) -> float:
         return 1.0
 
 
+def _length_units(text_soft: str, language: str) -> int:
+    """Length used by the mismatch penalty: chars (no whitespace) for ja/zh, else words."""
+    if language in ("ja", "zh-Hans"):
+        return _count_chars_no_whitespace(text_soft)
+    return len(text_soft.split())
+
+
+def _static_multiplier(candidate: SectionCandidate) -> float:
+    """Product of the score multipliers that don't depend on the OCR text."""
+    return (
+        _get_priority_multiplier(candidate)
+        * _get_placeholder_multiplier(candidate.content_text)
+        * _get_length_penalty_multiplier(candidate, candidate.language)
+    )
+
+
 def _score_candidate(
     ocr_text: str,
     candidate: SectionCandidate,
     ocr_text_soft: str,
     candidate_text_soft: str,
+    min_score: float = 0.0,
 ) -> float:
     """
     Compute score for a candidate.
@@ -179,13 +209,12 @@ def _score_candidate(
         candidate: Section candidate
         ocr_text_soft: Normalized soft OCR text
         candidate_text_soft: Normalized soft candidate text
+        min_score: Scores below this don't need to be exact (any smaller
+            value may be returned), which lets the similarity backend stop early
     
     Returns:
         Score in [0, 1] (approximately)
     """
-    # Base similarity
-    similarity = _compute_similarity(ocr_text_soft, candidate_text_soft)
-    
     # Priority boost/penalty
     priority_mult = _get_priority_multiplier(candidate)
     
@@ -196,15 +225,16 @@ def _score_candidate(
     length_penalty = _get_length_penalty_multiplier(candidate, candidate.language)
     
     # Length mismatch penalty - use character count for ja/zh
-    if candidate.language in ("ja", "zh-Hans"):
-        ocr_len = _count_chars_no_whitespace(ocr_text_soft)
-        candidate_len = _count_chars_no_whitespace(candidate_text_soft)
-    else:
-        ocr_len = len(ocr_text_soft.split())
-        candidate_len = len(candidate_text_soft.split())
+    ocr_len = _length_units(ocr_text_soft, candidate.language)
+    candidate_len = _length_units(candidate_text_soft, candidate.language)
     
     length_mismatch = _get_length_mismatch_penalty(ocr_len, candidate_len)
     
+    # Base similarity
+    multipliers = priority_mult * placeholder_mult * length_penalty * length_mismatch
+    cutoff = (min_score - _BOUND_EPSILON) / multipliers if min_score > 0.0 and multipliers > 0.0 else 0.0
+    similarity = _compute_similarity(ocr_text_soft, candidate_text_soft, cutoff)
+    
     # Combined score
     score = similarity * priority_mult * placeholder_mult * length_penalty * length_mismatch
     
@@ -264,6 +294,89 @@ def _filter_by_hints(
     return filtered or candidates, warnings
 
 
+def _score_entry(
+    candidate, ocr_cleaned, ocr_strict, ocr_soft, normalize_strict_fn, normalize_soft_fn, min_score: float = 0.0,
+) -> tuple:
+    """(score, strict_equal, candidate, candidate_cleaned, candidate_strict) for one candidate."""
+    # Clean candidate text
+    candidate_cleaned = _remove_cta_brackets(candidate.content_text)
+    candidate_strict = normalize_strict_fn(candidate_cleaned)
+    candidate_soft = normalize_soft_fn(candidate_cleaned)
+    
+    # Compute score
+    score = _score_candidate(ocr_cleaned, candidate, ocr_soft, candidate_soft, min_score)
+    
+    # Check strict equality
+    strict_equal = (ocr_strict == candidate_strict)
+    
+    return (score, strict_equal, candidate, candidate_cleaned, candidate_strict)
+
+
+def _score_with_index(
+    candidate_index: "CandidateIndex",
+    candidates: List[SectionCandidate],
+    ocr_cleaned: str,
+    ocr_strict: str,
+    ocr_soft: str,
+    normalize_strict_fn,
+    normalize_soft_fn,
+) -> Optional[List[tuple]]:
+    """
+    Score the index shortlist, then any candidate that could still reach the top two.
+    
+    Strict-equal candidates are always scored. Everything else left out has an
+    upper bound below the second best exact score, so top1/top2, delta and the
+    strict-match count are the same as with full scoring.
+    
+    Returns scored entries in `candidates` order, or None when the index can't
+    rank (caller scores everything).
+    """
+    shortlist = candidate_index.shortlist(ocr_soft, among=candidates)
+    if shortlist is None:
+        return None
+    
+    entries = {}
+    kept = {id(c) for c in shortlist}
+    rest = []
+    for candidate in candidates:
+        if id(candidate) in kept or normalize_strict_fn(_remove_cta_brackets(candidate.content_text)) == ocr_strict:
+            entries[id(candidate)] = _score_entry(
+                candidate, ocr_cleaned, ocr_strict, ocr_soft, normalize_strict_fn, normalize_soft_fn
+            )
+        else:
+            rest.append(candidate)
+    
+    ocr_chars = Counter(ocr_soft)
+    _refine_by_bounds(
+        entries,
+        [(candidate_index.upper_bound(c, ocr_soft, ocr_chars), c) for c in rest],
+        lambda c, floor: _score_entry(c, ocr_cleaned, ocr_strict, ocr_soft, normalize_strict_fn, normalize_soft_fn, floor),
+    )
+    
+    return [entries[id(c)] for c in candidates if id(c) in entries]
+
+
+def _refine_by_bounds(entries: dict, bounded: List[tuple], score_fn, key=id) -> None:
+    """
+    Exactly score (bound, candidate) pairs in descending bound order until no
+    remaining bound can reach the current second best score.
+    
+    score_fn(candidate, floor) may return an inexact score when it is below
+    `floor` (the current second best). `entries` maps key(candidate) -> scored
+    entry and is updated in place.
+    """
+    top = sorted((e[0] for e in entries.values()), reverse=True)[:2]
+    for bound, candidate in sorted(bounded, key=lambda x: x[0], reverse=True):
+        floor = top[1] if len(top) > 1 else 0.0
+        if bound < floor - _BOUND_EPSILON:
+            break
+        entry = score_fn(candidate, floor)
+        entries[key(candidate)] = entry
+        top = sorted(top + [entry[0]], reverse=True)[:2]
+
+
+@traced("match")
+@timed_match
 def select_best_section(
     ocr_text: str,
     candidates: List[SectionCandidate],
@@ -271,6 +384,7 @@ def select_best_section(
     normalize_soft_fn,
     section_number: Optional[str] = None,
     section_name: Optional[str] = None,
+    candidate_index: Optional["CandidateIndex"] = None,
 ) -> SelectionResult:
     """
     Select the best matching section from candidates.
@@ -282,6 +396,8 @@ def select_best_section(
         normalize_soft_fn: Function for soft normalization
         section_number: Optional hint for section number
         section_name: Optional hint for section name
+        candidate_index: Optional n-gram index over `candidates`; when given,
+            candidates that provably can't reach the top two aren't scored
     
     Returns:
         SelectionResult with chosen section and metadata
@@ -313,22 +429,30 @@ def select_best_section(
             manual_required=True,
         )
     
-    # Score all candidates
-    scored = []
-    for candidate in filtered_candidates:
-        # Clean candidate text
-        candidate_cleaned = _remove_cta_brackets(candidate.content_text)
-        candidate_strict = normalize_strict_fn(candidate_cleaned)
-        candidate_soft = normalize_soft_fn(candidate_cleaned)
-        
-        # Compute score
-        score = _score_candidate(ocr_cleaned, candidate, ocr_soft, candidate_soft)
-        
-        # Check strict equality
-        strict_equal = (ocr_strict == candidate_strict)
-        
-        scored.append((score, strict_equal, candidate, candidate_cleaned, candidate_strict))
+    # Score candidates (on large documents only those the index can't rule out)
+    scored = None
+    if candidate_index is not None:
+        scored = _score_with_index(
+            candidate_index, filtered_candidates, ocr_cleaned, ocr_strict, ocr_soft,
+            normalize_strict_fn, normalize_soft_fn,
+        )
+    if scored is None:
+        scored = [
+            _score_entry(candidate, ocr_cleaned, ocr_strict, ocr_soft, normalize_strict_fn, normalize_soft_fn)
+            for candidate in filtered_candidates
+        ]
     
+    return _decide(scored, filtered_candidates, warnings, ocr_tokens, ocr_chars)
+
+
+def _decide(
+    scored: List[tuple],
+    filtered_candidates: List[SectionCandidate],
+    warnings: List[str],
+    ocr_tokens: int,
+    ocr_chars: int,
+) -> SelectionResult:
+    """Apply ranking and the confidence / MANUAL rules to scored entries."""
     # Sort by score (descending), then by strict_equal (True first)
     scored.sort(key=lambda x: (x[0], x[1]), reverse=True)
     
@@ -420,3 +544,153 @@ def select_best_section(
         chosen_section_name=top1_cand.section_name,
         chosen_section_number=top1_cand.section_number,
     )
+
+
+# Upper limit of cells (images x candidates x alphabet) materialized at once
+_BOUND_CHUNK_CELLS = 4_000_000
+
+
+def _char_count_matrix(texts: Sequence[str], alphabet: dict, np):
+    counts = np.zeros((len(texts), len(alphabet)), dtype=np.int32)
+    for row, text in enumerate(texts):
+        for ch, n in Counter(text).items():
+            counts[row, alphabet[ch]] = n
+    return counts
+
+
+def _length_mismatch_matrix(ocr_units, cand_units, np):
+    """Vectorized _get_length_mismatch_penalty (rows: images, columns: candidates)."""
+    lo = np.minimum(ocr_units, cand_units)
+    hi = np.maximum(ocr_units, cand_units)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio = np.where(hi > 0, lo / np.maximum(hi, 1), 0.0)
+    penalty = np.where(ratio < 0.3, 0.6, np.where(ratio < 0.5, 0.8, 1.0))
+    return np.where(cand_units == 0, 0.6, penalty)
+
+
+def _upper_bound_matrix(ocr_soft: Sequence[str], cand_soft: Sequence[str], np):
+    """quick_ratio() of every (image, candidate) pair from character count vectors."""
+    alphabet: dict = {}
+    for text in list(cand_soft) + list(ocr_soft):
+        for ch in text:
+            if ch not in alphabet:
+                alphabet[ch] = len(alphabet)
+    cand_counts = _char_count_matrix(cand_soft, alphabet, np)
+    ocr_counts = _char_count_matrix(ocr_soft, alphabet, np)
+    cand_lens = np.array([len(t) for t in cand_soft], dtype=np.float64)
+    ocr_lens = np.array([len(t) for t in ocr_soft], dtype=np.float64)
+
+    overlap = np.empty((len(ocr_soft), len(cand_soft)), dtype=np.float64)
+    per_image = max(len(cand_soft) * max(len(alphabet), 1), 1)
+    step = max(1, _BOUND_CHUNK_CELLS // per_image)
+    for start in range(0, len(ocr_soft), step):
+        block = ocr_counts[start:start + step]
+        overlap[start:start + step] = np.minimum(block[:, None, :], cand_counts[None, :, :]).sum(axis=2)
+    total = ocr_lens[:, None] + cand_lens[None, :]
+    return np.where(total > 0, 2.0 * overlap / np.maximum(total, 1), 1.0)
+
+
+@traced("match_batch")
+def select_best_sections_batch(
+    ocr_texts: Sequence[str],
+    candidates: List[SectionCandidate],
+    normalize_strict_fn,
+    normalize_soft_fn,
+    section_number: Optional[str] = None,
+    section_name: Optional[str] = None,
+    candidate_index: Optional["CandidateIndex"] = None,
+) -> List[SelectionResult]:
+    """
+    Select the best section for many OCR texts against one reference document.
+    
+    Builds an image x candidate matrix of score upper bounds with NumPy
+    (character-count quick_ratio times the precomputed priority / placeholder /
+    length multipliers and the length-mismatch penalty), then refines cells
+    with exact similarity scoring in descending bound order only while a
+    cell can still reach an image's top two. Strict-equal candidates are
+    always scored, so every result equals select_best_section() for that text.
+    
+    Args:
+        ocr_texts: OCR texts, one per image
+        candidates: Section candidates from the reference DOCX
+        normalize_strict_fn: Function for strict normalization
+        normalize_soft_fn: Function for soft normalization
+        section_number: Optional hint for section number
+        section_name: Optional hint for section name
+        candidate_index: Optional n-gram index; its shortlist is scored first
+    
+    Returns:
+        One SelectionResult per OCR text, in input order
+    """
+    import numpy as np
+    
+    started = time.perf_counter()
+    filtered_candidates, hint_warnings = _filter_by_hints(candidates, section_number, section_name)
+    
+    ocr_cleaned = [_remove_cta_brackets(t) for t in ocr_texts]
+    ocr_strict = [normalize_strict_fn(t) for t in ocr_cleaned]
+    ocr_soft = [normalize_soft_fn(t) for t in ocr_cleaned]
+    
+    if not filtered_candidates:
+        return [
+            SelectionResult(
+                chosen_section=None,
+                chosen_text="",
+                score_top1=0.0,
+                score_top2=0.0,
+                delta=0.0,
+                warnings=list(hint_warnings) + ["No candidates available after filtering"],
+                manual_required=True,
+            )
+            for _ in ocr_texts
+        ]
+    
+    # Candidate features, computed once per document
+    cand_cleaned = [_remove_cta_brackets(c.content_text) for c in filtered_candidates]
+    cand_strict = [normalize_strict_fn(t) for t in cand_cleaned]
+    cand_soft = [normalize_soft_fn(t) for t in cand_cleaned]
+    languages = sorted({c.language for c in filtered_candidates})
+    cand_language = np.array([languages.index(c.language) for c in filtered_candidates])
+    cand_units = np.array([_length_units(t, c.language) for t, c in zip(cand_soft, filtered_candidates)])
+    static = np.array([_static_multiplier(c) for c in filtered_candidates])
+    by_strict: dict = {}
+    for pos, text in enumerate(cand_strict):
+        by_strict.setdefault(text, []).append(pos)
+    
+    # Image x candidate upper bounds
+    ocr_units = np.array([[_length_units(t, lang) for lang in languages] for t in ocr_soft]).reshape(len(ocr_soft), -1)
+    bounds = _upper_bound_matrix(ocr_soft, cand_soft, np)
+    bounds *= static[None, :]
+    bounds *= _length_mismatch_matrix(ocr_units[:, cand_language], cand_units[None, :], np)
+    np.minimum(bounds, 1.0, out=bounds)
+    
+    results = []
+    for i in range(len(ocr_texts)):
+        def score(pos, floor=0.0, i=i):
+            candidate = filtered_candidates[pos]
+            value = _score_candidate(ocr_cleaned[i], candidate, ocr_soft[i], cand_soft[pos], floor)
+            return (value, ocr_strict[i] == cand_strict[pos], candidate, cand_cleaned[pos], cand_strict[pos])
+        
+        entries = {pos: score(pos) for pos in by_strict.get(ocr_strict[i], ())}
+        if candidate_index is not None:
+            shortlist = candidate_index.shortlist(ocr_soft[i], among=filtered_candidates)
+            if shortlist is not None:
+                kept = {id(c) for c in shortlist}
+                for pos, candidate in enumerate(filtered_candidates):
+                    if id(candidate) in kept and pos not in entries:
+                        entries[pos] = score(pos)
+        row = bounds[i]
+        _refine_by_bounds(
+            entries,
+            [(row[pos], pos) for pos in range(len(filtered_candidates)) if pos not in entries],
+            score,
+            key=lambda pos: pos,
+        )
+        scored = [entries[pos] for pos in sorted(entries)]
+        results.append(
+            _decide(scored, filtered_candidates, list(hint_warnings), len(ocr_strict[i].split()), len(ocr_strict[i]))
+        )
+    
+    cells = max(len(ocr_texts) * len(filtered_candidates), 1)
+    MATCH_SECONDS_PER_CANDIDATE.observe((time.perf_counter() - started) / cells)
+    return results
@@ -0,0 +1,388 @@
+"""
+Persistent store of extracted reference sections, shared across jobs.
+
+The same localized reference DOCX files come back job after job. The store
+keeps their extracted sections, keyed by the DOCX content hash and
+EXTRACTOR_VERSION, so a worker only runs python-docx for documents it has
+never seen. Each entry also carries the strict/soft normalized forms of the
+(CTA-cleaned) section texts, which are fed into the normalization memo on load.
+
+Entry format (one object per DOCX): a 64-hex SHA-256 of the payload, a
+newline, then gzip-compressed JSON. The checksum is verified on every read;
+a corrupt or truncated entry is treated as a miss and removed.
+
+Backends:
+  - LocalDiskReferenceStore: files under a directory, LRU eviction once the
+    total size exceeds a byte budget (recency = file mtime, touched on hit)
+  - ObjectStorageReferenceStore: blobs under a prefix in a Cloud Storage
+    bucket (expiry is left to bucket lifecycle rules)
+  - TieredReferenceStore: local disk in front of object storage
+
+Env:
+    REFERENCE_STORE            local | gcs | tiered | off (default local)
+    REFERENCE_STORE_DIR        default /tmp/ocr-reference-store
+    REFERENCE_STORE_MAX_BYTES  local budget, default 67108864 (64 MiB; /tmp is RAM on Cloud Run)
+    REFERENCE_STORE_BUCKET     bucket for gcs/tiered
+    REFERENCE_STORE_PREFIX     default reference-store/
+"""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Protocol, Sequence, Tuple
+
+from shared.cpu_pool import CandidateRecord, from_records, to_records
+from shared.docx_section_extractor import EXTRACTOR_VERSION, SectionCandidate
+from shared.metrics import record_cache
+
+FORMAT_VERSION = 1
+
+
+class ReferenceStoreCorrupt(ValueError):
+    """Stored entry failed its integrity check."""
+
+
+@dataclass
+class ReferenceEntry:
+    """Extracted sections of one DOCX, independent of its filename/language."""
+
+    docx_sha256: str
+    records: List[CandidateRecord]
+    # (cleaned content, strict, soft) per record; empty if not precomputed
+    normalized: List[Tuple[str, str, str]]
+    normalization_version: Optional[str] = None
+    extractor_version: str = EXTRACTOR_VERSION
+
+    def candidates(self, source_path: str, language: str) -> List[SectionCandidate]:
+        return from_records(self.records, source_path, language)
+
+
+def docx_key(docx_bytes: bytes) -> str:
+    return hashlib.sha256(docx_bytes).hexdigest()
+
+
+def build_entry(docx_sha256: str, candidates: Sequence[SectionCandidate]) -> ReferenceEntry:
+    """Entry for freshly extracted candidates, with normalized forms precomputed."""
+    from shared.reference_matcher import _remove_cta_brackets
+    from worker.normalization import NORMALIZATION_VERSION, normalize_both
+
+    normalized = []
+    for c in candidates:
+        cleaned = _remove_cta_brackets(c.content_text)
+        strict, soft = normalize_both(cleaned)
+        normalized.append((cleaned, strict, soft))
+    return ReferenceEntry(
+        docx_sha256=docx_sha256,
+        records=to_records(candidates),
+        normalized=normalized,
+        normalization_version=NORMALIZATION_VERSION,
+    )
+
+
+def prime_from_entry(entry: ReferenceEntry) -> None:
+    """Load the entry's normalized forms into the normalization memo (same version only)."""
+    from worker.normalization import NORMALIZATION_VERSION, prime_normalize_cache
+
+    if entry.normalization_version == NORMALIZATION_VERSION and entry.normalized:
+        prime_normalize_cache(entry.normalized)
+
+
+def encode_entry(entry: ReferenceEntry) -> bytes:
+    body = gzip.compress(
+        json.dumps(
+            {
+                "format": FORMAT_VERSION,
+                "extractor_version": entry.extractor_version,
+                "normalization_version": entry.normalization_version,
+                "docx_sha256": entry.docx_sha256,
+                "records": entry.records,
+                "normalized": entry.normalized,
+            },
+            ensure_ascii=False,
+            separators=(",", ":"),
+        ).encode("utf-8"),
+        mtime=0,
+    )
+    return hashlib.sha256(body).hexdigest().encode("ascii") + b"\n" + body
+
+
+def decode_entry(data: bytes, docx_sha256: str) -> ReferenceEntry:
+    checksum, sep, body = data.partition(b"\n")
+    if not sep or hashlib.sha256(body).hexdigest().encode("ascii") != checksum:
+        raise ReferenceStoreCorrupt("checksum mismatch")
+    try:
+        raw = json.loads(gzip.decompress(body).decode("utf-8"))
+    except (OSError, EOFError, ValueError) as e:
+        raise ReferenceStoreCorrupt(f"unreadable payload: {e}") from e
+    if raw.get("format") != FORMAT_VERSION or raw.get("docx_sha256") != docx_sha256:
+        raise ReferenceStoreCorrupt("entry does not belong to this key")
+    return ReferenceEntry(
+        docx_sha256=raw["docx_sha256"],
+        records=[tuple(r) for r in raw["records"]],
+        normalized=[tuple(n) for n in raw["normalized"]],
+        normalization_version=raw.get("normalization_version"),
+        extractor_version=raw["extractor_version"],
+    )
+
+
+def _entry_name(docx_sha256: str) -> str:
+    return f"{docx_sha256}-x{EXTRACTOR_VERSION}.ref"
+
+
+class ReferenceStore(Protocol):
+    name: str
+
+    def get(self, docx_sha256: str) -> Optional[ReferenceEntry]:
+        ...
+
+    def put(self, entry: ReferenceEntry) -> None:
+        ...
+
+
+class LocalDiskReferenceStore:
+    """Entries under `root`, evicted least-recently-used beyond `max_bytes`."""
+
+    name = "local"
+
+    def __init__(self, root: str, max_bytes: int = 64 * 1024 * 1024):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._sizes: Optional[Dict[Path, int]] = None
+        self.evictions = 0
+
+    def _path(self, docx_sha256: str) -> Path:
+        return self.root / docx_sha256[:2] / _entry_name(docx_sha256)
+
+    def _index(self) -> Dict[Path, int]:
+        # Sizes of the entries on disk, scanned once (other processes may share the dir)
+        if self._sizes is None:
+            self._sizes = {}
+            if self.root.exists():
+                for path in self.root.glob("*/*.ref"):
+                    try:
+                        self._sizes[path] = path.stat().st_size
+                    except OSError:
+                        pass
+        return self._sizes
+
+    @property
+    def total_bytes(self) -> int:
+        with self._lock:
+            return sum(self._index().values())
+
+    def get(self, docx_sha256: str) -> Optional[ReferenceEntry]:
+        path = self._path(docx_sha256)
+        try:
+            data = path.read_bytes()
+        except FileNotFoundError:
+            return None
+        try:
+            entry = decode_entry(data, docx_sha256)
+        except ReferenceStoreCorrupt:
+            self._remove(path)
+            return None
+        try:
+            os.utime(path)  # LRU recency
+        except OSError:
+            pass
+        return entry
+
+    def put(self, entry: ReferenceEntry) -> None:
+        data = encode_entry(entry)
+        if len(data) > self.max_bytes:
+            return
+        path = self._path(entry.docx_sha256)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        with self._lock:
+            self._index()[path] = len(data)
+        self._evict()
+
+    def _remove(self, path: Path) -> None:
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+        with self._lock:
+            self._index().pop(path, None)
+
+    def _evict(self) -> None:
+        with self._lock:
+            sizes = self._index()
+            total = sum(sizes.values())
+            if total <= self.max_bytes:
+                return
+
+            def recency(path: Path) -> float:
+                try:
+                    return path.stat().st_mtime
+                except OSError:
+                    return 0.0
+
+            for path in sorted(sizes, key=recency):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    pass
+                total -= sizes.pop(path)
+                self.evictions += 1
+
+
+class ObjectStorageReferenceStore:
+    """Entries as blobs under `prefix` in a Cloud Storage bucket."""
+
+    name = "gcs"
+
+    def __init__(self, bucket_name: str, prefix: str = "reference-store/", client=None):
+        self.bucket_name = bucket_name
+        self.prefix = prefix
+        self._client = client
+
+    def _blob(self, docx_sha256: str):
+        from shared.cloud_clients import get_storage
+
+        client = self._client or get_storage()
+        return client.bucket(self.bucket_name).blob(self.prefix + _entry_name(docx_sha256))
+
+    def get(self, docx_sha256: str) -> Optional[ReferenceEntry]:
+        blob = self._blob(docx_sha256)
+        try:
+            data = blob.download_as_bytes()
+        except Exception as e:
+            if type(e).__name__ in ("NotFound", "FileNotFoundError"):
+                return None
+            raise
+        try:
+            return decode_entry(data, docx_sha256)
+        except ReferenceStoreCorrupt:
+            blob.delete()
+            return None
+
+    def put(self, entry: ReferenceEntry) -> None:
+        self._blob(entry.docx_sha256).upload_from_string(encode_entry(entry), content_type="application/octet-stream")
+
+
+class TieredReferenceStore:
+    """Local disk first, object storage behind it; remote hits are copied locally."""
+
+    name = "tiered"
+
+    def __init__(self, local: LocalDiskReferenceStore, remote: ObjectStorageReferenceStore):
+        self.local = local
+        self.remote = remote
+
+    def get(self, docx_sha256: str) -> Optional[ReferenceEntry]:
+        entry = self.local.get(docx_sha256)
+        if entry is None:
+            entry = self.remote.get(docx_sha256)
+            if entry is not None:
+                self.local.put(entry)
+        return entry
+
+    def put(self, entry: ReferenceEntry) -> None:
+        self.local.put(entry)
+        self.remote.put(entry)
+
+
+def store_from_env(env: Optional[Dict[str, str]] = None) -> Optional[ReferenceStore]:
+    env = os.environ if env is None else env
+    kind = env.get("REFERENCE_STORE", "local").strip().lower()
+    if kind in ("off", "none", "0", ""):
+        return None
+
+    def local():
+        return LocalDiskReferenceStore(
+            env.get("REFERENCE_STORE_DIR", os.path.join(tempfile.gettempdir(), "ocr-reference-store")),
+            int(env.get("REFERENCE_STORE_MAX_BYTES", str(64 * 1024 * 1024))),
+        )
+
+    def remote():
+        bucket = env.get("REFERENCE_STORE_BUCKET")
+        if not bucket:
+            raise ValueError("REFERENCE_STORE_BUCKET is required for REFERENCE_STORE=" + kind)
+        return ObjectStorageReferenceStore(bucket, env.get("REFERENCE_STORE_PREFIX", "reference-store/"))
+
+    if kind == "local":
+        return local()
+    if kind == "gcs":
+        return remote()
+    if kind == "tiered":
+        return TieredReferenceStore(local(), remote())
+    raise ValueError(f"Unknown REFERENCE_STORE: {kind}")
+
+
+_store: Optional[ReferenceStore] = None
+_store_loaded = False
+_store_lock = threading.Lock()
+
+
+def get_reference_store() -> Optional[ReferenceStore]:
+    """Process-wide store from env (None when disabled)."""
+    global _store, _store_loaded
+    if not _store_loaded:
+        with _store_lock:
+            if not _store_loaded:
+                _store = store_from_env()
+                _store_loaded = True
+    return _store
+
+
+def set_reference_store(store: Optional[ReferenceStore]) -> None:
+    """Override the process-wide store (None resets to env configuration)."""
+    global _store, _store_loaded
+    with _store_lock:
+        _store = store
+        _store_loaded = store is not None
+
+
+def load_candidates(
+    docx_bytes: bytes,
+    source_path: str,
+    language: str,
+    extract,
+    store: Optional[ReferenceStore] = None,
+    docx_sha256: Optional[str] = None,
+) -> List[SectionCandidate]:
+    """
+    Candidates for a DOCX: from the store when present, else `extract(docx_bytes,
+    source_path, language)` and written back. Store failures never fail the job.
+    """
+    store = store or get_reference_store()
+    if store is None:
+        return extract(docx_bytes, source_path, language)
+
+    key = docx_sha256 or docx_key(docx_bytes)
+    try:
+        entry = store.get(key)
+    except Exception as e:
+        print(f"Warning: reference store read failed for {source_path}: {e}")
+        entry = None
+    record_cache("reference_store", entry is not None)
+    if entry is not None:
+        prime_from_entry(entry)
+        return entry.candidates(source_path, language)
+
+    candidates = extract(docx_bytes, source_path, language)
+    try:
+        store.put(build_entry(key, candidates))
+    except Exception as e:
+        print(f"Warning: reference store write failed for {source_path}: {e}")
+    return candidates
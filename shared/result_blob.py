@@ -0,0 +1,310 @@
+"""
+Compressed columnar result blobs for large jobs.
+
+A Firestore document per image (full OCR and reference text) is slow and
+costly to write and read back for jobs with thousands of images. Large jobs
+instead store their per-image results as one object in the upload bucket,
+and the job document keeps only the summary and a pointer
+(`result.results_blob`).
+
+Object layout (gs://<bucket>/jobs/<job_id>/results.ocrb):
+
+    MAGIC
+    chunk 0 .. chunk n-1   compressed JSON columns of up to CHUNK_ROWS rows
+    string table           compressed JSON list of strings
+    footer                 JSON: codec, row count, chunk offsets/lengths/rows,
+                           string table offset/length
+    footer length (8 bytes, big endian), MAGIC
+
+Rows are in archive order. Reference texts, chosen section names/numbers and
+warnings are interned in the string table (many images share the same chosen
+section), OCR text stays in the chunk columns. Each row also stores its key
+set (interned), so results round-trip exactly.
+
+Readers fetch the footer, the string table and only the chunks a page
+touches, using ranged reads.
+
+Env:
+    RESULTS_BLOB_MIN_RESULTS  jobs expecting at least this many results use a blob, default 500
+    RESULTS_BLOB_CHUNK_ROWS   rows per chunk, default 1000
+    RESULTS_BLOB_CODEC        gzip | zstd (needs the zstandard package), default gzip
+"""
+
+from __future__ import annotations
+
+import gzip
+import json
+import os
+import struct
+import tempfile
+from typing import Any, Callable, Dict, Iterator, List, Mapping, Optional, Tuple
+
+from shared.result_sink import ResultAggregates
+
+MAGIC = b"OCRB1\n"
+_TAIL = struct.Struct(">Q")
+
+# Flattened fields whose string values go to the string table
+_INTERNED = frozenset({"reference", "selection.chosen_section_name", "selection.chosen_section_number"})
+_INTERNED_LISTS = frozenset({"selection.warnings"})
+_KEYS = "_keys"
+
+
+def job_results_blob_path(job_id: str) -> str:
+    return f"jobs/{job_id}/results.ocrb"
+
+
+def _codec(name: str) -> Tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]:
+    if name == "gzip":
+        return (lambda data: gzip.compress(data, 6, mtime=0)), gzip.decompress
+    if name == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            raise RuntimeError("zstd result blobs need the zstandard package") from None
+        return zstandard.ZstdCompressor(level=6).compress, zstandard.ZstdDecompressor().decompress
+    raise ValueError(f"Unknown result blob codec: {name}")
+
+
+def _dumps(obj: Any) -> bytes:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class _StringTable:
+    def __init__(self):
+        self.strings: List[str] = []
+        self._index: Dict[str, int] = {}
+
+    def intern(self, value: Optional[str]) -> Optional[int]:
+        if value is None:
+            return None
+        idx = self._index.get(value)
+        if idx is None:
+            idx = self._index[value] = len(self.strings)
+            self.strings.append(value)
+        return idx
+
+
+def _flatten(result: Mapping[str, Any]) -> Tuple[List[str], Dict[str, Any]]:
+    keys: List[str] = []
+    values: Dict[str, Any] = {}
+    for key, value in result.items():
+        keys.append(key)
+        if key == "selection" and isinstance(value, Mapping):
+            for sub, sub_value in value.items():
+                keys.append(f"selection.{sub}")
+                values[f"selection.{sub}"] = sub_value
+        else:
+            values[key] = value
+    return keys, values
+
+
+class ResultBlobWriter:
+    """Writes results (in order) to a binary file object in the blob layout."""
+
+    def __init__(self, fileobj, codec: Optional[str] = None, chunk_rows: Optional[int] = None):
+        self.codec = codec or os.environ.get("RESULTS_BLOB_CODEC", "gzip")
+        self.chunk_rows = int(os.environ.get("RESULTS_BLOB_CHUNK_ROWS", "1000")) if chunk_rows is None else chunk_rows
+        self._compress, _ = _codec(self.codec)
+        self._out = fileobj
+        self._strings = _StringTable()
+        self._rows: List[Tuple[List[str], Dict[str, Any]]] = []
+        self._chunks: List[Dict[str, int]] = []
+        self.rows = 0
+        self.bytes_written = 0
+        self._write(MAGIC)
+
+    def _write(self, data: bytes) -> Dict[str, int]:
+        span = {"offset": self.bytes_written, "length": len(data)}
+        self._out.write(data)
+        self.bytes_written += len(data)
+        return span
+
+    def write(self, result: Mapping[str, Any]) -> None:
+        self._rows.append(_flatten(result))
+        self.rows += 1
+        if len(self._rows) >= self.chunk_rows:
+            self._flush_chunk()
+
+    def _flush_chunk(self) -> None:
+        if not self._rows:
+            return
+        n = len(self._rows)
+        columns: Dict[str, List[Any]] = {_KEYS: []}
+        for pos, (keys, values) in enumerate(self._rows):
+            columns[_KEYS].append(self._strings.intern(json.dumps(keys)))
+            for field, value in values.items():
+                if field in _INTERNED and isinstance(value, str):
+                    value = self._strings.intern(value)
+                elif field in _INTERNED_LISTS and isinstance(value, list):
+                    value = [self._strings.intern(v) for v in value]
+                columns.setdefault(field, [None] * n)[pos] = value
+        span = self._write(self._compress(_dumps(columns)))
+        self._chunks.append(dict(span, rows=n))
+        self._rows = []
+
+    def close(self) -> Dict[str, Any]:
+        """Finish the object; returns the footer."""
+        self._flush_chunk()
+        strings = self._write(self._compress(_dumps(self._strings.strings)))
+        footer = {"version": 1, "codec": self.codec, "rows": self.rows, "chunks": self._chunks, "strings": strings}
+        data = _dumps(footer)
+        self._write(data)
+        self._write(_TAIL.pack(len(data)) + MAGIC)
+        return footer
+
+
+class ResultBlobReader:
+    """Lazy reader over a stored result blob: footer first, then only the chunks asked for."""
+
+    def __init__(self, blob, size: int):
+        self._blob = blob
+        self._size = size
+        self._footer: Optional[Dict[str, Any]] = None
+        self._strings: Optional[List[str]] = None
+        self._decompress: Optional[Callable[[bytes], bytes]] = None
+        self.chunks_read = 0
+
+    def _range(self, offset: int, length: int) -> bytes:
+        return self._blob.download_as_bytes(start=offset, end=offset + length - 1)
+
+    @property
+    def footer(self) -> Dict[str, Any]:
+        if self._footer is None:
+            tail_len = _TAIL.size + len(MAGIC)
+            tail = self._range(self._size - tail_len, tail_len)
+            if tail[_TAIL.size:] != MAGIC:
+                raise ValueError("Not a result blob (bad trailer)")
+            (footer_len,) = _TAIL.unpack(tail[:_TAIL.size])
+            self._footer = json.loads(self._range(self._size - tail_len - footer_len, footer_len))
+            _, self._decompress = _codec(self._footer["codec"])
+        return self._footer
+
+    def __len__(self) -> int:
+        return self.footer["rows"]
+
+    def _load(self, span: Mapping[str, int]) -> Any:
+        self.footer  # reads the codec on first use
+        return json.loads(self._decompress(self._range(span["offset"], span["length"])))
+
+    @property
+    def strings(self) -> List[str]:
+        if self._strings is None:
+            self._strings = self._load(self.footer["strings"])
+        return self._strings
+
+    def _decode_chunk(self, chunk: Mapping[str, int]) -> Iterator[Dict[str, Any]]:
+        columns = self._load(chunk)
+        self.chunks_read += 1
+        strings = self.strings
+        for pos in range(chunk["rows"]):
+            result: Dict[str, Any] = {}
+            for key in json.loads(strings[columns[_KEYS][pos]]):
+                if key == "selection":
+                    result["selection"] = {}
+                    continue
+                value = columns[key][pos]
+                if key in _INTERNED and isinstance(value, int):
+                    value = strings[value]
+                elif key in _INTERNED_LISTS and isinstance(value, list):
+                    value = [strings[i] for i in value]
+                if key.startswith("selection."):
+                    result["selection"][key[len("selection."):]] = value
+                else:
+                    result[key] = value
+            yield result
+
+    def iter_rows(self, start: int = 0, stop: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """Rows [start, stop) in archive order, decoding only the chunks they fall in."""
+        stop = len(self) if stop is None else min(stop, len(self))
+        first = 0
+        for chunk in self.footer["chunks"]:
+            last = first + chunk["rows"]
+            if last > start and first < stop:
+                for pos, row in enumerate(self._decode_chunk(chunk), first):
+                    if start <= pos < stop:
+                        yield row
+            if last >= stop:
+                return
+            first = last
+
+
+def open_result_blob(pointer: Mapping[str, Any], storage=None) -> ResultBlobReader:
+    """Reader for the `result.results_blob` pointer of a job document."""
+    from shared.cloud_clients import get_storage
+
+    blob = (storage or get_storage()).bucket(pointer["bucket"]).blob(pointer["path"])
+    return ResultBlobReader(blob, pointer["bytes"])
+
+
+class BlobResultSink:
+    """
+    Results for a large job, written as one result blob in archive order.
+
+    Results arrive out of order; they are spooled to a temporary NDJSON file
+    with an in-memory (position, offset, length) index, and `flush` writes
+    the blob in order while streaming it to storage.
+    """
+
+    def __init__(
+        self,
+        job_id: str,
+        bucket,
+        order: Optional[Mapping[str, int]] = None,
+        codec: Optional[str] = None,
+        chunk_rows: Optional[int] = None,
+        directory: Optional[str] = None,
+    ):
+        self.aggregates = ResultAggregates()
+        self._bucket = bucket
+        self._path = job_results_blob_path(job_id)
+        self._order = order or {}
+        self._next_seq = len(self._order)
+        self._codec = codec
+        self._chunk_rows = chunk_rows
+        fd, self._spool_path = tempfile.mkstemp(prefix="ocr_results_", suffix=".ndjson", dir=directory)
+        self._spool = os.fdopen(fd, "w+b")
+        self._index: List[Tuple[int, int, int]] = []  # (seq, offset, length)
+        self.pointer: Optional[Dict[str, Any]] = None
+
+    def write(self, result: Dict[str, Any]) -> None:
+        seq = self._order.get(result["image"])
+        if seq is None:
+            seq, self._next_seq = self._next_seq, self._next_seq + 1
+        data = _dumps(result) + b"\n"
+        self._index.append((seq, self._spool.tell(), len(data)))
+        self._spool.write(data)
+        self.aggregates.add(result)
+
+    def flush(self) -> None:
+        """Write the blob (once); results written afterwards are not stored."""
+        if self.pointer is not None:
+            return
+        try:
+            self._index.sort()
+            with self._bucket.blob(self._path).open("wb") as out:
+                writer = ResultBlobWriter(out, codec=self._codec, chunk_rows=self._chunk_rows)
+                for _, offset, length in self._index:
+                    self._spool.seek(offset)
+                    writer.write(json.loads(self._spool.read(length)))
+                footer = writer.close()
+            self.pointer = {
+                "bucket": self._bucket.name,
+                "path": self._path,
+                "bytes": writer.bytes_written,
+                "rows": footer["rows"],
+                "codec": footer["codec"],
+            }
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        """Remove the spool (idempotent); results not flushed by then are discarded."""
+        if not self._spool.closed:
+            self._spool.close()
+        if os.path.exists(self._spool_path):
+            os.remove(self._spool_path)
+
+    @property
+    def inline_results(self) -> None:
+        return None  # large jobs never copy results into the job document
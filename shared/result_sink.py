@@ -0,0 +1,192 @@
+"""
+Incremental per-image result sinks with bounded memory.
+
+A job's per-image results (OCR text + reference text) used to accumulate in
+one dict until the end of the job; for archives with thousands of images
+that dict, and the Firestore job document holding it, grow without bound.
+Sinks receive results one at a time as they are produced and keep only
+running aggregates (and, for small jobs, an inline copy) in memory:
+
+  - MemoryResultSink: plain dict, for small jobs and tests
+  - NdjsonSpoolSink: one JSON line per result in a temp file, read back lazily
+  - FirestoreResultSink: one document per result in jobs/<job_id>/results,
+    written in batches; document ids are the image's position in the archive,
+    so streaming the sub-collection returns archive order
+
+Env:
+    RESULTS_INLINE_LIMIT  results also copied into the job document when the
+                          job has at most this many, default 100
+    RESULTS_BATCH_SIZE    Firestore batched writes, default 200 (max 500)
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, Mapping, Optional, Protocol
+
+
+def _manual_required(result: Mapping[str, Any]) -> bool:
+    return bool((result.get("selection") or {}).get("manual_required"))
+
+
+@dataclass
+class ResultAggregates:
+    total: int = 0
+    passed: int = 0  # match and not MANUAL
+    manual_count: int = 0  # selection.manual_required
+    mismatched: int = 0  # normalized OCR != chosen reference
+
+    def add(self, result: Mapping[str, Any]) -> None:
+        manual = _manual_required(result)
+        self.total += 1
+        self.passed += bool(result.get("match")) and not manual
+        self.manual_count += manual
+        self.mismatched += not result.get("match")
+
+    @property
+    def failure_rate(self) -> Optional[float]:
+        return round((self.total - self.passed) / self.total, 4) if self.total else None
+
+    def to_dict(self) -> Dict[str, int]:
+        return {
+            "total": self.total,
+            "passed": self.passed,
+            "manual_count": self.manual_count,
+            "mismatched": self.mismatched,
+        }
+
+
+class ResultSink(Protocol):
+    aggregates: ResultAggregates
+
+    def write(self, result: Dict[str, Any]) -> None:
+        ...
+
+
+class MemoryResultSink:
+    """Results in a dict keyed by image path, in `order` (archive positions) when given."""
+
+    def __init__(self, order: Optional[Mapping[str, int]] = None):
+        self.aggregates = ResultAggregates()
+        self._order = order
+        self._results: Dict[str, Dict[str, Any]] = {}
+
+    def write(self, result: Dict[str, Any]) -> None:
+        self._results[result["image"]] = result
+        self.aggregates.add(result)
+
+    @property
+    def results(self) -> Dict[str, Dict[str, Any]]:
+        if self._order is None:
+            return dict(self._results)
+        end = len(self._order)
+        return dict(sorted(self._results.items(), key=lambda kv: self._order.get(kv[0], end)))
+
+
+class NdjsonSpoolSink:
+    """Results spooled to a temporary NDJSON file; iterate to read them back in write order."""
+
+    def __init__(self, directory: Optional[str] = None):
+        self.aggregates = ResultAggregates()
+        fd, self.path = tempfile.mkstemp(prefix="ocr_results_", suffix=".ndjson", dir=directory)
+        self._file = os.fdopen(fd, "w", encoding="utf-8")
+
+    def write(self, result: Dict[str, Any]) -> None:
+        self._file.write(json.dumps(result, ensure_ascii=False) + "\n")
+        self.aggregates.add(result)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        self._file.flush()
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                yield json.loads(line)
+
+    def close(self) -> None:
+        if not self._file.closed:
+            self._file.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def __enter__(self) -> "NdjsonSpoolSink":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def results_collection(job_id: str, firestore=None):
+    from shared.cloud_clients import get_firestore
+
+    return (firestore or get_firestore()).collection("jobs").document(job_id).collection("results")
+
+
+class FirestoreResultSink:
+    """Results as documents in jobs/<job_id>/results, buffered into batched writes."""
+
+    def __init__(
+        self,
+        job_id: str,
+        order: Optional[Mapping[str, int]] = None,
+        firestore=None,
+        inline_limit: Optional[int] = None,
+        batch_size: Optional[int] = None,
+    ):
+        from shared.cloud_clients import get_firestore
+
+        self.aggregates = ResultAggregates()
+        self._client = firestore or get_firestore()
+        self._collection = results_collection(job_id, self._client)
+        self._order = order or {}
+        self._next_seq = len(self._order)
+        self.inline_limit = int(os.environ.get("RESULTS_INLINE_LIMIT", "100")) if inline_limit is None else inline_limit
+        self.batch_size = int(os.environ.get("RESULTS_BATCH_SIZE", "200")) if batch_size is None else batch_size
+        self._inline = MemoryResultSink(order)
+        self._pending = []
+
+    def _seq(self, image: str) -> int:
+        seq = self._order.get(image)
+        if seq is None:
+            seq, self._next_seq = self._next_seq, self._next_seq + 1
+        return seq
+
+    def write(self, result: Dict[str, Any]) -> None:
+        seq = self._seq(result["image"])
+        self._pending.append((f"{seq:08d}", dict(result, seq=seq)))
+        self.aggregates.add(result)
+        if self.aggregates.total <= self.inline_limit:
+            self._inline.write(result)
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._pending:
+            return
+        batch = self._client.batch()
+        for doc_id, data in self._pending:
+            batch.set(self._collection.document(doc_id), data)
+        batch.commit()
+        self._pending = []
+
+    def close(self) -> None:
+        """Write what is still buffered (best effort: a failing job must not fail again here)."""
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"Warning: dropped {len(self._pending)} buffered results: {e}")
+            self._pending = []
+
+    @property
+    def inline_results(self) -> Optional[Dict[str, Dict[str, Any]]]:
+        """All results, if the job was small enough to keep them in the job document."""
+        return self._inline.results if self.aggregates.total <= self.inline_limit else None
+
+
+def iter_job_results(job_id: str, firestore=None) -> Iterator[Dict[str, Any]]:
+    """Stored per-image results of a job, in archive order."""
+    for snapshot in results_collection(job_id, firestore).stream():
+        result = snapshot.to_dict()
+        result.pop("seq", None)
+        yield result
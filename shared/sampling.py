@@ -0,0 +1,225 @@
+"""
+Per-job OCR budget: stratified sampling of archive images.
+
+Every checked image costs one Vision call. Instead of the first N entries of
+the archive, a job checks at most `budget` images spread over strata
+(language x reference file), so every locale/reference gets looked at before
+any stratum gets a second image:
+
+  1. strata are ordered by size (ties by key); when the budget is smaller than
+     the number of strata, a seeded shuffle decides which strata get an image
+  2. the rest of the budget is split proportionally to stratum size
+     (largest remainder)
+  3. images inside a stratum are drawn with a seeded RNG from the path-sorted
+     list, so the same archive + seed always yields the same sample
+
+Images not drawn are reported in `SamplingPlan.skipped`; the summary stored in
+the job document (`to_dict`) keeps only their count and the first
+SKIPPED_PREVIEW names. If the failure rate of the sample (mismatch or MANUAL)
+exceeds `escalate_above`, the skipped images are checked too (full coverage).
+
+Env (job payload keys in parentheses override):
+    OCR_BUDGET_PER_JOB         (ocr_budget) images per job, 0 = no limit, default 10
+    OCR_SAMPLE_SEED            (sample_seed) default 0
+    OCR_ESCALATE_FAILURE_RATE  (escalate_failure_rate) 0..1, empty = never escalate
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import random
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple, TypeVar, Union
+
+from shared.metrics import IMAGES_SKIPPED
+from shared.result_sink import MemoryResultSink, ResultAggregates, ResultSink
+
+T = TypeVar("T")
+
+# Skipped image names kept in SamplingPlan.to_dict()
+SKIPPED_PREVIEW = 20
+
+
+@dataclass(frozen=True)
+class SamplingConfig:
+    budget: int = 10  # <= 0: check everything
+    seed: int = 0
+    escalate_above: Optional[float] = None
+
+    @classmethod
+    def from_env(cls, env: Optional[Mapping[str, str]] = None) -> "SamplingConfig":
+        env = os.environ if env is None else env
+        escalate = env.get("OCR_ESCALATE_FAILURE_RATE", "").strip()
+        return cls(
+            budget=int(env.get("OCR_BUDGET_PER_JOB", "10")),
+            seed=int(env.get("OCR_SAMPLE_SEED", "0")),
+            escalate_above=float(escalate) if escalate else None,
+        )
+
+    def with_overrides(self, payload: Mapping[str, Any]) -> "SamplingConfig":
+        """Apply per-job overrides (ocr_budget / sample_seed / escalate_failure_rate)."""
+        escalate = payload.get("escalate_failure_rate", self.escalate_above)
+        return SamplingConfig(
+            budget=int(payload.get("ocr_budget", self.budget)),
+            seed=int(payload.get("sample_seed", self.seed)),
+            escalate_above=None if escalate is None else float(escalate),
+        )
+
+    def max_checked(self, total: int) -> int:
+        """Most images a job of `total` can end up checking, counting an escalation to full coverage."""
+        if self.budget <= 0 or self.escalate_above is not None:
+            return total
+        return min(total, self.budget)
+
+
+@dataclass
+class SamplingPlan:
+    selected: List[int]  # positions in the input, ascending
+    skipped: List[int]
+    strata: Dict[str, Tuple[int, int]]  # stratum -> (total, sampled)
+    config: SamplingConfig
+    failure_rate: Optional[float] = None
+    escalated: bool = False
+    skipped_names: List[str] = field(default_factory=list)
+
+    def decide_escalation(self, sample: ResultAggregates) -> bool:
+        """Record the sample's failure rate; True if the skipped items must be checked too."""
+        self.failure_rate = sample.failure_rate
+        escalate = bool(self.skipped) and self.config.escalate_above is not None and (
+            (self.failure_rate or 0.0) > self.config.escalate_above
+        )
+        if escalate:
+            self.escalated = True
+            self.skipped_names = []
+        else:
+            IMAGES_SKIPPED.inc(len(self.skipped))
+        return escalate
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "budget": self.config.budget,
+            "seed": self.config.seed,
+            "escalate_above": self.config.escalate_above,
+            "sampled": len(self.selected),
+            "skipped_count": len(self.skipped_names),
+            "skipped_preview": self.skipped_names[:SKIPPED_PREVIEW],
+            "strata": {k: {"total": t, "sampled": s} for k, (t, s) in self.strata.items()},
+            "failure_rate": self.failure_rate,
+            "escalated": self.escalated,
+        }
+
+
+def match_stratum(match: Sequence[Any]) -> str:
+    """Stratum of a parse_zip_streaming extended tuple: language + reference identity."""
+    _, _, ref_text, ref_bytes, language = match[:5]
+    ref = ref_bytes if ref_bytes else (ref_text or "").encode("utf-8")
+    return f"{language}:{hashlib.sha256(ref).hexdigest()[:12]}"
+
+
+def match_name(match: Sequence[Any]) -> str:
+    return match[0]
+
+
+def _allocate(sizes: Dict[str, int], budget: int, rng: random.Random) -> Dict[str, int]:
+    keys = sorted(sizes, key=lambda k: (-sizes[k], k))
+    if budget < len(keys):
+        rng.shuffle(keys)
+        return {k: (1 if i < budget else 0) for i, k in enumerate(keys)}
+    alloc = {k: 1 for k in keys}
+    spare = budget - len(keys)
+    remaining = {k: sizes[k] - 1 for k in keys}
+    total_remaining = sum(remaining.values())
+    if spare <= 0 or total_remaining <= 0:
+        return alloc
+    spare = min(spare, total_remaining)
+    shares = {k: spare * remaining[k] / total_remaining for k in keys}
+    for k in keys:
+        alloc[k] += int(shares[k])
+    left = spare - sum(int(s) for s in shares.values())
+    for k in sorted(keys, key=lambda k: (-(shares[k] - int(shares[k])), k)):
+        if left <= 0:
+            break
+        if alloc[k] < sizes[k]:
+            alloc[k] += 1
+            left -= 1
+    return alloc
+
+
+def plan_sample(
+    items: Sequence[T],
+    config: SamplingConfig,
+    stratum: Callable[[T], str] = match_stratum,
+    name: Callable[[T], str] = match_name,
+) -> SamplingPlan:
+    """Choose which items to check under the config's budget."""
+    groups: Dict[str, List[int]] = {}
+    for pos, item in enumerate(items):
+        groups.setdefault(stratum(item), []).append(pos)
+
+    if config.budget <= 0 or config.budget >= len(items):
+        return SamplingPlan(
+            selected=list(range(len(items))),
+            skipped=[],
+            strata={k: (len(v), len(v)) for k, v in sorted(groups.items())},
+            config=config,
+        )
+
+    rng = random.Random(config.seed)
+    alloc = _allocate({k: len(v) for k, v in groups.items()}, config.budget, rng)
+    selected: List[int] = []
+    for key in sorted(groups):
+        members = sorted(groups[key], key=lambda pos: name(items[pos]))
+        selected.extend(rng.sample(members, alloc[key]))
+    selected.sort()
+    chosen = set(selected)
+    skipped = [pos for pos in range(len(items)) if pos not in chosen]
+    return SamplingPlan(
+        selected=selected,
+        skipped=skipped,
+        strata={k: (len(v), alloc[k]) for k, v in sorted(groups.items())},
+        config=config,
+        skipped_names=[name(items[pos]) for pos in skipped],
+    )
+
+
+def sample_into(
+    items: Sequence[T],
+    config: SamplingConfig,
+    check: Callable[[List[T]], Union[Mapping[str, dict], Iterable[dict]]],
+    sink: ResultSink,
+    stratum: Callable[[T], str] = match_stratum,
+    name: Callable[[T], str] = match_name,
+) -> SamplingPlan:
+    """
+    Run `check` on the sample, writing results to `sink` as they come, and
+    escalate to the skipped items when the sample fails too often.
+    `check` returns a dict by image path or yields result dicts.
+    """
+    plan = plan_sample(items, config, stratum, name)
+
+    def write_all(batch: List[T]) -> ResultAggregates:
+        seen = ResultAggregates()
+        out = check(batch)
+        for result in (out.values() if isinstance(out, Mapping) else out):
+            sink.write(result)
+            seen.add(result)
+        return seen
+
+    sample = write_all([items[pos] for pos in plan.selected])
+    if plan.decide_escalation(sample):
+        write_all([items[pos] for pos in plan.skipped])
+    return plan
+
+
+def run_sampled(
+    items: Sequence[T],
+    config: SamplingConfig,
+    check: Callable[[List[T]], Union[Mapping[str, dict], Iterable[dict]]],
+    stratum: Callable[[T], str] = match_stratum,
+    name: Callable[[T], str] = match_name,
+) -> Tuple[Dict[str, dict], SamplingPlan]:
+    """sample_into an in-memory sink; results keep the input order."""
+    sink = MemoryResultSink({name(item): pos for pos, item in enumerate(items)})
+    plan = sample_into(items, config, check, sink, stratum, name)
+    return sink.results, plan
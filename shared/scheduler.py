@@ -0,0 +1,198 @@
+"""
+Fair in-process scheduling of OCR work across concurrent jobs.
+
+With Cloud Run concurrency > 1 several jobs share one worker instance. Each
+job used to call OCR from its own thread with no policy, so a 5,000-image
+job that started first kept the OCR backend busy while a 10-image job
+submitted after it waited behind it. The scheduler owns one global pool of
+OCR_CONCURRENCY threads; jobs queue work units (one OCR call each) in their
+own queue and the pool picks the next unit by weighted round-robin over the
+jobs with queued work (stride scheduling):
+
+  - every job has a virtual time; dispatching one of its units advances it
+    by 1 / weight, and the job with the smallest virtual time goes next
+  - small jobs (at most SCHED_SMALL_JOB units left) get SCHED_SMALL_WEIGHT,
+    others weight 1, so a small job is served several units per unit of a
+    large one and finishes first, while the large job never starves
+  - a job that was idle (e.g. matching between OCR chunks) rejoins at the
+    current virtual time instead of cashing in the time it wasn't queued
+
+A single job gets the whole pool when it runs alone.
+
+Env:
+    OCR_CONCURRENCY     OCR calls in flight per instance, default 8
+    SCHED_SMALL_JOB     "small job" threshold in remaining units, default 50
+    SCHED_SMALL_WEIGHT  weight of small jobs, default 4
+"""
+
+from __future__ import annotations
+
+import contextvars
+import itertools
+import os
+import threading
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Callable, Deque, Iterable, List, Optional, Tuple
+
+_Unit = Tuple[Future, Callable[[], Any]]
+
+
+class JobQueue:
+    """One job's queue of work units; create with FairScheduler.job()."""
+
+    def __init__(self, scheduler: "FairScheduler", job_id: str, size: int, seq: int):
+        self.job_id = job_id
+        self.size = size  # expected number of units (a hint for small-job priority)
+        self.dispatched = 0
+        self.vtime = 0.0
+        self._seq = seq
+        self._scheduler = scheduler
+        self._units: Deque[_Unit] = deque()
+
+    @property
+    def remaining(self) -> int:
+        return max(self.size - self.dispatched, len(self._units))
+
+    def submit(self, fn: Callable[..., Any], *args: Any) -> Future:
+        """Queue `fn(*args)`; it runs on the shared pool in the caller's context."""
+        ctx = contextvars.copy_context()
+        future: Future = Future()
+        self._scheduler._enqueue(self, (future, lambda: ctx.run(fn, *args)))
+        return future
+
+    def map(self, fn: Callable[[Any], Any], items: Iterable[Any]) -> List[Any]:
+        """fn over items on the shared pool, results in input order."""
+        futures = [self.submit(fn, item) for item in items]
+        return [f.result() for f in futures]
+
+    def close(self) -> None:
+        """Leave the scheduler; queued units that haven't started are cancelled."""
+        self._scheduler._remove(self)
+
+    def __enter__(self) -> "JobQueue":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class FairScheduler:
+    """Global OCR pool shared by all jobs of the process, weighted round-robin between jobs."""
+
+    def __init__(
+        self,
+        slots: Optional[int] = None,
+        small_job: Optional[int] = None,
+        small_weight: Optional[int] = None,
+    ):
+        env = os.environ
+        self.slots = max(1, int(env.get("OCR_CONCURRENCY", "8")) if slots is None else slots)
+        self.small_job = int(env.get("SCHED_SMALL_JOB", "50")) if small_job is None else small_job
+        self.small_weight = int(env.get("SCHED_SMALL_WEIGHT", "4")) if small_weight is None else small_weight
+        self._cond = threading.Condition()
+        self._jobs: List[JobQueue] = []
+        self._clock = 0.0  # virtual time of the last dispatched unit
+        self._seq = itertools.count()
+        self._threads: List[threading.Thread] = []
+        self._stopped = False
+
+    def weight(self, queue: JobQueue) -> int:
+        return self.small_weight if queue.remaining <= self.small_job else 1
+
+    def job(self, job_id: str, size: int) -> JobQueue:
+        """Register a job expected to submit about `size` units."""
+        queue = JobQueue(self, job_id, size, next(self._seq))
+        with self._cond:
+            queue.vtime = self._clock
+            self._jobs.append(queue)
+        return queue
+
+    def _enqueue(self, queue: JobQueue, unit: _Unit) -> None:
+        with self._cond:
+            if self._stopped:
+                raise RuntimeError("Scheduler is shut down")
+            if not queue._units:
+                queue.vtime = max(queue.vtime, self._clock)
+            queue._units.append(unit)
+            self._start_threads()
+            self._cond.notify()
+
+    def _remove(self, queue: JobQueue) -> None:
+        with self._cond:
+            if queue in self._jobs:
+                self._jobs.remove(queue)
+            pending, queue._units = list(queue._units), deque()
+        for future, _ in pending:
+            future.cancel()
+
+    def _next(self) -> Optional[_Unit]:
+        ready = [q for q in self._jobs if q._units]
+        if not ready:
+            return None
+        queue = min(ready, key=lambda q: (q.vtime, q.remaining, q._seq))
+        self._clock = queue.vtime
+        queue.vtime += 1.0 / self.weight(queue)
+        queue.dispatched += 1
+        return queue._units.popleft()
+
+    def _start_threads(self) -> None:
+        # Pool threads start with the first unit, not at import
+        while len(self._threads) < self.slots:
+            thread = threading.Thread(target=self._run, name=f"ocr-sched-{len(self._threads)}", daemon=True)
+            self._threads.append(thread)
+            thread.start()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                unit = self._next()
+                while unit is None and not self._stopped:
+                    self._cond.wait()
+                    unit = self._next()
+                if unit is None:
+                    return
+            future, call = unit
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                result = call()
+            except BaseException as e:
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+
+    def shutdown(self) -> None:
+        with self._cond:
+            self._stopped = True
+            jobs, self._jobs = list(self._jobs), []
+            self._cond.notify_all()
+        for queue in jobs:
+            for future, _ in queue._units:
+                future.cancel()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+
+_scheduler: Optional[FairScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> FairScheduler:
+    """Process-wide scheduler, configured from env on first use."""
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = FairScheduler()
+    return _scheduler
+
+
+def set_scheduler(scheduler: Optional[FairScheduler]) -> None:
+    """Replace the process-wide scheduler (None resets to env configuration)."""
+    global _scheduler
+    with _scheduler_lock:
+        old, _scheduler = _scheduler, scheduler
+    if old is not None and old is not scheduler:
+        old.shutdown()
@@ -0,0 +1,301 @@
+"""
+Cache of section-selection decisions, shared across jobs and reruns.
+
+With OCR cached, a rerun of the same campaign still normalizes and rescores
+every candidate of every reference document. A selection is a pure function
+of the strict form of the CTA-cleaned OCR text (soft normalization and the
+token/char counts are derived from it), the reference DOCX, the language and
+the section hints, so decisions are cached under
+
+    sha256(matcher fingerprint, sha256(strict OCR text), DOCX sha256,
+           candidate count, language, section_number, section_name)
+
+The matcher fingerprint hashes the source of the modules that decide a
+selection (scoring constants, section extractor, normalization, similarity,
+candidate index) plus the active similarity backend, so editing any of them
+invalidates every entry without a manual version bump.
+
+Values are the compact SelectionRecord tuples of shared.cpu_pool: the chosen
+section is stored as its position in the candidate list and its text is
+re-derived from the caller's candidates, so an entry stays a few dozen bytes
+however long the sections are. RECORD_FORMAT is part of the key, so rows of
+an older record layout are never read back.
+
+Tiers:
+  - in-process LRU of SELECTION_CACHE_SIZE entries
+  - optional SQLite file on local disk (SELECTION_CACHE_DB), shared by the
+    processes of an instance and kept across worker restarts; the oldest
+    rows beyond SELECTION_CACHE_DB_MAX_ROWS are dropped
+
+Env:
+    SELECTION_CACHE_SIZE          LRU entries, default 100000; 0 disables the LRU
+    SELECTION_CACHE_DB            path of the persistent tier, default unset (memory only)
+    SELECTION_CACHE_DB_MAX_ROWS   default 1000000
+"""
+
+from __future__ import annotations
+
+import functools
+import hashlib
+import importlib.util
+import json
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Sequence
+
+from shared.cpu_pool import SelectionRecord, selection_from_record, selection_to_record
+from shared.docx_section_extractor import SectionCandidate
+from shared.metrics import record_cache
+
+# Layout of the stored SelectionRecord tuples
+RECORD_FORMAT = 2
+
+# Modules whose code can change a selection
+MATCHER_MODULES = (
+    "shared.reference_matcher",
+    "shared.docx_section_extractor",
+    "shared.candidate_index",
+    "shared.similarity",
+    "worker.normalization",
+)
+
+
+@functools.lru_cache(maxsize=None)
+def _sources_digest() -> str:
+    digest = hashlib.sha256()
+    for name in MATCHER_MODULES:
+        digest.update(name.encode("utf-8") + b"\0")
+        spec = importlib.util.find_spec(name)
+        try:
+            with open(spec.origin, "rb") as f:
+                digest.update(f.read())
+        except (AttributeError, TypeError, OSError):
+            pass  # no source file (frozen / zipapp): only the module name counts
+    return digest.hexdigest()[:16]
+
+
+def matcher_fingerprint() -> str:
+    """Changes whenever matcher code or the similarity backend changes."""
+    from shared.similarity import get_similarity_backend
+
+    return f"m{_sources_digest()}-{get_similarity_backend().name}"
+
+
+def selection_key(
+    ocr_text: str,
+    docx_sha256: str,
+    candidate_count: int,
+    language: Optional[str],
+    section_number: Optional[str] = None,
+    section_name: Optional[str] = None,
+    fingerprint: Optional[str] = None,
+) -> str:
+    from shared.reference_matcher import _remove_cta_brackets
+    from worker.normalization import normalize_strict_cached
+
+    strict = normalize_strict_cached(_remove_cta_brackets(ocr_text))
+    parts = [
+        RECORD_FORMAT,
+        fingerprint or matcher_fingerprint(),
+        hashlib.sha256(strict.encode("utf-8")).hexdigest(),
+        docx_sha256,
+        candidate_count,
+        language,
+        section_number,
+        section_name,
+    ]
+    return hashlib.sha256(json.dumps(parts).encode("utf-8")).hexdigest()
+
+
+class SqliteSelectionTier:
+    """Persistent tier: one SQLite table on local disk (WAL, safe across processes)."""
+
+    PRUNE_EVERY = 1024
+
+    def __init__(self, path: str, max_rows: int = 1_000_000):
+        self.path = path
+        self.max_rows = max_rows
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS selections (key TEXT PRIMARY KEY, record TEXT NOT NULL)")
+        self._conn.commit()
+        self._puts = 0
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, SelectionRecord]:
+        found: Dict[str, SelectionRecord] = {}
+        with self._lock:
+            for start in range(0, len(keys), 500):  # SQLite host parameter limit
+                batch = list(keys[start:start + 500])
+                rows = self._conn.execute(
+                    f"SELECT key, record FROM selections WHERE key IN ({','.join('?' * len(batch))})", batch
+                ).fetchall()
+                found.update((key, tuple(json.loads(record))) for key, record in rows)
+        return found
+
+    def put_many(self, records: Dict[str, SelectionRecord]) -> None:
+        with self._lock:
+            # REPLACE gives the row a new rowid, so pruning by rowid drops the least recently written
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO selections (key, record) VALUES (?, ?)",
+                [(key, json.dumps(record, ensure_ascii=False)) for key, record in records.items()],
+            )
+            self._puts += len(records)
+            if self._puts >= self.PRUNE_EVERY:
+                self._puts = 0
+                self._conn.execute(
+                    "DELETE FROM selections WHERE rowid <= (SELECT MAX(rowid) FROM selections) - ?", (self.max_rows,)
+                )
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class SelectionCache:
+    """In-process LRU of selection records, optionally backed by a persistent tier."""
+
+    def __init__(self, size: Optional[int] = None, persistent: Optional[SqliteSelectionTier] = None):
+        self.size = int(os.environ.get("SELECTION_CACHE_SIZE", "100000")) if size is None else size
+        self.persistent = persistent
+        self._lru: "OrderedDict[str, SelectionRecord]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _remember(self, key: str, record: SelectionRecord) -> None:
+        if self.size <= 0:
+            return
+        self._lru[key] = record
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.size:
+            self._lru.popitem(last=False)
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, SelectionRecord]:
+        found: Dict[str, SelectionRecord] = {}
+        with self._lock:
+            for key in keys:
+                record = self._lru.get(key)
+                if record is not None:
+                    self._lru.move_to_end(key)
+                    found[key] = record
+        missing = [key for key in keys if key not in found]
+        if missing and self.persistent is not None:
+            try:
+                loaded = self.persistent.get_many(missing)
+            except sqlite3.Error as e:
+                print(f"Warning: selection cache read failed: {e}")
+                loaded = {}
+            with self._lock:
+                for key, record in loaded.items():
+                    self._remember(key, record)
+            found.update(loaded)
+        with self._lock:
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, records: Dict[str, SelectionRecord]) -> None:
+        with self._lock:
+            for key, record in records.items():
+                self._remember(key, record)
+        if records and self.persistent is not None:
+            try:
+                self.persistent.put_many(records)
+            except sqlite3.Error as e:
+                print(f"Warning: selection cache write failed: {e}")
+
+    def close(self) -> None:
+        if self.persistent is not None:
+            self.persistent.close()
+
+
+def cache_from_env(env: Optional[Dict[str, str]] = None) -> Optional[SelectionCache]:
+    env = os.environ if env is None else env
+    size = int(env.get("SELECTION_CACHE_SIZE", "100000"))
+    db_path = env.get("SELECTION_CACHE_DB")
+    persistent = None
+    if db_path:
+        persistent = SqliteSelectionTier(db_path, int(env.get("SELECTION_CACHE_DB_MAX_ROWS", "1000000")))
+    if size <= 0 and persistent is None:
+        return None
+    return SelectionCache(size, persistent)
+
+
+_cache: Optional[SelectionCache] = None
+_cache_loaded = False
+_cache_lock = threading.Lock()
+
+
+def get_selection_cache() -> Optional[SelectionCache]:
+    """Process-wide cache from env (None when disabled)."""
+    global _cache, _cache_loaded
+    if not _cache_loaded:
+        with _cache_lock:
+            if not _cache_loaded:
+                _cache = cache_from_env()
+                _cache_loaded = True
+    return _cache
+
+
+def set_selection_cache(cache: Optional[SelectionCache]) -> None:
+    """Override the process-wide cache (None resets to env configuration)."""
+    global _cache, _cache_loaded
+    with _cache_lock:
+        old, _cache = _cache, cache
+        _cache_loaded = cache is not None
+    if old is not None and old is not cache:
+        old.close()
+
+
+def select_with_cache(
+    ocr_texts: Sequence[str],
+    candidates: List[SectionCandidate],
+    select: Callable[[List[str]], list],
+    *,
+    docx_sha256: str,
+    language: Optional[str],
+    section_number: Optional[str] = None,
+    section_name: Optional[str] = None,
+    cache: Optional[SelectionCache] = None,
+) -> list:
+    """
+    One SelectionResult per OCR text (input order); `select(texts)` runs only
+    for the texts whose decision is not cached, and its results are stored.
+    """
+    cache = cache or get_selection_cache()
+    if cache is None or not ocr_texts:
+        return select(list(ocr_texts))
+
+    fingerprint = matcher_fingerprint()
+    keys = [
+        selection_key(text, docx_sha256, len(candidates), language, section_number, section_name, fingerprint)
+        for text in ocr_texts
+    ]
+    found = cache.get_many(keys)
+    results: list = [None] * len(keys)
+    misses = []
+    for i, key in enumerate(keys):
+        record = found.get(key)
+        hit = record is not None and (record[0] is None or record[0] < len(candidates))
+        record_cache("selection", hit)
+        if hit:
+            results[i] = selection_from_record(record, candidates)
+        else:
+            misses.append(i)
+
+    if misses:
+        fresh = select([ocr_texts[i] for i in misses])
+        positions = {id(c): pos for pos, c in enumerate(candidates)}
+        stored = {}
+        for i, result in zip(misses, fresh):
+            results[i] = result
+            stored[keys[i]] = selection_to_record(result, positions)
+        cache.put_many(stored)
+    return results
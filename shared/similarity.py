@@ -0,0 +1,165 @@
+"""
+Pluggable string similarity for the reference matcher.
+
+Backends return a ratio in [0, 1] on the SequenceMatcher scale (2*M / T, M =
+matched characters, T = total length), so the matcher's multipliers and the
+0.05 delta rule keep their meaning whichever backend is active.
+
+- "sequencematcher" (default): difflib.SequenceMatcher(None, a, b).ratio(),
+  the historical behaviour. Its autojunk heuristic treats characters that make
+  up >1% of a 200+ char text as junk, which makes scores of long texts jumpy.
+- "levenshtein": InDel-normalized edit similarity 1 - d/(|a|+|b|), where d is
+  the Levenshtein distance with insertions/deletions only (= |a|+|b|-2*LCS).
+  LCS is computed with Hyyrö's bit-parallel algorithm on Python ints, one
+  add/sub/and/or per character of the longer text, with no junk heuristic.
+
+Both accept a `cutoff`: when the result can't reach it they may stop early
+and return any value below the cutoff (the matcher only needs exact scores
+for candidates that can still reach the top two).
+
+Env:
+    SIMILARITY_BACKEND  sequencematcher | levenshtein (default sequencematcher)
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from collections import Counter
+from difflib import SequenceMatcher
+from typing import Dict, Optional, Protocol, runtime_checkable
+
+# Check the early-exit bound every this many characters of the longer text
+_CUTOFF_CHECK_EVERY = 32
+
+
+@runtime_checkable
+class SimilarityBackend(Protocol):
+    name: str
+
+    def ratio(self, a: str, b: str, cutoff: float = 0.0) -> float:
+        ...
+
+
+def quick_ratio(a: str, b: str) -> float:
+    """Character-multiset upper bound shared by both backends (= SequenceMatcher.quick_ratio)."""
+    total = len(a) + len(b)
+    if not total:
+        return 1.0
+    counts = Counter(a)
+    common = 0
+    for ch, n in Counter(b).items():
+        m = counts.get(ch)
+        if m:
+            common += n if n < m else m
+    return 2.0 * common / total
+
+
+def _length_bound(a: str, b: str) -> float:
+    total = len(a) + len(b)
+    return 2.0 * min(len(a), len(b)) / total if total else 1.0
+
+
+class SequenceMatcherBackend:
+    """difflib.SequenceMatcher ratio (compatibility default)."""
+
+    name = "sequencematcher"
+
+    def ratio(self, a: str, b: str, cutoff: float = 0.0) -> float:
+        matcher = SequenceMatcher(None, a, b)
+        if cutoff > 0.0:
+            bound = matcher.real_quick_ratio()
+            if bound < cutoff:
+                return bound
+            bound = matcher.quick_ratio()
+            if bound < cutoff:
+                return bound
+        return matcher.ratio()
+
+
+def lcs_length(a: str, b: str, stop_below: int = 0) -> int:
+    """
+    Length of the longest common subsequence (Hyyrö's bit-parallel algorithm).
+
+    With `stop_below` > 0 the scan stops as soon as the LCS provably can't
+    reach that length and returns an upper bound smaller than it.
+    """
+    if len(a) > len(b):
+        a, b = b, a
+    m = len(a)
+    if not m:
+        return 0
+    masks: Dict[str, int] = {}
+    for i, ch in enumerate(a):
+        masks[ch] = masks.get(ch, 0) | (1 << i)
+    full = (1 << m) - 1
+    v = full
+    n = len(b)
+    for j, ch in enumerate(b, 1):
+        u = v & masks.get(ch, 0)
+        v = ((v + u) | (v - u)) & full
+        if stop_below and j % _CUTOFF_CHECK_EVERY == 0:
+            bound = min(m - bin(v).count("1") + (n - j), m)
+            if bound < stop_below:
+                return bound
+    return m - bin(v).count("1")
+
+
+class LevenshteinBackend:
+    """InDel-normalized Levenshtein similarity, bit-parallel."""
+
+    name = "levenshtein"
+
+    def ratio(self, a: str, b: str, cutoff: float = 0.0) -> float:
+        total = len(a) + len(b)
+        if not total:
+            return 1.0
+        if a == b:
+            return 1.0
+        stop_below = 0
+        if cutoff > 0.0:
+            bound = _length_bound(a, b)
+            if bound < cutoff:
+                return bound
+            bound = quick_ratio(a, b)
+            if bound < cutoff:
+                return bound
+            # smallest LCS with 2*LCS/total >= cutoff
+            stop_below = max(int(cutoff * total / 2.0 - 1e-9), 0)
+        return 2.0 * lcs_length(a, b, stop_below) / total
+
+
+BACKENDS = {
+    SequenceMatcherBackend.name: SequenceMatcherBackend,
+    LevenshteinBackend.name: LevenshteinBackend,
+}
+
+
+def backend_from_env(env: Optional[Dict[str, str]] = None) -> SimilarityBackend:
+    env = os.environ if env is None else env
+    kind = env.get("SIMILARITY_BACKEND", SequenceMatcherBackend.name).strip().lower()
+    try:
+        return BACKENDS[kind]()
+    except KeyError:
+        raise ValueError(f"Unknown SIMILARITY_BACKEND: {kind}") from None
+
+
+_backend: Optional[SimilarityBackend] = None
+_backend_lock = threading.Lock()
+
+
+def get_similarity_backend() -> SimilarityBackend:
+    """Process-wide similarity backend, created from env on first use."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = backend_from_env()
+    return _backend
+
+
+def set_similarity_backend(backend: Optional[SimilarityBackend]) -> None:
+    """Override the process-wide backend (None resets to env configuration)."""
+    global _backend
+    with _backend_lock:
+        _backend = backend
@@ -0,0 +1,221 @@
+"""
+Lightweight nested timing spans.
+
+Usage:
+    trace = Trace("job")
+    with trace:
+        with span("download"):
+            ...
+        parse_zip_streaming(...)   # opens span("unzip") internally -> "job/unzip"
+    job["timings"] = trace.summary()
+
+`span()` outside an active trace returns a shared no-op object, so the
+instrumented library functions cost one ContextVar lookup when tracing is
+off (or when they are called from tests / the sync UI path).
+
+Spans use time.perf_counter (monotonic) and are aggregated by their nested
+path. With `record_spans=True` the individual spans are kept as well and can
+be exported in OpenTelemetry form (`Trace.otel_spans()` / `export_to_opentelemetry`).
+
+Env:
+    TRACING_ENABLED  1/0, default 1 — whether the worker traces jobs
+    TRACING_OTEL     1/0, default 0 — also export spans via opentelemetry-api
+"""
+
+from __future__ import annotations
+
+import functools
+import os
+import secrets
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+
+_current: ContextVar[Optional["_Span"]] = ContextVar("ocr_trace_span", default=None)
+
+
+def tracing_enabled() -> bool:
+    return os.environ.get("TRACING_ENABLED", "1") not in ("0", "false", "False", "")
+
+
+def otel_export_enabled() -> bool:
+    return os.environ.get("TRACING_OTEL", "0") in ("1", "true", "True")
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class _Span:
+    __slots__ = ("trace", "path", "span_id", "parent_id", "_start", "_wall_start_ns", "_token")
+
+    def __init__(self, trace: "Trace", path: str, parent_id: Optional[str]):
+        self.trace = trace
+        self.path = path
+        self.parent_id = parent_id
+        self.span_id = secrets.token_hex(8) if trace.record_spans else None
+        self._token = None
+
+    def __enter__(self):
+        if self.trace.record_spans:
+            self._wall_start_ns = time.time_ns()
+        self._token = _current.set(self)
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self._start
+        _current.reset(self._token)
+        self.trace._record(self, elapsed, exc_type is not None)
+        return False
+
+
+def span(name: str):
+    """Open a child span of the current span; no-op when no trace is active."""
+    parent = _current.get()
+    if parent is None:
+        return _NOOP_SPAN
+    return _Span(parent.trace, f"{parent.path}/{name}", parent.span_id)
+
+
+def traced(name: str):
+    """Decorator form of `span(name)` for library functions."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            parent = _current.get()
+            if parent is None:
+                return fn(*args, **kwargs)
+            with _Span(parent.trace, f"{parent.path}/{name}", parent.span_id):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def current_trace() -> Optional["Trace"]:
+    parent = _current.get()
+    return parent.trace if parent is not None else None
+
+
+class Trace:
+    """Root of a span tree; aggregates durations per nested span path."""
+
+    def __init__(self, name: str, *, record_spans: bool = False, attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.record_spans = record_spans
+        self.attributes = dict(attributes or {})
+        self.trace_id = secrets.token_hex(16) if record_spans else None
+        self._lock = threading.Lock()
+        self._stats: Dict[str, List[float]] = {}  # path -> [count, total_s, max_s, errors]
+        self._spans: List[Dict[str, Any]] = []
+        self._root = _Span(self, name, None)
+
+    def __enter__(self) -> "Trace":
+        self._root.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return self._root.__exit__(exc_type, exc, tb)
+
+    def _record(self, s: _Span, elapsed: float, failed: bool) -> None:
+        with self._lock:
+            stats = self._stats.get(s.path)
+            if stats is None:
+                self._stats[s.path] = [1, elapsed, elapsed, int(failed)]
+            else:
+                stats[0] += 1
+                stats[1] += elapsed
+                if elapsed > stats[2]:
+                    stats[2] = elapsed
+                stats[3] += int(failed)
+            if self.record_spans:
+                self._spans.append({
+                    "name": s.path.rsplit("/", 1)[-1],
+                    "path": s.path,
+                    "span_id": s.span_id,
+                    "parent_span_id": s.parent_id,
+                    "start_ns": s._wall_start_ns,
+                    "end_ns": s._wall_start_ns + int(elapsed * 1e9),
+                    "error": failed,
+                })
+
+    def summary(self) -> Dict[str, Any]:
+        """Aggregated timings for the job document (milliseconds)."""
+        with self._lock:
+            stats = {k: list(v) for k, v in self._stats.items()}
+        root = stats.get(self.name)
+        spans = {
+            path: {
+                "count": int(count),
+                "total_ms": round(total * 1000, 3),
+                "max_ms": round(max_s * 1000, 3),
+                **({"errors": int(errors)} if errors else {}),
+            }
+            for path, (count, total, max_s, errors) in sorted(stats.items())
+            if path != self.name
+        }
+        return {
+            "total_ms": round(root[1] * 1000, 3) if root else None,
+            "spans": spans,
+        }
+
+    def otel_spans(self) -> List[Dict[str, Any]]:
+        """Recorded spans in OTLP/JSON-like shape (requires record_spans=True)."""
+        with self._lock:
+            spans = list(self._spans)
+        return [
+            {
+                "traceId": self.trace_id,
+                "spanId": s["span_id"],
+                "parentSpanId": s["parent_span_id"] or "",
+                "name": s["name"],
+                "startTimeUnixNano": s["start_ns"],
+                "endTimeUnixNano": s["end_ns"],
+                "attributes": dict(self.attributes, **{"ocr.span_path": s["path"]}),
+                "status": {"code": "STATUS_CODE_ERROR" if s["error"] else "STATUS_CODE_UNSET"},
+            }
+            for s in spans
+        ]
+
+
+def export_to_opentelemetry(trace: Trace) -> int:
+    """
+    Replay recorded spans through the opentelemetry API (if installed).
+
+    Spans are re-created with their original timestamps and parent links, so
+    the configured OTel SDK/exporter sees a normal span tree. Returns the
+    number of exported spans (0 when opentelemetry isn't available).
+    """
+    try:
+        from opentelemetry import trace as otel_trace
+    except ImportError:
+        return 0
+
+    tracer = otel_trace.get_tracer("ocr-localization-checker")
+    spans = sorted(trace.otel_spans(), key=lambda s: (s["startTimeUnixNano"], s["attributes"]["ocr.span_path"].count("/")))
+    by_id = {}
+    exported = 0
+    for s in spans:
+        parent = by_id.get(s["parentSpanId"])
+        ctx = otel_trace.set_span_in_context(parent) if parent is not None else None
+        otel_span = tracer.start_span(
+            s["name"], context=ctx, start_time=s["startTimeUnixNano"], attributes=s["attributes"],
+        )
+        if s["status"]["code"] == "STATUS_CODE_ERROR":
+            otel_span.set_status(otel_trace.Status(otel_trace.StatusCode.ERROR))
+        by_id[s["spanId"]] = otel_span
+        exported += 1
+    # End children before parents
+    for s in sorted(spans, key=lambda s: s["endTimeUnixNano"]):
+        by_id[s["spanId"]].end(end_time=s["endTimeUnixNano"])
+    return exported
@@ -0,0 +1,89 @@
+"""
+select_best_sections_batch must decide exactly like select_best_section.
+"""
+
+import random
+
+from benchmarks import fixtures
+from benchmarks.recall import ocr_variants
+from shared.candidate_index import CandidateIndex
+from shared.docx_section_extractor import SectionCandidate
+from shared.reference_matcher import select_best_section, select_best_sections_batch
+from worker.normalization import normalize_soft_cached, normalize_strict_cached
+
+
+def _single(ocr, cands, **kwargs):
+    return select_best_section(
+        ocr_text=ocr,
+        candidates=cands,
+        normalize_strict_fn=normalize_strict_cached,
+        normalize_soft_fn=normalize_soft_cached,
+        **kwargs,
+    )
+
+
+def _batch(ocrs, cands, **kwargs):
+    return select_best_sections_batch(ocrs, cands, normalize_strict_cached, normalize_soft_cached, **kwargs)
+
+
+def _assert_same(ocrs, cands, **kwargs):
+    batch = _batch(ocrs, cands, **kwargs)
+    assert len(batch) == len(ocrs)
+    for ocr, got in zip(ocrs, batch):
+        expected = _single(ocr, cands, **{k: v for k, v in kwargs.items() if k != "candidate_index"})
+        assert got.chosen_section is expected.chosen_section, ocr
+        assert got.chosen_text == expected.chosen_text
+        assert got.to_dict() == expected.to_dict()
+
+
+def _ocr_texts(cands, seed, stride):
+    rng = random.Random(seed)
+    texts = [o for pos in range(0, len(cands), stride) for _, o in ocr_variants(cands[pos].content_text, rng)]
+    return texts + ["", "[BUY]", cands[0].content_text]
+
+
+def test_batch_matches_single_selection():
+    for language in ("en", "ja", "he"):
+        cands = fixtures.candidates(100, language)
+        _assert_same(_ocr_texts(cands, 7, 12), cands)
+
+
+def test_batch_with_hints_and_index():
+    cands = fixtures.candidates(100)
+    ocrs = _ocr_texts(cands, 8, 20)
+    _assert_same(ocrs, cands, section_name="banner")
+    _assert_same(ocrs, cands, section_number="999")  # unmatched hint -> warning, all candidates
+    _assert_same(ocrs, cands, candidate_index=CandidateIndex(cands, normalize_soft_cached, top_k=5))
+
+
+def test_batch_placeholders_and_duplicates():
+    def cand(text, name="BANNER", num="1"):
+        return SectionCandidate(
+            header_text=f"{num}) {name}", content_text=text, source_path="x_(en).docx",
+            language="en", section_number=num, section_name=name,
+        )
+
+    cands = [
+        cand("Hello %displayname%, your offer awaits"),
+        cand("Buy now and save 20% today", "EMAIL", "2"),
+        cand("Buy now and save 20% today", "POPUP", "3"),
+        cand("", "PIC", "4"),
+    ]
+    _assert_same(["Buy now and save 20% today", "Hello Anna, your offer awaits", "save", ""], cands)
+
+
+def test_empty_candidates():
+    results = _batch(["a", "b"], [])
+    assert [r.manual_required for r in results] == [True, True]
+    assert results[0].chosen_section is None
+
+
+def test_batch_matches_single_selection_with_levenshtein_backend():
+    from shared.similarity import LevenshteinBackend, set_similarity_backend
+
+    set_similarity_backend(LevenshteinBackend())
+    try:
+        cands = fixtures.candidates(100, "de")
+        _assert_same(_ocr_texts(cands, 9, 12), cands)
+    finally:
+        set_similarity_backend(None)
@@ -0,0 +1,34 @@
+"""
+Tests for the benchmark baseline comparison (no timing involved).
+"""
+
+from benchmarks.core import compare
+
+
+def _report(calibration, **ops):
+    return {
+        "calibration_ops_per_sec": calibration,
+        "results": {name: {"ops_per_sec": v, "peak_kib": 1.0} for name, v in ops.items()},
+    }
+
+
+def test_regression_beyond_threshold_is_reported():
+    baseline = _report(1000.0, fast=100.0, slow=100.0)
+    current = _report(1000.0, fast=95.0, slow=60.0)
+
+    regressions = compare(current, baseline, threshold=0.25)
+
+    assert len(regressions) == 1
+    assert regressions[0].startswith("slow:")
+
+
+def test_baseline_is_scaled_by_calibration():
+    # Machine is half as fast: 55 ops/s against a 100 ops/s baseline is fine
+    baseline = _report(1000.0, hot=100.0)
+    current = _report(500.0, hot=55.0)
+
+    assert compare(current, baseline, threshold=0.25) == []
+
+
+def test_new_benchmarks_without_baseline_are_ignored():
+    assert compare(_report(1.0, new=1.0), _report(1.0), threshold=0.1) == []
@@ -0,0 +1,143 @@
+"""
+Tests for job cancellation (POST /jobs/{job_id}:cancel and worker checkpoints).
+"""
+
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from loadtest.cloud_fakes import CloudFakes, FakeDocumentReference
+from loadtest.harness import _push_envelope
+from loadtest.synth import build_campaign_zip
+from shared.cancellation import CancelToken, JobCancelled
+from shared.ocr_backends import FakeOcrBackend, set_ocr_backend
+from shared.scheduler import FairScheduler, set_scheduler
+
+
+def _clients(fakes):
+    import worker.main as worker_main
+    from app.jobs_api import router
+
+    fakes.install()
+    checker = FastAPI()
+    checker.include_router(router)
+    return TestClient(checker), TestClient(worker_main.app)
+
+
+def _submit(checker, fakes, images):
+    campaign = build_campaign_zip(seed=5, images=images, languages=["en", "de"])
+    resp = checker.post("/jobs", files={"zip_file": ("campaign.zip", campaign.zip_bytes, "application/zip")})
+    _, data, attrs = fakes.publisher.pop()
+    return resp.json()["job_id"], data, attrs["message_id"]
+
+
+def test_token_polls_at_most_once_per_interval():
+    fakes = CloudFakes()
+    doc = fakes.firestore.collection("jobs").document("j")
+    doc.set({"status": "RUNNING"})
+    now = [0.0]
+    token = CancelToken("j", firestore=fakes.firestore, poll_interval=5, clock=lambda: now[0])
+    token.check()
+    doc.update({"cancel_requested": True})
+    token.check()  # within the interval, flag not read yet
+    now[0] = 5.0
+    try:
+        token.check()
+    except JobCancelled as e:
+        assert e.job_id == "j"
+    else:
+        raise AssertionError("expected JobCancelled")
+
+
+def test_cancel_stops_ocr_and_marks_job_cancelled(monkeypatch):
+    import worker.main as worker_main
+
+    monkeypatch.setenv("CANCEL_POLL_SECONDS", "0")
+    monkeypatch.setenv("OCR_BUDGET_PER_JOB", "0")
+    monkeypatch.setattr(worker_main, "CHECK_CHUNK", 2)
+    fakes = CloudFakes()
+    checker, worker = _clients(fakes)
+    job_id, data, message_id = _submit(checker, fakes, images=10)
+
+    def slow_ocr(delay):
+        # The user cancels while the third OCR call is in flight
+        if backend.calls == 3:
+            assert checker.post(f"/jobs/{job_id}:cancel").json()["status"] == "RUNNING"
+        time.sleep(delay)
+
+    backend = FakeOcrBackend(latency="fixed", latency_ms=20, sleep=slow_ocr)
+    set_ocr_backend(backend)
+    set_scheduler(FairScheduler(slots=1))  # one OCR call in flight at a time
+    try:
+        assert worker.post("/pubsub/push", json=_push_envelope(data, message_id)).status_code == 200
+    finally:
+        set_ocr_backend(None)
+        set_scheduler(None)
+
+    assert backend.calls == 3  # nothing after the cancel
+    job = checker.get(f"/jobs/{job_id}").json()
+    assert job["status"] == "CANCELLED"
+    assert job["result"]["summary"]["total"] == 3
+    assert job["result"]["total"] == 10
+    assert len(checker.get(f"/jobs/{job_id}/results").text.splitlines()) == 3
+    assert checker.post(f"/jobs/{job_id}:cancel").status_code == 200  # idempotent
+
+
+def test_cancel_before_the_worker_starts():
+    fakes = CloudFakes()
+    checker, worker = _clients(fakes)
+    job_id, data, message_id = _submit(checker, fakes, images=2)
+    backend = FakeOcrBackend()
+    set_ocr_backend(backend)
+    try:
+        assert checker.post(f"/jobs/{job_id}:cancel").json()["status"] == "CANCELLED"
+        worker.post("/pubsub/push", json=_push_envelope(data, message_id))
+    finally:
+        set_ocr_backend(None)
+    assert backend.calls == 0
+    assert checker.get(f"/jobs/{job_id}").json()["status"] == "CANCELLED"
+    assert checker.post("/jobs/missing:cancel").status_code == 404
+
+
+def test_finished_jobs_cannot_be_cancelled():
+    fakes = CloudFakes()
+    checker, _ = _clients(fakes)
+    fakes.firestore.collection("jobs").document("done").set({"status": "DONE"})
+    assert checker.post("/jobs/done:cancel").status_code == 409
+
+
+def _change_after_first_read(monkeypatch, fakes, job_id, fields):
+    doc = fakes.firestore.collection("jobs").document(job_id)
+    real_get = FakeDocumentReference.get
+    reads = []
+
+    def get(self):
+        snapshot = real_get(self)
+        if self.path == doc.path and not reads:
+            reads.append(snapshot)
+            doc.update(fields)  # the worker writes between the cancel's read and write
+        return snapshot
+
+    monkeypatch.setattr(FakeDocumentReference, "get", get)
+    return doc
+
+
+def test_cancel_does_not_overwrite_a_job_finished_meanwhile(monkeypatch):
+    fakes = CloudFakes()
+    checker, _ = _clients(fakes)
+    fakes.firestore.collection("jobs").document("race").set({"status": "PENDING"})
+    doc = _change_after_first_read(monkeypatch, fakes, "race", {"status": "DONE"})
+
+    assert checker.post("/jobs/race:cancel").status_code == 409
+    assert doc.get().to_dict() == {"status": "DONE"}
+
+
+def test_cancel_retries_after_a_progress_update(monkeypatch):
+    fakes = CloudFakes()
+    checker, _ = _clients(fakes)
+    fakes.firestore.collection("jobs").document("busy").set({"status": "RUNNING"})
+    doc = _change_after_first_read(monkeypatch, fakes, "busy", {"progress": 5})
+
+    assert checker.post("/jobs/busy:cancel").json()["status"] == "RUNNING"
+    assert doc.get().to_dict()["cancel_requested"] is True
@@ -0,0 +1,85 @@
+"""
+Tests for the n-gram candidate index and the indexed selection path.
+"""
+
+import random
+
+from benchmarks import fixtures
+from benchmarks.recall import measure, ocr_variants
+from shared.candidate_index import CandidateIndex, build_candidate_index, ngrams
+from shared.reference_matcher import select_best_section
+from worker.normalization import normalize_soft_cached, normalize_strict_cached
+
+
+def _select(ocr, cands, index=None, **hints):
+    return select_best_section(
+        ocr_text=ocr,
+        candidates=cands,
+        normalize_strict_fn=normalize_strict_cached,
+        normalize_soft_fn=normalize_soft_cached,
+        candidate_index=index,
+        **hints,
+    )
+
+
+def test_ngrams_are_script_aware():
+    assert ngrams("buy now") == [" bu", "buy", "uy ", " no", "now", "ow "]
+    # CJK runs -> bigrams, no word splitting needed
+    assert ngrams("今日限定") == ["今日", "日限", "限定"]
+    # Mixed token: latin and kana runs handled separately
+    assert ngrams("sale中") == [" sa", "sal", "ale", "le ", "中"]
+
+
+def test_no_index_for_small_documents():
+    assert build_candidate_index(fixtures.candidates(10), normalize_soft_cached) is None
+    assert build_candidate_index(fixtures.candidates(100), normalize_soft_cached) is not None
+
+
+def test_shortlist_falls_back_when_it_cannot_rank():
+    cands = fixtures.candidates(100)
+    index = CandidateIndex(cands, normalize_soft_cached, top_k=5)
+    assert index.shortlist("") is None
+    assert index.shortlist("buy now", among=cands[:5]) is None
+    shortlist = index.shortlist(normalize_soft_cached(cands[7].content_text))
+    assert len(shortlist) == 5 and cands[7] in shortlist
+    # Original document order is kept (matters for tie-breaking)
+    assert shortlist == sorted(shortlist, key=cands.index)
+
+
+def test_upper_bound_is_never_below_exact_score():
+    from shared.reference_matcher import _remove_cta_brackets, _score_candidate
+
+    cands = fixtures.candidates(100, "ja")
+    index = CandidateIndex(cands, normalize_soft_cached)
+    ocr = normalize_soft_cached(fixtures.ocr_for(cands, 3))
+    for c in cands:
+        exact = _score_candidate(ocr, c, ocr, normalize_soft_cached(_remove_cta_brackets(c.content_text)))
+        assert index.upper_bound(c, ocr) >= exact - 1e-9
+
+
+def test_indexed_selection_matches_full_scoring():
+    for language in ("en", "ja"):
+        cands = fixtures.candidates(100, language)
+        index = CandidateIndex(cands, normalize_soft_cached, top_k=10)
+        rng = random.Random(5)
+        for pos in range(0, 100, 9):
+            for _, ocr in ocr_variants(cands[pos].content_text, rng):
+                full = _select(ocr, cands)
+                indexed = _select(ocr, cands, index)
+                assert indexed.chosen_section is full.chosen_section
+                assert indexed.to_dict() == full.to_dict()
+
+
+def test_indexed_selection_respects_hints():
+    cands = fixtures.candidates(100)
+    index = CandidateIndex(cands, normalize_soft_cached, top_k=3)
+    target = cands[42]
+    ocr = fixtures.ocr_for(cands, 42)
+    hints = {"section_number": target.section_number}
+    assert _select(ocr, cands, index, **hints).to_dict() == _select(ocr, cands, **hints).to_dict()
+
+
+def test_recall_on_fixture():
+    report = measure(100, "zh-Hans", top_k=20, stride=10)
+    assert report["recall"] == 1.0
+    assert report["scored_fraction"] < 1.0
@@ -0,0 +1,86 @@
+"""
+Tests for the CPU process pool: offloaded work must equal in-thread work.
+"""
+
+from concurrent.futures import Future
+
+from benchmarks import fixtures
+from shared.candidate_index import CandidateIndex, build_candidate_index
+from shared.cpu_pool import CpuPool, available_cpus, from_records, to_records
+from shared.docx_section_extractor import extract_section_candidates
+from shared.reference_matcher import select_best_sections_batch
+from worker.normalization import normalize_soft_cached, normalize_strict_cached
+
+
+def test_available_cpus_is_positive():
+    assert available_cpus() >= 1
+
+
+def test_candidate_records_round_trip():
+    cands = fixtures.candidates(10, "ja")
+    rebuilt = from_records(to_records(cands), cands[0].source_path, "ja")
+    assert rebuilt == cands
+
+
+def test_small_inputs_stay_in_thread():
+    pool = CpuPool(workers=2, min_docx_bytes=10**9, min_cells=10**9)
+    data = fixtures.paragraph_docx(5)
+    cands = pool.parse_reference(data, "campaign_(en).docx", "en")
+    pool.select_batch(["buy now"], cands)
+    assert (pool.inline, pool.offloaded) == (2, 0)
+    assert pool._executor is None
+
+
+def test_offloaded_work_matches_inline():
+    data = fixtures.paragraph_docx(30)
+    pool = CpuPool(workers=2, min_docx_bytes=0, min_cells=0)
+    try:
+        cands = pool.parse_reference(data, "campaign_(en).docx", "en")
+        assert cands == extract_section_candidates(data, "campaign_(en).docx", "en")
+
+        ocrs = [fixtures.ocr_for(cands, i) for i in range(0, len(cands), 3)] + [""]
+        got = pool.select_batch(ocrs, cands, section_name="banner")
+        expected = select_best_sections_batch(
+            ocrs, cands, normalize_strict_cached, normalize_soft_cached, section_name="banner",
+        )
+        assert pool.offloaded == 2
+        for a, b in zip(got, expected):
+            assert a.chosen_section is b.chosen_section
+            assert a.to_dict() == b.to_dict()
+            assert a.chosen_text == b.chosen_text
+    finally:
+        pool.shutdown()
+
+
+class _InlineExecutor:
+    """Runs submitted tasks in this process, so the worker-side code can be observed."""
+
+    def submit(self, fn, *args):
+        future = Future()
+        future.set_result(fn(*args))
+        return future
+
+
+def test_offloaded_batches_use_the_candidate_shortlist(monkeypatch):
+    cands = fixtures.candidates(120)
+    index = build_candidate_index(cands, normalize_soft_cached)
+    assert index is not None
+    shortlists = []
+    real_shortlist = CandidateIndex.shortlist
+    monkeypatch.setattr(
+        CandidateIndex, "shortlist", lambda self, *a, **kw: shortlists.append(1) or real_shortlist(self, *a, **kw)
+    )
+    pool = CpuPool(workers=2, min_cells=0)
+    monkeypatch.setattr(pool, "_pool", lambda: _InlineExecutor())
+
+    ocrs = [fixtures.ocr_for(cands, i) for i in range(0, len(cands), 10)]
+    got = pool.select_batch(ocrs, cands, candidate_index=index)
+    assert pool.offloaded == 1
+    assert len(shortlists) == len(ocrs)  # the index was rebuilt on the worker side and consulted
+
+    shortlists.clear()
+    pool.select_batch(ocrs, cands)  # no index in the parent: full scan in the worker too
+    assert shortlists == []
+
+    expected = select_best_sections_batch(ocrs, cands, normalize_strict_cached, normalize_soft_cached)
+    assert [r.to_dict() for r in got] == [r.to_dict() for r in expected]
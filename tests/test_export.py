@@ -0,0 +1,118 @@
+"""
+Tests for streaming report export (CSV / NDJSON / XLSX, gzip).
+"""
+
+import csv
+import gzip
+import hashlib
+import io
+import json
+import zipfile
+from xml.etree import ElementTree
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from loadtest.cloud_fakes import CloudFakes
+from shared import export
+from shared.result_sink import FirestoreResultSink
+
+_NS = {"s": "http://schemas.openxmlformats.org/spreadsheetml/2006/main"}
+
+
+def _result(i, text="Jetzt kaufen"):
+    return {
+        "image": f"images/banner_{i:05d}_(de).png",
+        "ocr": text,
+        "reference": text,
+        "match": i % 3 != 0,
+        "selection": {
+            "chosen_section_number": "01",
+            "chosen_section_name": "BANNER",
+            "score_top1": 0.97,
+            "score_top2": 0.5,
+            "delta": 0.47,
+            "warnings": ["a", "b"] if i % 5 == 0 else [],
+            "manual_required": i % 7 == 0,
+        },
+    }
+
+
+def test_csv_rows_include_selection_metadata():
+    data = b"".join(export.csv_chunks(_result(i) for i in range(3)))
+    rows = list(csv.DictReader(io.StringIO(data.decode("utf-8-sig"))))
+    assert [r["image"] for r in rows] == [f"images/banner_{i:05d}_(de).png" for i in range(3)]
+    assert rows[0]["status"] == "MANUAL" and rows[1]["status"] == "PASS"
+    assert rows[0]["warnings"] == "a; b"
+    assert rows[1]["score_top1"] == "0.97"
+
+
+def test_xlsx_is_a_readable_workbook():
+    tricky = 'A < B & "C"\x01 שלום'
+    data = b"".join(export.xlsx_chunks([_result(1, tricky), _result(2)]))
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        assert zf.testzip() is None
+        sheet = ElementTree.fromstring(zf.read("xl/worksheets/sheet1.xml"))
+    rows = sheet.findall("s:sheetData/s:row", _NS)
+    assert len(rows) == 3
+    header = [c.findtext("s:is/s:t", namespaces=_NS) for c in rows[0]]
+    assert header == export.EXPORT_COLUMNS
+    ocr = rows[1][export.EXPORT_COLUMNS.index("ocr")].findtext("s:is/s:t", namespaces=_NS)
+    assert ocr == tricky.replace("\x01", "")
+
+
+@pytest.mark.parametrize("fmt", sorted(export.WRITERS))
+def test_writers_stream_in_bounded_chunks(fmt, monkeypatch):
+    monkeypatch.setattr(export, "CHUNK_BYTES", 4096)
+    consumed = []
+
+    def rows():
+        for i in range(2000):
+            consumed.append(i)
+            # incompressible text, so the deflated XLSX sheet grows too
+            yield _result(i, hashlib.sha256(str(i).encode()).hexdigest())
+
+    chunks = export.WRITERS[fmt](rows())
+    next(chunks)
+    assert len(consumed) < 2000  # first chunk before all rows were read
+    assert max(len(c) for c in chunks) < 64 * 1024
+
+
+def test_export_endpoint_formats_and_gzip():
+    from app.jobs_api import router
+
+    fakes = CloudFakes()
+    fakes.install()
+    jobs = fakes.firestore.collection("jobs")
+    jobs.document("done").set({"status": "DONE", "result": {"total": 3}})
+    jobs.document("running").set({"status": "RUNNING"})
+    sink = FirestoreResultSink("done", firestore=fakes.firestore)
+    for i in range(3):
+        sink.write(_result(i))
+    sink.flush()
+
+    app = FastAPI()
+    app.include_router(router)
+    client = TestClient(app)
+
+    resp = client.get("/jobs/done/export?format=ndjson", headers={"Accept-Encoding": "gzip"})
+    assert resp.headers["content-encoding"] == "gzip"
+    assert len(resp.text.splitlines()) == 3  # transparently decoded by the client
+    raw = client.get("/jobs/done/export?format=csv", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in raw.headers
+    assert raw.headers["content-disposition"] == 'attachment; filename="done.csv"'
+    assert len(raw.content.decode("utf-8-sig").splitlines()) == 4
+    xlsx = client.get("/jobs/done/export?format=xlsx", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in xlsx.headers
+    assert zipfile.ZipFile(io.BytesIO(xlsx.content)).testzip() is None
+
+    assert client.get("/jobs/running/export").status_code == 409
+    assert client.get("/jobs/done/export?format=pdf").status_code == 400
+    assert client.get("/jobs/missing/export").status_code == 404
+
+
+def test_gzip_chunks_round_trip():
+    payload = [b"x" * 1000, b"y" * 10, b""]
+    assert gzip.decompress(b"".join(export.gzip_chunks(payload))) == b"".join(payload)
+    assert json.loads(b"".join(export.ndjson_chunks([{"a": 1}]))) == {"a": 1}
@@ -0,0 +1,59 @@
+"""
+Cold-start budget: importing the service entry points must stay cheap.
+
+Cloud clients, google-cloud packages and python-docx are loaded lazily on
+first use, so neither app.main nor worker.main should pull them in.
+"""
+
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+# Seconds; generous for CI noise, still catches an eager google-cloud/python-docx import
+IMPORT_BUDGET_S = float(os.environ.get("IMPORT_BUDGET_S", "2.0"))
+
+HEAVY_MODULES = [
+    "google.cloud.firestore",
+    "google.cloud.storage",
+    "google.cloud.pubsub_v1",
+    "google.cloud.vision",
+    "docx",
+    "lxml.etree",
+]
+
+_PROBE = """
+import json, sys, time
+t = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - t
+print(json.dumps({{"elapsed": elapsed, "loaded": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def _import_in_fresh_interpreter(module: str) -> dict:
+    env = dict(os.environ, GOOGLE_APPLICATION_CREDENTIALS="/nonexistent/credentials.json")
+    out = subprocess.run(
+        [sys.executable, "-c", _PROBE.format(module=module, heavy=HEAVY_MODULES)],
+        cwd=PROJECT_ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+@pytest.mark.parametrize("module", ["app.main", "worker.main"])
+def test_import_is_lazy_and_within_budget(module):
+    # Best of two runs to smooth out disk cache effects
+    runs = [_import_in_fresh_interpreter(module) for _ in range(2)]
+
+    assert runs[0]["loaded"] == [], f"{module} eagerly imports {runs[0]['loaded']}"
+    best = min(r["elapsed"] for r in runs)
+    assert best < IMPORT_BUDGET_S, f"import {module} took {best:.3f}s (budget {IMPORT_BUDGET_S}s)"
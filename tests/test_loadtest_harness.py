@@ -0,0 +1,38 @@
+"""
+Smoke test for the offline load-test harness (tiny workload, no OCR latency).
+"""
+
+import io
+import zipfile
+
+from loadtest.harness import LoadTestConfig, percentile, run_load_test
+from loadtest.synth import build_campaign_zip
+
+
+def test_synthetic_campaign_layout():
+    campaign = build_campaign_zip(seed=1, images=4, languages=["en", "ja"])
+
+    names = zipfile.ZipFile(io.BytesIO(campaign.zip_bytes)).namelist()
+
+    assert "texts/campaign_(en).docx" in names
+    assert "texts/campaign_(ja).docx" in names
+    assert sum(n.startswith("images/") for n in names) == 4
+
+
+def test_percentile_nearest_rank():
+    assert percentile([], 95) == 0.0
+    assert percentile([1.0, 2.0, 3.0, 4.0], 50) == 2.0
+    assert percentile(list(range(1, 101)), 95) == 95
+
+
+def test_harness_runs_jobs_end_to_end():
+    config = LoadTestConfig(jobs=2, images=3, languages=["en", "ru"], ocr_latency="fixed", ocr_latency_ms=0)
+
+    report = run_load_test(config)
+    summary = report.to_dict()
+
+    assert summary["jobs_done"] == 2
+    assert summary["jobs_failed"] == 0
+    assert summary["images_processed"] == 6
+    assert summary["stage_calls"]["ocr"] == 6
+    assert summary["peak_rss_mb"] > 0
@@ -0,0 +1,145 @@
+"""
+Tests for job manifests and incremental re-checks against a base job.
+"""
+
+import io
+import shutil
+import zipfile
+
+import pytest
+
+from loadtest.cloud_fakes import CloudFakes
+from loadtest.synth import build_campaign_zip
+from shared.manifest import (
+    Manifest,
+    build_manifest,
+    iter_reused,
+    load_manifest,
+    reuse_plan,
+    save_manifest,
+)
+from shared.ocr_backends import FakeOcrBackend, make_fake_png, set_ocr_backend
+from shared.sampling import SamplingConfig
+from zip_processor import parse_zip_streaming
+
+
+def _write(tmp_path, name, data):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path)
+
+
+def _manifest(tmp_path, images, version="v1", section_name=None):
+    matches = [
+        (img, _write(tmp_path, f"{i}.png", data), "", ref, "en")
+        for i, (img, data, ref) in enumerate(images)
+    ]
+    return build_manifest(matches, None, section_name, version=version)
+
+
+def _reused(current, base, base_results):
+    rows = ({"image": p, **r} for p, r in base_results.items())
+    return {r["image"]: r for r in iter_reused(reuse_plan(current, base), base, rows)}
+
+
+def test_reuses_unchanged_content_even_if_renamed(tmp_path):
+    ref = b"PK docx"
+    base = _manifest(tmp_path, [("images/a.png", b"A", ref), ("images/b.png", b"B", ref), ("images/c.png", b"C", ref)])
+    current = _manifest(tmp_path, [("images/a.png", b"A", ref), ("images/b2.png", b"B", ref), ("images/c.png", b"C2", ref)])
+    base_results = {p: {"image": p, "match": True} for p in ("images/a.png", "images/b.png", "images/c.png")}
+
+    reused = _reused(current, base, base_results)
+
+    assert sorted(reused) == ["images/a.png", "images/b2.png"]
+    assert reused["images/b2.png"]["reused"] is True
+    assert "images/c.png" not in reused
+
+
+def test_reuses_nothing_when_job_inputs_change(tmp_path):
+    images = [("images/a.png", b"A", b"PK")]
+    base = _manifest(tmp_path, images)
+    results = {"images/a.png": {"match": True}}
+    assert _reused(_manifest(tmp_path, images), base, results) != {}
+    assert _reused(_manifest(tmp_path, images, version="v2"), base, results) == {}
+    assert _reused(_manifest(tmp_path, images, section_name="banner"), base, results) == {}
+    assert reuse_plan(_manifest(tmp_path, images), None) == {}
+
+
+def test_base_rows_are_streamed_and_only_reused_ones_kept(tmp_path):
+    ref = b"PK docx"
+    base = _manifest(tmp_path, [(f"images/{i}.png", b"img%d" % i, ref) for i in range(50)])
+    current = _manifest(tmp_path, [("images/new.png", b"img3", ref), ("images/7.png", b"img7", ref),
+                                   ("images/x.png", b"other", ref)])
+    read = []
+
+    def rows():
+        for img_path in base.images:
+            read.append(img_path)
+            yield {"image": img_path, "match": True}
+
+    plan = reuse_plan(current, base)
+    reused = list(iter_reused(plan, base, rows()))
+
+    assert sorted(r["image"] for r in reused) == ["images/7.png", "images/new.png"]
+    assert read[-1] == "images/7.png"  # stops once every reused key was found
+    assert plan == {}
+
+
+def test_manifest_round_trip_through_storage(tmp_path):
+    fakes = CloudFakes()
+    bucket = fakes.storage.bucket("uploads")
+    manifest = _manifest(tmp_path, [("images/a.png", b"A", b"PK")])
+    assert load_manifest(bucket, "job-1") is None
+    save_manifest(bucket, "job-1", manifest)
+    assert load_manifest(bucket, "job-1") == manifest
+    with pytest.raises(ValueError):
+        Manifest.from_dict({"version": 99})
+
+
+def _replace_image(zip_bytes, name, data):
+    src = zipfile.ZipFile(io.BytesIO(zip_bytes))
+    out = io.BytesIO()
+    with zipfile.ZipFile(out, "w") as zf:
+        for info in src.infolist():
+            zf.writestr(info, data if info.filename == name else src.read(info))
+    return out.getvalue()
+
+
+def test_worker_recomputes_only_the_delta(tmp_path, monkeypatch):
+    import worker.main as worker_main
+
+    fakes = CloudFakes()
+    fakes.install()
+    set_ocr_backend(FakeOcrBackend(latency="fixed", latency_ms=0))
+    ocr_calls = []
+    real_process_image = worker_main.process_image
+    monkeypatch.setattr(worker_main, "process_image", lambda b: ocr_calls.append(1) or real_process_image(b))
+    bucket = fakes.storage.bucket("uploads")
+    sampling = SamplingConfig(budget=0)
+
+    def run(job_id, zip_bytes, base_job_id=None):
+        path = _write(tmp_path, f"{job_id}.zip", zip_bytes)
+        matches, work_dir = parse_zip_streaming(path, return_work_dir=True, return_extended=True)
+        try:
+            result = worker_main._run_job(job_id, bucket, matches, None, None, sampling, base_job_id)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        fakes.firestore.collection("jobs").document(job_id).set({"status": "DONE", "result": result})
+        return result
+
+    try:
+        campaign = build_campaign_zip(seed=3, images=6, languages=["en", "de"])
+        first = run("job-1", campaign.zip_bytes)
+        assert first["incremental"] == {"base_job_id": None, "reused": 0, "recomputed": 6}
+
+        ocr_calls.clear()
+        revised = _replace_image(campaign.zip_bytes, "images/banner_002_(de).png", make_fake_png("Neu"))
+        second = run("job-2", revised, base_job_id="job-1")
+
+        assert second["incremental"] == {"base_job_id": "job-1", "reused": 5, "recomputed": 1}
+        assert len(ocr_calls) == 1
+        assert list(second["results"]) == list(first["results"])
+        assert second["results"]["images/banner_002_(de).png"]["ocr"] == "Neu"
+        assert second["results"]["images/banner_001_(en).png"]["reused"] is True
+    finally:
+        set_ocr_backend(None)
@@ -0,0 +1,50 @@
+"""
+Tests for the /metrics endpoints (checker + worker) using the in-memory cloud stand-ins.
+"""
+
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+from loadtest.cloud_fakes import CloudFakes
+from loadtest.harness import LoadTestConfig, run_load_test
+
+
+def _value(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def test_metrics_endpoints_expose_pipeline_counters():
+    fakes = CloudFakes()
+    before_done = _value("ocr_jobs_total", status="DONE")
+    before_images = _value("ocr_images_processed_total", outcome="pass") + _value(
+        "ocr_images_processed_total", outcome="manual"
+    )
+
+    run_load_test(
+        LoadTestConfig(jobs=1, images=2, languages=["en"], ocr_latency="fixed", ocr_latency_ms=0),
+        fakes=fakes,
+    )
+
+    import app.main as checker_main
+    import worker.main as worker_main
+
+    worker_body = TestClient(worker_main.app).get("/metrics").text
+    checker_body = TestClient(checker_main.app).get("/metrics").text
+
+    for name in (
+        "ocr_jobs_total",
+        "ocr_backend_latency_seconds_bucket",
+        "ocr_docx_parse_seconds_count",
+        "ocr_match_seconds_per_candidate_count",
+        "ocr_bytes_downloaded_total",
+        "ocr_in_flight",
+    ):
+        assert name in worker_body
+    assert "ocr_bytes_uploaded_total" in checker_body
+
+    after_images = _value("ocr_images_processed_total", outcome="pass") + _value(
+        "ocr_images_processed_total", outcome="manual"
+    )
+    assert _value("ocr_jobs_total", status="DONE") == before_done + 1
+    assert after_images == before_images + 2
+    assert _value("ocr_in_flight", kind="jobs") == 0
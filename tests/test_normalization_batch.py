@@ -0,0 +1,66 @@
+import random
+
+import pytest
+
+from worker.normalization import (
+    _both_uncached,
+    normalize_batch,
+    normalize_both,
+    normalize_cache_clear,
+    normalize_soft,
+    normalize_soft_cached,
+    normalize_strict,
+    normalize_strict_cached,
+)
+
+# Characters that exercise every normalization step: ASCII/Unicode whitespace
+# (incl. \x1c-\x1f which \s matches), CR/LF, curly quotes, casefold specials
+# (ß, İ, final sigma, ligatures), combining marks for NFC, RTL and CJK.
+_ALPHABET = (
+    list("abcXYZ019 .,-!?%\"'")
+    + [" ", "  ", "\n", "\r", "\r\n", "\t", "\x0b", "\x0c", "\x1c", "\x1f"]
+    + ["\u00a0", "\u2009", "\u3000", "\u202f", "\u0085"]
+    + ["\u2018", "\u2019", "\u201a", "\u201b", "\u201c", "\u201d", "\u201e", "\u201f", "\u00ab"]
+    + ["\u00df", "\u0130", "\u03a3", "\u03c2", "\ufb01", "\u212b", "e\u0301", "A\u030a", "\u1e9e"]
+    + ["\u05e9\u05dc\u05d5\u05dd", "\u65e5\u672c\u8a9e", "\u4e2d\u6587", "\u0401", "\u0451", "\u200f"]
+)
+
+
+def _random_texts(seed: int, count: int):
+    rng = random.Random(seed)
+    texts = []
+    for _ in range(count):
+        n = rng.randint(0, 24)
+        texts.append("".join(rng.choice(_ALPHABET) for _ in range(n)))
+    return texts
+
+
+def _random_ascii_texts(seed: int, count: int):
+    rng = random.Random(seed)
+    alphabet = [chr(c) for c in range(128)]
+    return ["".join(rng.choice(alphabet) for _ in range(rng.randint(0, 40))) for _ in range(count)]
+
+
+@pytest.mark.parametrize("texts", [_random_texts(1, 3000), _random_ascii_texts(2, 3000)], ids=["unicode", "ascii"])
+def test_matches_reference_functions(texts):
+    normalize_cache_clear()
+    for text in texts:
+        expected = (normalize_strict(text), normalize_soft(text))
+        assert _both_uncached(text) == expected, repr(text)
+        assert normalize_both(text) == expected, repr(text)
+        # second lookup is served from the cache
+        assert normalize_both(text) == expected, repr(text)
+        assert normalize_strict_cached(text) == expected[0]
+        assert normalize_soft_cached(text) == expected[1]
+
+
+def test_batch_modes():
+    texts = _random_texts(3, 200) + [None, "", "Long " * 5000]
+    assert normalize_batch(texts) == [normalize_strict(t) for t in texts]
+    assert normalize_batch(texts, "soft") == [normalize_soft(t) for t in texts]
+    assert normalize_batch(texts, "both") == [(normalize_strict(t), normalize_soft(t)) for t in texts]
+
+
+def test_batch_rejects_unknown_mode():
+    with pytest.raises(ValueError):
+        normalize_batch(["x"], "loose")
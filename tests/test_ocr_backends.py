@@ -0,0 +1,141 @@
+"""
+Tests for pluggable OCR backends (fake + record/replay).
+"""
+
+import asyncio
+import statistics
+
+import pytest
+
+from shared.ocr_backends import (
+    BaseOcrBackend,
+    FakeOcrBackend,
+    OcrBackend,
+    OcrRecordingMissing,
+    RecordReplayOcrBackend,
+    VISION_ERROR_PREFIX,
+    VisionOcrBackend,
+    backend_from_env,
+    image_digest,
+    make_fake_png,
+)
+
+
+class TestFakeOcrBackend:
+    """Deterministic fake backend."""
+
+    def test_reads_text_from_synthetic_png(self):
+        backend = FakeOcrBackend()
+        img = make_fake_png("Купить сейчас\nBuy now")
+
+        assert backend.recognize(img) == "Купить сейчас\nBuy now"
+
+    def test_mapping_takes_precedence(self):
+        img = make_fake_png("embedded")
+        backend = FakeOcrBackend({image_digest(img): "mapped"})
+
+        assert backend.recognize(img) == "mapped"
+        assert backend.recognize(b"not an image") == "No text detected."
+
+    def test_latency_and_errors_are_deterministic(self):
+        images = [make_fake_png(f"text {i}") for i in range(50)]
+        kwargs = dict(latency="lognormal", latency_ms=100, jitter_ms=50, error_rate=0.3, seed=7)
+        a = FakeOcrBackend(sleep=lambda s: None, **kwargs)
+        b = FakeOcrBackend(sleep=lambda s: None, **kwargs)
+
+        assert [a.latency_for(i) for i in images] == [b.latency_for(i) for i in images]
+        assert a.recognize_batch(images) == b.recognize_batch(images)
+
+        errors = sum(t.startswith(VISION_ERROR_PREFIX) for t in a.recognize_batch(images))
+        assert 0 < errors < len(images)
+
+    def test_lognormal_mean_and_jitter_are_bounded(self):
+        images = [b"image %d" % i for i in range(2000)]
+        moderate = FakeOcrBackend(latency="lognormal", latency_ms=100, jitter_ms=50)
+        delays = [moderate.latency_for(i) for i in images]
+        mean = sum(delays) / len(delays)
+        assert 0.09 < mean < 0.11
+        assert 0.04 < statistics.pstdev(delays) < 0.06
+
+        # jitter far above the mean: no single draw may exceed 10x the latency
+        wild = FakeOcrBackend(latency="lognormal", latency_ms=5, jitter_ms=40)
+        delays = [wild.latency_for(i) for i in images]
+        assert max(delays) <= 0.05
+        assert sum(delays) / len(delays) < 0.01
+
+    def test_async_batch(self):
+        backend = FakeOcrBackend(latency_ms=1)
+        images = [make_fake_png(f"t{i}") for i in range(5)]
+
+        texts = asyncio.run(backend.recognize_batch_async(images))
+
+        assert texts == [f"t{i}" for i in range(5)]
+        assert backend.calls == 5
+
+    def test_satisfies_protocol(self):
+        assert isinstance(FakeOcrBackend(), OcrBackend)
+
+    def test_incomplete_backend_fails_at_construction(self):
+        class NoRecognize(BaseOcrBackend):
+            name = "broken"
+
+        with pytest.raises(TypeError):
+            NoRecognize()
+
+
+class TestRecordReplayOcrBackend:
+    """Record/replay backend keyed by image hash."""
+
+    def test_record_then_replay(self, tmp_path):
+        img = make_fake_png("Sale")
+        inner = FakeOcrBackend()
+
+        RecordReplayOcrBackend(str(tmp_path), mode="record", inner=inner).recognize(img)
+        replay = RecordReplayOcrBackend(str(tmp_path), mode="replay")
+
+        assert replay.recognize(img) == "Sale"
+        with pytest.raises(OcrRecordingMissing):
+            replay.recognize(make_fake_png("other"))
+
+    def test_cache_mode_calls_inner_once(self, tmp_path):
+        images = [make_fake_png("a"), make_fake_png("b"), make_fake_png("a")]
+        inner = FakeOcrBackend()
+        cache = RecordReplayOcrBackend(str(tmp_path), mode="cache", inner=inner)
+
+        assert cache.recognize_batch(images[:2]) == ["a", "b"]
+        assert cache.recognize(images[2]) == "a"
+        assert inner.calls == 2
+
+    def test_errors_are_not_recorded(self, tmp_path):
+        img = make_fake_png("x")
+        inner = FakeOcrBackend(error_rate=1.0)
+        cache = RecordReplayOcrBackend(str(tmp_path), mode="cache", inner=inner)
+
+        cache.recognize(img)
+
+        assert cache.lookup(img) is None
+
+
+def test_backend_from_env():
+    backend = backend_from_env({"OCR_BACKEND": "fake", "OCR_FAKE_LATENCY_MS": "5", "OCR_FAKE_SEED": "3"})
+    assert isinstance(backend, FakeOcrBackend)
+    assert backend.latency_ms == 5.0 and backend.seed == 3
+
+    with pytest.raises(ValueError):
+        backend_from_env({"OCR_BACKEND": "tesseract"})
+
+
+def test_vision_warmup_refreshes_its_own_credentials():
+    class _Credentials:
+        valid = False
+        refreshes = 0
+
+        def refresh(self, request):
+            self.refreshes += 1
+            self.valid = True
+
+    credentials = _Credentials()
+    backend = VisionOcrBackend(client=object(), credentials=credentials)
+    backend.warmup()
+    backend.warmup()
+    assert credentials.refreshes == 1
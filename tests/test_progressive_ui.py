@@ -0,0 +1,125 @@
+"""
+Tests for the progressively streamed synchronous upload page.
+"""
+
+import asyncio
+
+import httpx
+import pytest
+from prometheus_client import REGISTRY
+
+from benchmarks.ui_first_row import measure
+from loadtest.cloud_fakes import CloudFakes
+from loadtest.synth import build_campaign_zip
+from shared.ocr_backends import FakeOcrBackend, set_ocr_backend
+
+
+class _GatedOcr(FakeOcrBackend):
+    """Every image after the first waits until a result row has reached the client."""
+
+    def __init__(self, row_sent: asyncio.Event):
+        super().__init__()
+        self.row_sent = row_sent
+        self.waited_for_row = []
+
+    async def recognize_async(self, image_bytes):
+        if self.calls:
+            try:
+                await asyncio.wait_for(self.row_sent.wait(), timeout=5)
+                self.waited_for_row.append(True)
+            except asyncio.TimeoutError:
+                self.waited_for_row.append(False)
+        return await super().recognize_async(image_bytes)
+
+
+async def _post(zip_bytes, receive_after_body, send):
+    import app.main as checker_main
+
+    request = httpx.Request("POST", "http://checker/", files={"zip_file": ("campaign.zip", zip_bytes, "application/zip")})
+    body = request.read()
+    delivered = False
+
+    async def receive():
+        nonlocal delivered
+        if not delivered:
+            delivered = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        return await receive_after_body()
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST", "scheme": "http",
+        "path": "/", "raw_path": b"/", "query_string": b"", "root_path": "",
+        "headers": [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in request.headers.items()],
+        "client": ("test", 1), "server": ("checker", 80),
+    }
+    await checker_main.app(scope, receive, send)
+
+
+def _sync_uploads():
+    return REGISTRY.get_sample_value("ocr_in_flight", {"kind": "sync_uploads"}) or 0.0
+
+
+def test_first_row_arrives_before_the_page_is_complete():
+    report = measure(images=8, latency_ms=40, concurrency=1)
+    assert report["row_chunks"] == 8
+    assert report["first_row_s"] < report["total_s"]
+
+
+def test_rows_are_sent_before_the_archive_is_checked(monkeypatch):
+    import app.main as checker_main
+
+    CloudFakes().install()
+    monkeypatch.setattr(checker_main, "UI_CONCURRENCY", 1)
+    monkeypatch.setenv("OCR_BUDGET_PER_JOB", "0")
+    campaign = build_campaign_zip(seed=2, images=4, languages=["en"])
+
+    async def run():
+        row_sent = asyncio.Event()
+        backend = _GatedOcr(row_sent)
+        set_ocr_backend(backend)
+
+        async def send(message):
+            if message["type"] == "http.response.body" and b"<td>" in message.get("body", b""):
+                row_sent.set()
+
+        await _post(campaign.zip_bytes, asyncio.Event().wait, send)
+        return backend
+
+    try:
+        backend = asyncio.run(run())
+    finally:
+        set_ocr_backend(None)
+    assert backend.waited_for_row == [True, True, True]
+
+
+def test_cleanup_runs_when_the_client_leaves_before_the_body(tmp_path, monkeypatch):
+    import tempfile
+
+    import app.main as checker_main
+
+    CloudFakes().install()
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+    campaign = build_campaign_zip(seed=2, images=4, languages=["en"])
+    before = _sync_uploads()
+    set_ocr_backend(FakeOcrBackend())
+
+    async def disconnect():
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        raise OSError("client went away")  # before the first body chunk
+
+    try:
+        with pytest.raises(Exception):  # the OSError, possibly inside an ExceptionGroup
+            asyncio.run(_post(campaign.zip_bytes, disconnect, send))
+    finally:
+        set_ocr_backend(None)
+    assert list(tmp_path.iterdir()) == []  # uploaded zip and extracted images
+    assert _sync_uploads() == before
+    assert checker_main.admission.active == 0
+
+
+def test_bounded_concurrency_shortens_the_page():
+    sequential = measure(images=8, latency_ms=40, concurrency=1)
+    concurrent = measure(images=8, latency_ms=40, concurrency=4)
+    assert concurrent["total_s"] < sequential["total_s"]
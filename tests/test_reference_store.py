@@ -0,0 +1,110 @@
+"""
+Tests for the persistent reference store: round trip, integrity, eviction.
+"""
+
+import os
+
+from benchmarks import fixtures
+from loadtest.cloud_fakes import FakeStorage
+from shared.docx_section_extractor import extract_section_candidates
+from shared.reference_store import (
+    LocalDiskReferenceStore,
+    ObjectStorageReferenceStore,
+    TieredReferenceStore,
+    build_entry,
+    docx_key,
+    load_candidates,
+)
+from worker import normalization
+
+
+def _counting_extract(calls):
+    def extract(data, filename, language):
+        calls.append(filename)
+        return extract_section_candidates(data, filename, language)
+    return extract
+
+
+def test_second_job_skips_docx_parsing(tmp_path):
+    store = LocalDiskReferenceStore(str(tmp_path))
+    data = fixtures.paragraph_docx(12)
+    calls = []
+    first = load_candidates(data, "campaign_(en).docx", "en", _counting_extract(calls), store=store)
+    second = load_candidates(data, "promo_(en).docx", "en", _counting_extract(calls), store=store)
+
+    assert calls == ["campaign_(en).docx"]
+    assert [c.content_text for c in second] == [c.content_text for c in first]
+    assert [c.section_name for c in second] == [c.section_name for c in first]
+    assert {c.source_path for c in second} == {"promo_(en).docx"}
+
+
+def test_hit_primes_normalization(tmp_path):
+    store = LocalDiskReferenceStore(str(tmp_path))
+    cands = fixtures.candidates(5, "de")
+    entry = build_entry("ab" * 32, cands)
+    store.put(entry)
+
+    normalization.normalize_cache_clear()
+    loaded = store.get("ab" * 32)
+    assert loaded.normalized == entry.normalized
+    load_candidates(b"unused", "x.docx", "de", extract=None, store=store, docx_sha256="ab" * 32)
+    cleaned, strict, soft = entry.normalized[0]
+    assert normalization._primed[cleaned] == (strict, soft)
+    assert normalization.normalize_both(cleaned) == (strict, soft)
+    normalization.normalize_cache_clear()
+
+
+def test_corrupt_entry_is_a_miss_and_removed(tmp_path):
+    store = LocalDiskReferenceStore(str(tmp_path))
+    key = docx_key(b"doc")
+    store.put(build_entry(key, fixtures.candidates(3)))
+    path = store._path(key)
+    data = bytearray(path.read_bytes())
+    data[-5] ^= 0xFF
+    path.write_bytes(bytes(data))
+
+    assert store.get(key) is None
+    assert not path.exists()
+
+
+def test_lru_eviction_by_size(tmp_path):
+    entries = [build_entry(docx_key(bytes([i])), fixtures.candidates(20)) for i in range(3)]
+    probe = LocalDiskReferenceStore(str(tmp_path / "probe"))
+    probe.put(entries[0])
+    size = probe.total_bytes
+
+    store = LocalDiskReferenceStore(str(tmp_path / "lru"), max_bytes=int(size * 2.5))
+    store.put(entries[0])
+    store.put(entries[1])
+    old = 1_000_000_000
+    os.utime(store._path(entries[0].docx_sha256), (old, old))
+    os.utime(store._path(entries[1].docx_sha256), (old + 10, old + 10))
+    assert store.get(entries[0].docx_sha256) is not None  # touch: now most recent
+    store.put(entries[2])
+
+    assert store.evictions == 1
+    assert store.get(entries[1].docx_sha256) is None
+    assert store.get(entries[0].docx_sha256) is not None
+    assert store.get(entries[2].docx_sha256) is not None
+    assert store.total_bytes <= store.max_bytes
+
+
+def test_other_extractor_version_is_not_read(tmp_path, monkeypatch):
+    store = LocalDiskReferenceStore(str(tmp_path))
+    key = docx_key(b"doc")
+    store.put(build_entry(key, fixtures.candidates(3)))
+    monkeypatch.setattr("shared.reference_store.EXTRACTOR_VERSION", "999")
+    assert store.get(key) is None
+
+
+def test_object_storage_and_tiered(tmp_path):
+    storage = FakeStorage()
+    remote = ObjectStorageReferenceStore("refs", client=storage)
+    key = docx_key(b"doc")
+    assert remote.get(key) is None
+    remote.put(build_entry(key, fixtures.candidates(4)))
+
+    local = LocalDiskReferenceStore(str(tmp_path))
+    tiered = TieredReferenceStore(local, remote)
+    assert tiered.get(key) is not None
+    assert local.get(key) is not None  # copied down on a remote hit
@@ -0,0 +1,189 @@
+"""
+Tests for compressed columnar result blobs (large jobs).
+"""
+
+import io
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from loadtest.cloud_fakes import CloudFakes
+from loadtest.harness import _push_envelope
+from loadtest.synth import build_campaign_zip
+from shared.local_storage import LocalStorage
+from shared.ocr_backends import FakeOcrBackend, set_ocr_backend
+from shared.result_blob import BlobResultSink, ResultBlobWriter, open_result_blob
+
+_REFERENCES = [f"Reference text number {i}: buy now and save on the whole spring range" for i in range(5)]
+
+
+def _result(i):
+    result = {
+        "image": f"images/{i:05d}_(en).png",
+        "ocr": f"ocr text of image {i}",
+        "reference": _REFERENCES[i % len(_REFERENCES)],
+        "match": i % 3 != 0,
+        "selection": {
+            "chosen_section_name": "Banners" if i % 2 else None,
+            "chosen_section_number": str(i % 4),
+            "manual_required": i % 7 == 0,
+            "warnings": ["delta rule"] if i % 5 == 0 else [],
+        },
+    }
+    if i % 11 == 0:
+        del result["selection"]  # older results had no selection block
+    if i % 13 == 0:
+        result["error"] = "OCR failed"
+    return result
+
+
+@pytest.mark.parametrize("backend", ["fake", "local"])
+def test_sink_round_trip_in_archive_order(backend, tmp_path):
+    storage = CloudFakes().storage if backend == "fake" else LocalStorage(str(tmp_path / "gcs"))
+    rows = [_result(i) for i in range(250)]
+    sink = BlobResultSink("job-1", storage.bucket("uploads"), order={r["image"]: i for i, r in enumerate(rows)},
+                          chunk_rows=64, directory=str(tmp_path))
+    for r in reversed(rows):
+        sink.write(r)
+    sink.flush()
+
+    assert sink.pointer["rows"] == 250 and sink.pointer["codec"] == "gzip"
+    assert sink.aggregates.total == 250
+    assert list(tmp_path.glob("ocr_results_*")) == []  # spool removed
+    assert list(open_result_blob(sink.pointer, storage).iter_rows()) == rows
+
+
+def test_string_table_keeps_blobs_small():
+    rows = [_result(i) for i in range(2000)]
+    out = io.BytesIO()
+    writer = ResultBlobWriter(out, chunk_rows=500)
+    for r in rows:
+        writer.write(r)
+    writer.close()
+    ndjson = sum(len(json.dumps(r)) + 1 for r in rows)
+    assert len(out.getvalue()) < ndjson / 10
+
+
+def test_pages_read_only_the_chunks_they_touch():
+    fakes = CloudFakes()
+    sink = BlobResultSink("job-1", fakes.storage.bucket("uploads"), chunk_rows=100)
+    for i in range(1000):
+        sink.write(_result(i))
+    sink.flush()
+
+    fakes.storage.bytes_downloaded = 0
+    reader = open_result_blob(sink.pointer, fakes.storage)
+    page = list(reader.iter_rows(450, 470))
+    assert [r["image"] for r in page] == [_result(i)["image"] for i in range(450, 470)]
+    assert reader.chunks_read == 1
+    assert fakes.storage.bytes_downloaded < sink.pointer["bytes"] / 5
+
+    # pages spanning a chunk boundary decode both chunks
+    assert len(list(reader.iter_rows(195, 205))) == 10
+    assert reader.chunks_read == 3
+
+
+def test_unknown_codec_is_rejected():
+    with pytest.raises(ValueError):
+        ResultBlobWriter(io.BytesIO(), codec="lz4")
+
+
+def test_large_jobs_store_a_pointer_instead_of_result_documents(monkeypatch):
+    import worker.main as worker_main
+    from app.jobs_api import router
+
+    monkeypatch.setattr(worker_main, "RESULTS_BLOB_MIN_RESULTS", 5)
+    fakes = CloudFakes()
+    fakes.install()
+    checker = FastAPI()
+    checker.include_router(router)
+    checker, worker = TestClient(checker), TestClient(worker_main.app)
+
+    campaign = build_campaign_zip(seed=8, images=12, languages=["en", "de"])
+    resp = checker.post("/jobs", files={"zip_file": ("campaign.zip", campaign.zip_bytes, "application/zip")})
+    job_id = resp.json()["job_id"]
+    _, data, attrs = fakes.publisher.pop()
+    set_ocr_backend(FakeOcrBackend(latency="fixed", latency_ms=0))
+    try:
+        assert worker.post("/pubsub/push", json=_push_envelope(data, attrs["message_id"])).status_code == 200
+    finally:
+        set_ocr_backend(None)
+
+    job = checker.get(f"/jobs/{job_id}").json()
+    assert job["status"] == "DONE"
+    rows = job["result"]["summary"]["total"]  # sampled images
+    assert rows >= 5 and job["result"]["results_blob"]["rows"] == rows
+    assert "results" not in job["result"]
+    jobs = fakes.firestore.collection("jobs")
+    assert list(jobs.document(job_id).collection("results").stream()) == []
+
+    everything = [json.loads(line) for line in checker.get(f"/jobs/{job_id}/results").text.splitlines()]
+    assert len(everything) == rows
+    page = checker.get(f"/jobs/{job_id}/results", params={"offset": 4, "limit": 3}).text.splitlines()
+    assert [json.loads(line) for line in page] == everything[4:7]
+    assert checker.get(f"/jobs/{job_id}/results", params={"offset": -1}).status_code == 400
+    assert len(checker.get(f"/jobs/{job_id}/export", params={"format": "ndjson"}).text.splitlines()) == rows
+
+
+@pytest.mark.parametrize("escalate_above, blob", [(None, False), (0.5, True)])
+def test_sink_choice_counts_a_possible_escalation(tmp_path, monkeypatch, escalate_above, blob):
+    import shutil
+
+    import worker.main as worker_main
+    from shared.sampling import SamplingConfig
+    from zip_processor import parse_zip_streaming
+
+    monkeypatch.setattr(worker_main, "RESULTS_BLOB_MIN_RESULTS", 10)
+    fakes = CloudFakes()
+    fakes.install()
+    path = tmp_path / "campaign.zip"
+    path.write_bytes(build_campaign_zip(seed=8, images=12, languages=["en", "de"]).zip_bytes)
+    matches, work_dir = parse_zip_streaming(str(path), return_work_dir=True, return_extended=True)
+    set_ocr_backend(FakeOcrBackend(latency="fixed", latency_ms=0))
+    try:
+        # a budget of 3 is below the threshold, but an escalation can check all 12 images
+        result = worker_main._run_job("job-1", fakes.storage.bucket("uploads"), matches, None, None,
+                                      SamplingConfig(budget=3, escalate_above=escalate_above))
+    finally:
+        set_ocr_backend(None)
+        shutil.rmtree(work_dir, ignore_errors=True)
+    assert ("results_blob" in result) is blob
+
+
+def test_failed_job_removes_the_spool(tmp_path, monkeypatch):
+    import shutil
+    import tempfile
+
+    import worker.main as worker_main
+    from shared.sampling import SamplingConfig
+    from zip_processor import parse_zip_streaming
+
+    monkeypatch.setattr(worker_main, "RESULTS_BLOB_MIN_RESULTS", 1)
+    fakes = CloudFakes()
+    fakes.install()
+    path = tmp_path / "campaign.zip"
+    path.write_bytes(build_campaign_zip(seed=8, images=12, languages=["en", "de"]).zip_bytes)
+    matches, work_dir = parse_zip_streaming(str(path), return_work_dir=True, return_extended=True)
+    real_iter_checked = worker_main._iter_checked
+
+    def failing(*args):
+        for i, result in enumerate(real_iter_checked(*args)):
+            yield result
+            if i == 2:
+                raise RuntimeError("OCR backend went away")
+
+    spool_dir = tmp_path / "spool"
+    spool_dir.mkdir()
+    monkeypatch.setattr(tempfile, "tempdir", str(spool_dir))
+    monkeypatch.setattr(worker_main, "_iter_checked", failing)
+    set_ocr_backend(FakeOcrBackend(latency="fixed", latency_ms=0))
+    try:
+        with pytest.raises(RuntimeError):
+            worker_main._run_job("job-1", fakes.storage.bucket("uploads"), matches, None, None,
+                                 SamplingConfig(budget=0))
+    finally:
+        set_ocr_backend(None)
+        shutil.rmtree(work_dir, ignore_errors=True)
+    assert list(spool_dir.iterdir()) == []
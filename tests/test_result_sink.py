@@ -0,0 +1,91 @@
+"""
+Tests for per-image result sinks and the results endpoint.
+"""
+
+import json
+import os
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from loadtest.cloud_fakes import CloudFakes
+from shared.result_sink import FirestoreResultSink, NdjsonSpoolSink, ResultAggregates, iter_job_results
+
+
+def _result(name, match=True, manual=False):
+    return {"image": name, "ocr": "x", "reference": "x", "match": match, "selection": {"manual_required": manual}}
+
+
+def test_aggregates():
+    agg = ResultAggregates()
+    for r in (_result("a"), _result("b", match=False), _result("c", manual=True), _result("d", False, True)):
+        agg.add(r)
+    assert agg.to_dict() == {"total": 4, "passed": 1, "manual_count": 2, "mismatched": 2}
+    assert agg.failure_rate == 0.75
+
+
+def test_ndjson_spool_round_trip_and_cleanup(tmp_path):
+    with NdjsonSpoolSink(directory=str(tmp_path)) as sink:
+        for i in range(5):
+            sink.write(_result(f"images/{i}.png", match=i % 2 == 0))
+        assert [r["image"] for r in sink] == [f"images/{i}.png" for i in range(5)]
+        assert sink.aggregates.passed == 3
+        path = sink.path
+    assert not os.path.exists(path)
+
+
+def test_firestore_sink_batches_in_archive_order():
+    fakes = CloudFakes()
+    order = {f"images/{i}.png": i for i in range(7)}
+    sink = FirestoreResultSink("job-1", order=order, firestore=fakes.firestore, inline_limit=3, batch_size=4)
+    for i in (6, 0, 5, 1, 4, 2, 3):
+        sink.write(_result(f"images/{i}.png"))
+    assert fakes.firestore.writes == 4  # first batch committed, rest pending
+    sink.flush()
+
+    stored = list(iter_job_results("job-1", fakes.firestore))
+    assert [r["image"] for r in stored] == [f"images/{i}.png" for i in range(7)]
+    assert "seq" not in stored[0]
+    assert sink.inline_results is None  # more than inline_limit
+
+
+def test_firestore_sink_close_writes_the_pending_batch():
+    fakes = CloudFakes()
+    sink = FirestoreResultSink("job-1", firestore=fakes.firestore, batch_size=10)
+    for i in range(3):
+        sink.write(_result(f"images/{i}.png"))
+    sink.close()
+    sink.close()
+    assert len(list(iter_job_results("job-1", fakes.firestore))) == 3
+
+
+def test_small_jobs_keep_inline_results():
+    fakes = CloudFakes()
+    sink = FirestoreResultSink("job-1", order={"b": 1, "a": 0}, firestore=fakes.firestore, inline_limit=5)
+    sink.write(_result("b"))
+    sink.write(_result("a"))
+    assert list(sink.inline_results) == ["a", "b"]
+
+
+def test_results_endpoint_streams_ndjson():
+    from app.jobs_api import router
+
+    fakes = CloudFakes()
+    fakes.install()
+    jobs = fakes.firestore.collection("jobs")
+    jobs.document("new").set({"status": "DONE", "result": {"total": 2}})
+    sink = FirestoreResultSink("new", order={"a": 0, "b": 1}, firestore=fakes.firestore)
+    sink.write(_result("b"))
+    sink.write(_result("a"))
+    sink.flush()
+    jobs.document("old").set({"status": "DONE", "result": {"results": {"a": _result("a")}}})
+
+    app = FastAPI()
+    app.include_router(router)
+    client = TestClient(app)
+
+    resp = client.get("/jobs/new/results")
+    assert resp.headers["content-type"].startswith("application/x-ndjson")
+    assert [json.loads(line)["image"] for line in resp.text.splitlines()] == ["a", "b"]
+    assert [json.loads(line)["image"] for line in client.get("/jobs/old/results").text.splitlines()] == ["a"]
+    assert client.get("/jobs/missing/results").status_code == 404
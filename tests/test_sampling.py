@@ -0,0 +1,95 @@
+"""
+Tests for stratified OCR sampling under a per-job budget.
+"""
+
+from collections import Counter
+
+from shared.sampling import SKIPPED_PREVIEW, SamplingConfig, plan_sample, run_sampled
+
+
+def _matches(per_language):
+    items = []
+    for language, count in per_language.items():
+        for i in range(count):
+            items.append((f"images/banner_{i:03d}_({language}).png", "/tmp/x", f"ref {language}", None, language))
+    return items
+
+
+def _languages(items, positions):
+    return Counter(items[pos][4] for pos in positions)
+
+
+def test_every_stratum_is_sampled_before_seconds():
+    # archive order would give the first 10 images: all English
+    items = _matches({"en": 50, "de": 5, "ja": 3, "he": 1})
+    plan = plan_sample(items, SamplingConfig(budget=10))
+
+    langs = _languages(items, plan.selected)
+    assert len(plan.selected) == 10
+    assert set(langs) == {"en", "de", "ja", "he"}
+    assert langs["en"] > langs["de"] >= langs["he"]
+    assert len(plan.skipped) == len(items) - 10
+    assert set(plan.skipped_names) == {items[pos][0] for pos in plan.skipped}
+
+
+def test_sample_is_deterministic_per_seed():
+    items = _matches({"en": 40, "de": 40})
+    a = plan_sample(items, SamplingConfig(budget=6, seed=1))
+    b = plan_sample(list(items), SamplingConfig(budget=6, seed=1))
+    c = plan_sample(items, SamplingConfig(budget=6, seed=2))
+    assert a.selected == b.selected
+    assert a.selected != c.selected
+
+
+def test_budget_smaller_than_strata():
+    items = _matches({"en": 2, "de": 2, "ja": 2, "he": 2})
+    plan = plan_sample(items, SamplingConfig(budget=3))
+    assert len(plan.selected) == 3
+    assert max(_languages(items, plan.selected).values()) == 1
+
+
+def test_no_limit_checks_everything():
+    items = _matches({"en": 15})
+    plan = plan_sample(items, SamplingConfig(budget=0))
+    assert plan.selected == list(range(15)) and plan.skipped == []
+
+
+def _check(fail_langs):
+    calls = []
+
+    def check(batch):
+        calls.append(len(batch))
+        return {m[0]: {"image": m[0], "match": m[4] not in fail_langs, "selection": {}} for m in batch}
+    return check, calls
+
+
+def test_escalates_when_sample_fails_too_often():
+    items = _matches({"en": 20, "de": 20})
+    check, calls = _check({"de"})
+    results, plan = run_sampled(items, SamplingConfig(budget=4, escalate_above=0.25), check)
+
+    assert plan.escalated and plan.failure_rate == 0.5
+    assert calls == [4, 36]
+    assert list(results) == [m[0] for m in items]
+    assert plan.to_dict()["skipped_count"] == 0 and plan.to_dict()["skipped_preview"] == []
+
+
+def test_no_escalation_below_threshold():
+    items = _matches({"en": 20, "de": 20})
+    check, calls = _check(set())
+    results, plan = run_sampled(items, SamplingConfig(budget=4, escalate_above=0.25), check)
+    assert not plan.escalated and calls == [4]
+    assert len(results) == 4 and plan.to_dict()["skipped_count"] == 36
+    assert plan.to_dict()["skipped_preview"] == plan.skipped_names[:SKIPPED_PREVIEW]
+
+
+def test_config_overrides():
+    config = SamplingConfig.from_env({"OCR_BUDGET_PER_JOB": "25", "OCR_ESCALATE_FAILURE_RATE": "0.3"})
+    assert config == SamplingConfig(budget=25, seed=0, escalate_above=0.3)
+    assert config.with_overrides({"ocr_budget": 0, "sample_seed": 7}) == SamplingConfig(0, 7, 0.3)
+
+
+def test_max_checked_counts_a_possible_escalation():
+    assert SamplingConfig(budget=10).max_checked(3000) == 10
+    assert SamplingConfig(budget=10, escalate_above=0.2).max_checked(3000) == 3000
+    assert SamplingConfig(budget=0).max_checked(3000) == 3000
@@ -0,0 +1,75 @@
+"""
+Tests for the fair multi-job OCR scheduler.
+"""
+
+import threading
+
+import pytest
+
+from shared.scheduler import FairScheduler
+
+
+@pytest.fixture
+def scheduler():
+    sched = FairScheduler(slots=1, small_job=5, small_weight=4)
+    yield sched
+    sched.shutdown()
+
+
+def _run(order, name, gate=None):
+    order.append(name)
+    if gate is not None:
+        gate.wait(timeout=5)
+    return name
+
+
+def _block(queue, order, name):
+    """Submit a unit that holds the only slot until the returned gate is set."""
+    started, gate = threading.Event(), threading.Event()
+    future = queue.submit(lambda: started.set() or _run(order, name, gate))
+    assert started.wait(timeout=5)
+    return future, gate
+
+
+def test_small_job_overtakes_a_large_one(scheduler):
+    order = []
+    large = scheduler.job("large", 20)
+    first, gate = _block(large, order, "L")
+    rest = [large.submit(_run, order, "L") for _ in range(19)]
+    small = scheduler.job("small", 4)
+    smalls = [small.submit(_run, order, "S") for _ in range(4)]
+    gate.set()
+    for f in [first, *rest, *smalls]:
+        f.result(timeout=5)
+    assert order[:5] == ["L", "S", "S", "S", "S"]
+
+
+def test_equal_jobs_alternate(scheduler):
+    order = []
+    a, b = scheduler.job("a", 10), scheduler.job("b", 10)
+    blocker, gate = _block(a, order, "a")
+    futures = [a.submit(_run, order, "a") for _ in range(3)] + [b.submit(_run, order, "b") for _ in range(3)]
+    gate.set()
+    for f in [blocker, *futures]:
+        f.result(timeout=5)
+    assert order == ["a", "b", "a", "b", "a", "b", "a"]
+
+
+def test_single_job_uses_every_slot():
+    sched = FairScheduler(slots=4)
+    barrier = threading.Barrier(4, timeout=5)  # only passes with 4 units running at once
+    try:
+        with sched.job("solo", 4) as queue:
+            assert queue.map(lambda i: barrier.wait() is not None and i, range(4)) == [0, 1, 2, 3]
+    finally:
+        sched.shutdown()
+
+
+def test_closing_a_job_cancels_its_queued_units(scheduler):
+    queue = scheduler.job("j", 3)
+    running, gate = _block(queue, [], "x")
+    queued = queue.submit(_run, [], "y")
+    queue.close()
+    gate.set()
+    assert running.result(timeout=5) == "x"
+    assert queued.cancelled()
@@ -0,0 +1,183 @@
+"""
+Tests for the selection-decision cache (LRU + SQLite tier, matcher fingerprint).
+"""
+
+import shutil
+
+from loadtest.cloud_fakes import CloudFakes
+from loadtest.synth import build_campaign_zip
+from shared import selection_cache
+from shared.docx_section_extractor import SectionCandidate
+from shared.ocr_backends import FakeOcrBackend, set_ocr_backend
+from shared.reference_matcher import select_best_sections_batch
+from shared.sampling import SamplingConfig
+from shared.selection_cache import (
+    SelectionCache,
+    SqliteSelectionTier,
+    matcher_fingerprint,
+    select_with_cache,
+    selection_key,
+    set_selection_cache,
+)
+from shared.similarity import LevenshteinBackend, SequenceMatcherBackend, set_similarity_backend
+from worker.normalization import normalize_soft_cached, normalize_strict_cached
+from zip_processor import parse_zip_streaming
+
+_CANDIDATES = [
+    SectionCandidate("BANNER", "Buy now and save 20%", "c_(en).docx", "en", "01", "BANNER"),
+    SectionCandidate("EMAIL", "Your spring offer is here", "c_(en).docx", "en", "02", "EMAIL"),
+    SectionCandidate("PIC", "Spring sale: up to 50% off", "c_(en).docx", "en", "03", "PIC"),
+]
+
+
+class _Counting:
+    def __init__(self, candidates, **hints):
+        self.candidates = candidates
+        self.hints = hints
+        self.texts = []
+
+    def __call__(self, texts):
+        self.texts.extend(texts)
+        return select_best_sections_batch(
+            texts, self.candidates, normalize_strict_cached, normalize_soft_cached, **self.hints
+        )
+
+
+def _select(texts, cache, select=None, **kwargs):
+    select = select or _Counting(_CANDIDATES)
+    return select_with_cache(texts, _CANDIDATES, select, docx_sha256="d" * 64, language="en", cache=cache, **kwargs)
+
+
+def test_hits_skip_matching_and_decide_the_same():
+    cache = SelectionCache(size=100)
+    texts = ["Buy now and save 20%", "Spring sale up to 50% off", "unrelated text"]
+    first_select = _Counting(_CANDIDATES)
+    first = _select(texts, cache, first_select)
+    assert first_select.texts == texts
+
+    again = _Counting(_CANDIDATES)
+    second = _select(texts + ["Your spring offer is here"], cache, again)
+    assert again.texts == ["Your spring offer is here"]  # only the new text is matched
+    for a, b in zip(first, second):
+        assert a.to_dict() == b.to_dict()
+        assert a.chosen_section is b.chosen_section  # rebuilt around the caller's candidates
+    assert (cache.hits, cache.misses) == (3, 4)
+
+
+def test_entries_do_not_hold_section_text():
+    long_text = "Spring sale on the whole range " * 500
+    candidates = _CANDIDATES + [SectionCandidate("LONG", long_text, "c_(en).docx", "en", "04", "LONG")]
+    cache = SelectionCache(size=100)
+    texts = [long_text, "Buy now and save 20%"]
+    first = select_with_cache(texts, candidates, _Counting(candidates), docx_sha256="d" * 64, language="en",
+                              cache=cache)
+    assert all(len(repr(record)) < 200 for record in cache._lru.values())
+
+    again = _Counting(candidates)
+    second = select_with_cache(texts, candidates, again, docx_sha256="d" * 64, language="en", cache=cache)
+    assert again.texts == []
+    assert [r.chosen_text for r in second] == [r.chosen_text for r in first]
+    assert second[0].chosen_text.startswith("Spring sale")
+
+
+def test_key_covers_every_input_but_not_cta_brackets_or_whitespace():
+    key = selection_key("Buy now [and] save", "d" * 64, 3, "en")
+    assert selection_key("Buy now and save  ", "d" * 64, 3, "en") == key
+    assert selection_key("Buy now and save!", "d" * 64, 3, "en") != key
+    assert selection_key("Buy now and save", "e" * 64, 3, "en") != key
+    assert selection_key("Buy now and save", "d" * 64, 4, "en") != key
+    assert selection_key("Buy now and save", "d" * 64, 3, "de") != key
+    assert selection_key("Buy now and save", "d" * 64, 3, "en", section_number="01") != key
+    assert selection_key("Buy now and save", "d" * 64, 3, "en", section_name="BANNER") != key
+
+
+def test_fingerprint_follows_matcher_source_and_backend(tmp_path, monkeypatch):
+    module = tmp_path / "fake_scoring.py"
+    module.write_text("WEIGHT = 1.0\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    monkeypatch.setattr(selection_cache, "MATCHER_MODULES", ("fake_scoring",))
+    try:
+        selection_cache._sources_digest.cache_clear()
+        before = matcher_fingerprint()
+        module.write_text("WEIGHT = 1.5\n")  # a scoring constant changes
+        selection_cache._sources_digest.cache_clear()
+        assert matcher_fingerprint() != before
+
+        set_similarity_backend(LevenshteinBackend())
+        levenshtein = matcher_fingerprint()
+        set_similarity_backend(SequenceMatcherBackend())
+        assert matcher_fingerprint() != levenshtein
+    finally:
+        set_similarity_backend(None)
+        selection_cache._sources_digest.cache_clear()
+
+
+def test_persistent_tier_survives_a_new_process(tmp_path):
+    db = str(tmp_path / "cache" / "selections.sqlite")
+    texts = ["Buy now and save 20%", "unrelated text"]
+    first = SelectionCache(size=100, persistent=SqliteSelectionTier(db))
+    expected = [r.to_dict() for r in _select(texts, first)]
+    first.close()
+
+    fresh = SelectionCache(size=0, persistent=SqliteSelectionTier(db))  # nothing in memory
+    select = _Counting(_CANDIDATES)
+    assert [r.to_dict() for r in _select(texts, fresh, select)] == expected
+    assert select.texts == []
+    fresh.close()
+
+
+def test_lru_and_sqlite_bounds(tmp_path):
+    cache = SelectionCache(size=2)
+    _select(["a", "b", "c"], cache)
+    assert len(cache._lru) == 2
+
+    tier = SqliteSelectionTier(str(tmp_path / "s.sqlite"), max_rows=10)
+    tier.PRUNE_EVERY = 1
+    tier.put_many({f"k{i}": (None, 0.0, 0.0, 0.0, [], True) for i in range(25)})
+    assert len(tier.get_many([f"k{i}" for i in range(25)])) == 10
+    assert "k24" in tier.get_many(["k24"])
+    tier.close()
+
+
+def test_rerun_of_the_same_campaign_skips_matching(tmp_path, monkeypatch):
+    import worker.main as worker_main
+    from shared.cpu_pool import CpuPool, set_cpu_pool
+
+    fakes = CloudFakes()
+    fakes.install()
+    set_ocr_backend(FakeOcrBackend(latency="fixed", latency_ms=0))
+    set_selection_cache(SelectionCache(size=1000))
+    pool = CpuPool(workers=0)
+    set_cpu_pool(pool)
+    matched = []
+    real_select = pool.select_batch
+
+    def counting_select(ocr_texts, **kwargs):
+        matched.extend(ocr_texts)
+        return real_select(ocr_texts, **kwargs)
+
+    monkeypatch.setattr(pool, "select_batch", counting_select)
+
+    campaign = build_campaign_zip(seed=4, images=8, languages=["en", "de"])
+    path = tmp_path / "campaign.zip"
+    path.write_bytes(campaign.zip_bytes)
+
+    def run(job_id):
+        matches, work_dir = parse_zip_streaming(str(path), return_work_dir=True, return_extended=True)
+        try:
+            return worker_main._run_job(job_id, fakes.storage.bucket("uploads"), matches, None, None,
+                                        SamplingConfig(budget=0))
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    try:
+        first = run("job-1")
+        assert matched
+        matched.clear()
+        second = run("job-2")
+        assert matched == []
+        assert second["results"] == first["results"]
+    finally:
+        set_ocr_backend(None)
+        set_selection_cache(None)
+        set_cpu_pool(None)
@@ -0,0 +1,97 @@
+"""
+Tests for the pluggable similarity backends.
+"""
+
+import random
+from difflib import SequenceMatcher
+
+import pytest
+
+from benchmarks import fixtures
+from shared.reference_matcher import select_best_section
+from shared.similarity import (
+    LevenshteinBackend,
+    SequenceMatcherBackend,
+    backend_from_env,
+    get_similarity_backend,
+    lcs_length,
+    quick_ratio,
+    set_similarity_backend,
+)
+from worker.normalization import normalize_soft_cached, normalize_strict_cached
+
+
+def _lcs_dp(a, b):
+    prev = [0] * (len(b) + 1)
+    for ch in a:
+        cur = [0]
+        for j, other in enumerate(b, 1):
+            cur.append(prev[j - 1] + 1 if ch == other else max(prev[j], cur[j - 1]))
+        prev = cur
+    return prev[-1]
+
+
+def _random_pairs(seed, count, alphabet="abcde ", max_len=150):
+    rng = random.Random(seed)
+    for _ in range(count):
+        yield (
+            "".join(rng.choice(alphabet) for _ in range(rng.randint(0, max_len))),
+            "".join(rng.choice(alphabet) for _ in range(rng.randint(0, max_len))),
+        )
+
+
+def test_bit_parallel_lcs_matches_dynamic_programming():
+    for a, b in _random_pairs(1, 300):
+        assert lcs_length(a, b) == _lcs_dp(a, b), (a, b)
+    assert lcs_length("今日限定セール", "限定セール今日") == 5
+
+
+@pytest.mark.parametrize("backend", [SequenceMatcherBackend(), LevenshteinBackend()], ids=lambda b: b.name)
+def test_cutoff_is_exact_above_and_bounded_below(backend):
+    for a, b in _random_pairs(2, 200, max_len=300):
+        exact = backend.ratio(a, b)
+        assert exact <= quick_ratio(a, b) + 1e-12
+        for cutoff in (0.2, 0.5, 0.8, 0.95):
+            got = backend.ratio(a, b, cutoff)
+            if exact >= cutoff:
+                assert got == exact
+            else:
+                assert got < cutoff
+
+
+def test_sequencematcher_backend_is_the_historical_ratio():
+    for a, b in _random_pairs(3, 100, max_len=400):
+        assert SequenceMatcherBackend().ratio(a, b) == SequenceMatcher(None, a, b).ratio()
+
+
+def test_levenshtein_is_stable_on_long_texts():
+    # autojunk drops frequent chars of 200+ char texts; one typo then tanks the ratio
+    text = "buy now and save on the new collection today " * 6
+    typo = text[:10] + text[11:]
+    assert SequenceMatcher(None, typo, text).ratio() < 0.5
+    assert LevenshteinBackend().ratio(typo, text) > 0.99
+
+
+def test_backend_selection_from_env():
+    assert isinstance(backend_from_env({}), SequenceMatcherBackend)
+    assert isinstance(backend_from_env({"SIMILARITY_BACKEND": "Levenshtein"}), LevenshteinBackend)
+    with pytest.raises(ValueError):
+        backend_from_env({"SIMILARITY_BACKEND": "jaro"})
+
+
+def test_matcher_uses_active_backend():
+    cands = fixtures.candidates(10)
+    ocr = fixtures.ocr_for(cands, 4)
+    set_similarity_backend(LevenshteinBackend())
+    try:
+        assert get_similarity_backend().name == "levenshtein"
+        result = select_best_section(
+            ocr_text=ocr,
+            candidates=cands,
+            normalize_strict_fn=normalize_strict_cached,
+            normalize_soft_fn=normalize_soft_cached,
+        )
+    finally:
+        set_similarity_backend(None)
+    assert result.chosen_section is cands[4]
+    assert get_similarity_backend().name == "sequencematcher"
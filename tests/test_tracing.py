@@ -0,0 +1,60 @@
+"""
+Tests for nested timing spans.
+"""
+
+from shared.tracing import Trace, _NOOP_SPAN, current_trace, span, traced
+
+
+@traced("work")
+def _work():
+    with span("inner"):
+        return 42
+
+
+def test_span_outside_trace_is_noop():
+    assert span("anything") is _NOOP_SPAN
+    assert current_trace() is None
+    assert _work() == 42
+
+
+def test_nested_spans_aggregate_by_path():
+    trace = Trace("job")
+    with trace:
+        for _ in range(3):
+            _work()
+        with span("download"):
+            pass
+
+    summary = trace.summary()
+
+    assert summary["total_ms"] >= 0
+    assert summary["spans"]["job/work"]["count"] == 3
+    assert summary["spans"]["job/work/inner"]["count"] == 3
+    assert summary["spans"]["job/download"]["count"] == 1
+    assert "job" not in summary["spans"]
+
+
+def test_errors_are_counted_and_propagate():
+    trace = Trace("job")
+    try:
+        with trace:
+            with span("boom"):
+                raise RuntimeError("x")
+    except RuntimeError:
+        pass
+
+    assert trace.summary()["spans"]["job/boom"]["errors"] == 1
+
+
+def test_otel_spans_keep_parent_links():
+    trace = Trace("job", record_spans=True, attributes={"job_id": "j1"})
+    with trace:
+        _work()
+
+    spans = {s["attributes"]["ocr.span_path"]: s for s in trace.otel_spans()}
+
+    assert spans["job/work/inner"]["parentSpanId"] == spans["job/work"]["spanId"]
+    assert spans["job/work"]["parentSpanId"] == spans["job"]["spanId"]
+    assert spans["job"]["parentSpanId"] == ""
+    assert all(s["traceId"] == trace.trace_id for s in spans.values())
+    assert spans["job"]["startTimeUnixNano"] <= spans["job/work"]["startTimeUnixNano"]
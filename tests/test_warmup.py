@@ -0,0 +1,60 @@
+"""
+Tests for the worker warm-up (startup hook + /warmup probe).
+"""
+
+from fastapi.testclient import TestClient
+
+from loadtest.cloud_fakes import CloudFakes
+from shared.docx_section_extractor import extract_section_candidates
+from shared.ocr_backends import FakeOcrBackend, set_ocr_backend
+from worker.warmup import WarmupState, run_warmup, tiny_docx
+
+
+def test_embedded_docx_covers_paragraphs_and_tables():
+    candidates = extract_section_candidates(tiny_docx(), "warmup_(en).docx", "en")
+
+    assert [c.section_name for c in candidates] == ["BANNER", "EMAIL"]
+
+
+def test_failed_optional_step_keeps_instance_ready():
+    def broken():
+        raise RuntimeError("no credentials")
+
+    report = run_warmup([("matching", lambda: None, True), ("ocr_client", broken, False)])
+
+    assert report["ok"] is True
+    assert report["steps"]["ocr_client"]["ok"] is False
+    assert "no credentials" in report["steps"]["ocr_client"]["error"]
+
+
+def test_failed_required_step_is_retried():
+    calls = []
+
+    def runner():
+        calls.append(1)
+        return {"ok": len(calls) > 1, "steps": {}, "total_ms": 0.0}
+
+    state = WarmupState(runner)
+
+    assert state.ensure()["ok"] is False
+    assert state.ensure()["ok"] is True
+    assert state.ensure()["ok"] is True
+    assert len(calls) == 2
+
+
+def test_warmup_endpoint_reports_timings():
+    CloudFakes().install()
+    set_ocr_backend(FakeOcrBackend())
+    try:
+        import worker.main as worker_main
+
+        with TestClient(worker_main.app) as client:
+            resp = client.get("/warmup")
+    finally:
+        set_ocr_backend(None)
+
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["ok"] is True
+    assert set(body["steps"]) == {"matching", "ocr_client", "cloud_clients"}
+    assert body["total_ms"] >= 0
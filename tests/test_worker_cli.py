@@ -0,0 +1,65 @@
+"""
+Tests for the bulk CLI (python -m worker.cli).
+"""
+
+import json
+
+from loadtest.cloud_fakes import CloudFakes
+from loadtest.synth import build_campaign_zip
+from shared.ocr_backends import FakeOcrBackend, set_ocr_backend
+from worker import cli
+
+
+def _campaigns(directory, count=3, images=6):
+    for i in range(count):
+        campaign = build_campaign_zip(seed=i, images=images, languages=["en", "de"])
+        (directory / f"campaign_{i}.zip").write_bytes(campaign.zip_bytes)
+
+
+def test_directory_of_archives_with_ocr_cache(tmp_path, monkeypatch, capsys):
+    src, out, cache = tmp_path / "zips", tmp_path / "out", tmp_path / "ocr_cache"
+    (src / "nested").mkdir(parents=True)
+    _campaigns(src)
+    (src / "nested" / "broken.zip").write_bytes(b"not a zip")
+    monkeypatch.setenv("OCR_BACKEND", "fake")
+
+    argv = [str(src), "--out", str(out), "--archives", "2", "--ocr-concurrency", "4", "--cpu-workers", "0",
+            "--ocr-cache", str(cache), "--json"]
+    assert cli.main(argv) == 1  # broken.zip fails, the others are processed
+    report = json.loads(capsys.readouterr().out)
+    assert report["archives"] == {"total": 4, "ok": 3, "failed": 1, "skipped": 0}
+    assert report["images"] == 18
+    assert {"archive/unzip", "archive/ocr"} <= set(report["stages"])
+
+    lines = (out / "campaign_1.ndjson").read_text().splitlines()
+    assert len(lines) == 6
+    assert [json.loads(line)["image"] for line in lines] == sorted(json.loads(line)["image"] for line in lines)
+    assert not (out / "nested__broken.ndjson").exists()
+    assert not list(out.glob("*.part"))
+
+    # second run: every OCR call is served from the cache, so a failing backend does not matter
+    monkeypatch.setenv("OCR_FAKE_ERROR_RATE", "1")
+    (out / "campaign_1.ndjson").unlink()
+    assert cli.main(argv[:-1] + ["--skip-existing"]) == 1
+    text = capsys.readouterr().out
+    assert "archives: 1 ok, 1 failed, 2 skipped of 4" in text
+    assert len((out / "campaign_1.ndjson").read_text().splitlines()) == 6
+
+
+def test_storage_prefix(tmp_path):
+    fakes = CloudFakes()
+    fakes.install()
+    bucket = fakes.storage.bucket("uploads")
+    for job in ("a", "b"):
+        campaign = build_campaign_zip(seed=3, images=4, languages=["en"])
+        bucket.blob(f"jobs/{job}/input.zip").upload_from_string(campaign.zip_bytes)
+    bucket.blob("jobs/a/manifest.json").upload_from_string("{}")
+
+    set_ocr_backend(FakeOcrBackend())
+    try:
+        report = cli.run(["gs://uploads/jobs/"], str(tmp_path))
+    finally:
+        set_ocr_backend(None)
+    assert report["archives"]["ok"] == 2
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["a__input.ndjson", "b__input.ndjson"]
+    assert "archive/download" in report["stages"]
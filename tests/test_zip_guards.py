@@ -0,0 +1,164 @@
+"""
+Tests for archive resource guards (entry count, inflated size, compression ratio, DOCX XML size).
+"""
+
+import io
+import os
+import shutil
+import struct
+import tracemalloc
+import zipfile
+
+import pytest
+
+from loadtest.cloud_fakes import CloudFakes
+from loadtest.harness import _push_envelope
+from loadtest.synth import build_campaign_zip
+from shared.ocr_backends import make_fake_png
+from zip_processor import ArchiveLimitError, ArchiveLimits, check_docx_limits, parse_zip_streaming
+
+_MiB = 1024 * 1024
+
+
+def _bomb_zip(path, size=64 * _MiB):
+    """64 MiB of zeros deflated to ~64 KiB (about 1000:1)."""
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("images/ok_(en).png", make_fake_png("Buy now"))
+        with zf.open("images/bomb_(en).png", "w", force_zip64=True) as dst:
+            block = b"\0" * _MiB
+            for _ in range(size // _MiB):
+                dst.write(block)
+    return str(path)
+
+
+def _docx_bytes(xml_size):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("[Content_Types].xml", "<Types/>")
+        body = "<w:p><w:r><w:t>Jetzt kaufen</w:t></w:r></w:p>" * (xml_size // 44 + 1)
+        zf.writestr("word/document.xml", f"<w:document><w:body>{body}</w:body></w:document>")
+    return buf.getvalue()
+
+
+def test_entry_count_is_checked_before_reading_the_directory(tmp_path):
+    path = tmp_path / "many.zip"
+    with zipfile.ZipFile(path, "w") as zf:
+        for i in range(3000):
+            zf.writestr(f"images/{i}.png", b"")
+    with pytest.raises(ArchiveLimitError) as err:
+        parse_zip_streaming(str(path), limits=ArchiveLimits(max_entries=1000))
+    assert err.value.reason == "entries"
+    assert "3000 entries" in str(err.value)
+
+
+def test_entry_count_is_found_behind_an_archive_comment(tmp_path):
+    path = tmp_path / "commented.zip"
+    with zipfile.ZipFile(path, "w") as zf:
+        for i in range(5):
+            zf.writestr(f"images/{i}.png", b"")
+        zf.comment = b"PK comment " * 1000
+    with pytest.raises(ArchiveLimitError) as err:
+        parse_zip_streaming(str(path), limits=ArchiveLimits(max_entries=4))
+    assert "5 entries" in str(err.value)
+    matches, work_dir = parse_zip_streaming(str(path), return_work_dir=True, limits=ArchiveLimits(max_entries=5))
+    shutil.rmtree(work_dir, ignore_errors=True)
+    assert len(matches) == 5
+
+
+def test_entry_count_follows_the_zip64_locator(tmp_path):
+    # The 16-bit EOCD field is saturated; the real count sits in the ZIP64 record
+    zip64 = struct.pack("<4sQ2H2L4Q", b"PK\x06\x06", 44, 45, 45, 0, 0, 70000, 70000, 0, 0)
+    locator = struct.pack("<4sLQL", b"PK\x06\x07", 0, 0, 1)
+    eocd = struct.pack("<4s4H2LH", b"PK\x05\x06", 0, 0, 0xFFFF, 0xFFFF, 0xFFFFFFFF, 0xFFFFFFFF, 0)
+    path = tmp_path / "zip64.zip"
+    path.write_bytes(zip64 + locator + eocd)
+    with pytest.raises(ArchiveLimitError) as err:
+        parse_zip_streaming(str(path), limits=ArchiveLimits(max_entries=20000))
+    assert err.value.reason == "entries"
+    assert "70000 entries" in str(err.value)
+
+
+def test_ratio_bomb_stops_early_with_bounded_memory(tmp_path):
+    path = _bomb_zip(tmp_path / "bomb.zip")
+    assert os.path.getsize(path) < _MiB
+    tracemalloc.start()
+    try:
+        with pytest.raises(ArchiveLimitError) as err:
+            parse_zip_streaming(path, limits=ArchiveLimits(max_ratio=100))
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert err.value.reason == "compression_ratio"
+    assert "images/bomb_(en).png" in str(err.value)
+    assert peak < 8 * _MiB
+
+
+def test_total_uncompressed_bytes(tmp_path):
+    path = tmp_path / "big.zip"
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_STORED) as zf:
+        for i in range(4):
+            zf.writestr(f"images/{i}_(en).png", os.urandom(_MiB))
+    with pytest.raises(ArchiveLimitError) as err:
+        parse_zip_streaming(str(path), limits=ArchiveLimits(max_uncompressed_bytes=3 * _MiB))
+    assert err.value.reason == "uncompressed_bytes"
+    # within the limit the archive is extracted as before
+    matches = parse_zip_streaming(str(path), limits=ArchiveLimits(max_uncompressed_bytes=5 * _MiB))
+    assert len(matches) == 4
+
+
+def test_docx_xml_size(tmp_path):
+    docx = _docx_bytes(4 * _MiB)
+    with pytest.raises(ArchiveLimitError) as err:
+        check_docx_limits(docx, "texts/c_(en).docx", ArchiveLimits(max_docx_xml_bytes=2 * _MiB))
+    assert err.value.reason == "docx_xml_bytes"
+    check_docx_limits(docx, "texts/c_(en).docx", ArchiveLimits(max_docx_xml_bytes=8 * _MiB))
+
+    path = tmp_path / "docx.zip"
+    with zipfile.ZipFile(path, "w") as zf:
+        zf.writestr("images/a_(en).png", make_fake_png("Jetzt kaufen"))
+        zf.writestr("texts/c_(en).docx", docx)
+    with pytest.raises(ArchiveLimitError):
+        parse_zip_streaming(str(path), limits=ArchiveLimits(max_docx_xml_bytes=2 * _MiB))
+
+
+def test_worker_fails_bomb_jobs_with_the_reason(tmp_path, monkeypatch):
+    import worker.main as worker_main
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    from app.jobs_api import router
+
+    monkeypatch.setenv("ZIP_MAX_RATIO", "100")
+    fakes = CloudFakes()
+    fakes.install()
+    checker = FastAPI()
+    checker.include_router(router)
+    checker, worker = TestClient(checker), TestClient(worker_main.app)
+
+    with open(_bomb_zip(tmp_path / "bomb.zip"), "rb") as f:
+        job_id = checker.post("/jobs", files={"zip_file": ("bomb.zip", f.read(), "application/zip")}).json()["job_id"]
+    _, data, attrs = fakes.publisher.pop()
+
+    assert worker.post("/pubsub/push", json=_push_envelope(data, attrs["message_id"])).status_code == 200
+
+    job = fakes.firestore.collection("jobs").document(job_id).get().to_dict()
+    assert job["status"] == "FAILED"
+    assert "compression ratio above 100:1" in job["error"]
+
+
+def test_regular_campaigns_pass_the_default_limits(tmp_path):
+    campaign = build_campaign_zip(seed=2, images=5, languages=["en", "de"])
+    path = tmp_path / "campaign.zip"
+    path.write_bytes(campaign.zip_bytes)
+    assert len(parse_zip_streaming(str(path))) == 5
+
+
+def test_sync_ui_rejects_bombs_with_413(tmp_path):
+    from fastapi.testclient import TestClient
+
+    import app.main as checker_main
+
+    with open(_bomb_zip(tmp_path / "bomb.zip"), "rb") as f:
+        resp = TestClient(checker_main.app).post("/", files={"zip_file": ("bomb.zip", f.read(), "application/zip")})
+    assert resp.status_code == 413
+    assert "compression ratio" in resp.json()["detail"]
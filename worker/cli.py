@@ -0,0 +1,250 @@
+"""
+Bulk processing of campaign archives without Pub/Sub (backfills, QA).
+
+    python -m worker.cli campaigns/ --out results/
+    python -m worker.cli gs://bucket/jobs/ --out results/ --archives 4 --ocr-concurrency 16 --cpu-workers 4
+    python -m worker.cli campaigns/ --out results/ --ocr-cache .ocr_cache --json
+
+Every archive goes through the worker's own pipeline: parse_zip_streaming,
+then worker.main._iter_checked (OCR through the shared FairScheduler, DOCX
+parsing and select_best_sections_batch through the CpuPool). Its results are
+written to <out>/<archive name>.ndjson in archive order. There is no sampling
+and no Firestore: every image is checked and nothing is stored outside --out.
+
+Parallelism:
+    --archives         archives in flight at once (threads)
+    --ocr-concurrency  OCR slots shared by all archives (FairScheduler, default OCR_CONCURRENCY)
+    --cpu-workers      processes for DOCX parsing / matching (CpuPool, default CPU_POOL_WORKERS; 0/1 = in-thread)
+
+The OCR backend comes from OCR_BACKEND as in the worker; --ocr-cache DIR wraps
+it in the read-through cache (RecordReplayOcrBackend, mode "cache"), so a
+re-run over the same images does not call OCR again.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from shared.cloud_clients import get_storage
+from shared.cpu_pool import CpuPool, get_cpu_pool, set_cpu_pool
+from shared.export import ndjson_chunks
+from shared.ocr_backends import RecordReplayOcrBackend, backend_from_env, set_ocr_backend
+from shared.result_sink import ResultAggregates
+from shared.scheduler import FairScheduler, get_scheduler, set_scheduler
+from shared.tracing import Trace, span
+from worker.main import _iter_checked
+from zip_processor import parse_zip_streaming
+
+
+@dataclass
+class ArchiveReport:
+    archive: str
+    output: str
+    bytes: int = 0
+    images: int = 0
+    summary: Dict[str, int] = field(default_factory=dict)
+    seconds: float = 0.0
+    skipped: bool = False
+    error: Optional[str] = None
+    timings: Dict[str, Any] = field(default_factory=dict)
+
+
+def list_archives(source: str) -> List[Tuple[str, str]]:
+    """(location, output name) of every .zip in a directory, a single file, or a gs://bucket/prefix."""
+    if source.startswith("gs://"):
+        bucket, _, prefix = source[len("gs://"):].partition("/")
+        names = [b.name for b in get_storage().list_blobs(bucket, prefix=prefix) if b.name.endswith(".zip")]
+        # jobs/<id>/input.zip: имя файла не уникально, берём путь относительно префикса
+        return [(f"gs://{bucket}/{name}", _output_name(name[len(prefix):])) for name in sorted(names)]
+    path = Path(source)
+    if path.is_file():
+        return [(str(path), _output_name(path.name))]
+    return [(str(p), _output_name(p.relative_to(path).as_posix())) for p in sorted(path.rglob("*.zip"))]
+
+
+def _output_name(relative: str) -> str:
+    return relative.strip("/").rsplit(".", 1)[0].replace("/", "__") + ".ndjson"
+
+
+def _local_copy(location: str) -> Tuple[str, Optional[str]]:
+    """(zip path, temp file to remove) — archives in storage are downloaded first."""
+    if not location.startswith("gs://"):
+        return location, None
+    bucket, _, name = location[len("gs://"):].partition("/")
+    with span("download"):
+        with tempfile.NamedTemporaryFile(delete=False, suffix=".zip") as tmp:
+            get_storage().bucket(bucket).blob(name).download_to_file(tmp)
+    return tmp.name, tmp.name
+
+
+def process_archive(
+    location: str,
+    output: Path,
+    section_number: Optional[str] = None,
+    section_name: Optional[str] = None,
+) -> ArchiveReport:
+    """Check one archive with the worker pipeline and write its results as NDJSON."""
+    report = ArchiveReport(archive=location, output=str(output))
+    aggregates = ResultAggregates()
+    trace = Trace("archive")
+    started = time.perf_counter()
+    tmp_zip = work_dir = None
+    partial = output.with_name(output.name + ".part")
+    try:
+        with trace:
+            zip_path, tmp_zip = _local_copy(location)
+            report.bytes = os.path.getsize(zip_path)
+            matches, work_dir = parse_zip_streaming(zip_path, return_work_dir=True, return_extended=True)
+            report.images = len(matches)
+
+            def rows():
+                for result in _iter_checked(matches, section_number, section_name, None, ocr):
+                    aggregates.add(result)
+                    yield result
+
+            # Файл появляется под своим именем только целиком (важно для --skip-existing)
+            with get_scheduler().job(location, len(matches)) as ocr, open(partial, "wb") as out:
+                for chunk in ndjson_chunks(rows()):
+                    out.write(chunk)
+            os.replace(partial, output)
+    except Exception as e:
+        report.error = f"{type(e).__name__}: {e}"
+        if partial.exists():
+            partial.unlink()
+    finally:
+        if tmp_zip and os.path.exists(tmp_zip):
+            os.remove(tmp_zip)
+        if work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    report.summary = aggregates.to_dict()
+    report.seconds = round(time.perf_counter() - started, 3)
+    report.timings = trace.summary()["spans"]
+    return report
+
+
+def merge_timings(reports: List[ArchiveReport]) -> Dict[str, Dict[str, float]]:
+    """Per-stage totals over all archives (time summed across threads, so it can exceed wall time)."""
+    stages: Dict[str, Dict[str, float]] = {}
+    for report in reports:
+        for path, stats in report.timings.items():
+            stage = stages.setdefault(path, {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+            stage["count"] += stats["count"]
+            stage["total_ms"] = round(stage["total_ms"] + stats["total_ms"], 3)
+            stage["max_ms"] = max(stage["max_ms"], stats["max_ms"])
+    return dict(sorted(stages.items()))
+
+
+def run(
+    sources: List[str],
+    out_dir: str,
+    *,
+    archives: int = 1,
+    section_number: Optional[str] = None,
+    section_name: Optional[str] = None,
+    skip_existing: bool = False,
+) -> Dict[str, Any]:
+    """Process every archive under `sources`; returns per-archive reports plus throughput and stage timings."""
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    todo = [(location, out / name) for source in sources for location, name in list_archives(source)]
+
+    def one(item: Tuple[str, Path]) -> ArchiveReport:
+        location, output = item
+        if skip_existing and output.exists():
+            return ArchiveReport(archive=location, output=str(output), skipped=True)
+        return process_archive(location, output, section_number, section_name)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, archives), thread_name_prefix="bulk-archive") as pool:
+        reports = list(pool.map(one, todo))
+    wall = time.perf_counter() - started
+
+    done = [r for r in reports if not r.skipped and r.error is None]
+    images = sum(r.summary.get("total", 0) for r in done)
+    read = sum(r.bytes for r in done)
+    return {
+        "archives": {
+            "total": len(reports),
+            "ok": len(done),
+            "failed": sum(r.error is not None for r in reports),
+            "skipped": sum(r.skipped for r in reports),
+        },
+        "images": images,
+        "wall_s": round(wall, 3),
+        "images_per_s": round(images / wall, 2) if wall > 0 else None,
+        "mib_per_s": round(read / 2**20 / wall, 2) if wall > 0 else None,
+        "stages": merge_timings(done),
+        "reports": [asdict(r) for r in reports],
+    }
+
+
+def _print_report(report: Dict[str, Any]) -> None:
+    counts = report["archives"]
+    print(
+        f"archives: {counts['ok']} ok, {counts['failed']} failed, {counts['skipped']} skipped "
+        f"of {counts['total']} in {report['wall_s']:.1f} s"
+    )
+    print(f"images:   {report['images']} ({report['images_per_s']} images/s, {report['mib_per_s']} MiB/s read)")
+    if report["stages"]:
+        print(f"\n{'stage (summed over threads)':<34}{'count':>8}{'total_s':>10}{'mean_ms':>10}{'max_ms':>10}")
+        for path, stats in report["stages"].items():
+            mean = stats["total_ms"] / stats["count"] if stats["count"] else 0.0
+            print(f"{path:<34}{stats['count']:>8}{stats['total_ms'] / 1000:>10.2f}{mean:>10.1f}{stats['max_ms']:>10.1f}")
+    for r in report["reports"]:
+        if r["error"]:
+            print(f"FAILED {r['archive']}: {r['error']}", file=sys.stderr)
+
+
+def main(argv=None) -> int:
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("sources", nargs="+", help="directories / .zip files / gs://bucket/prefix")
+    p.add_argument("--out", required=True, help="directory for <archive>.ndjson results")
+    p.add_argument("--archives", type=int, default=1, help="archives processed concurrently")
+    p.add_argument("--ocr-concurrency", type=int, default=None, help="OCR slots shared by all archives")
+    p.add_argument("--cpu-workers", type=int, default=None, help="processes for DOCX parsing / matching")
+    p.add_argument("--ocr-cache", default=None, help="directory of the read-through OCR cache")
+    p.add_argument("--section-number", default=None)
+    p.add_argument("--section-name", default=None)
+    p.add_argument("--skip-existing", action="store_true", help="skip archives whose results already exist")
+    p.add_argument("--json", action="store_true", help="print the full report as JSON")
+    args = p.parse_args(argv)
+
+    if args.ocr_concurrency is not None:
+        set_scheduler(FairScheduler(slots=args.ocr_concurrency))
+    if args.cpu_workers is not None:
+        set_cpu_pool(CpuPool(workers=args.cpu_workers))
+    if args.ocr_cache:
+        set_ocr_backend(RecordReplayOcrBackend(args.ocr_cache, mode="cache", inner=backend_from_env()))
+    try:
+        get_cpu_pool().start()
+        report = run(
+            args.sources, args.out,
+            archives=args.archives,
+            section_number=args.section_number,
+            section_name=args.section_name,
+            skip_existing=args.skip_existing,
+        )
+    finally:
+        set_scheduler(None)
+        set_cpu_pool(None)
+        set_ocr_backend(None)
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        _print_report(report)
+    return 1 if report["archives"]["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,31 +1,311 @@
+import asyncio
 import base64
+import hashlib
 import json
 import os
 import tempfile
 import shutil
+from contextlib import closing, nullcontext
 
 from fastapi import FastAPI, Request, HTTPException
-from google.cloud import firestore
-from google.cloud import storage
+from fastapi.responses import JSONResponse
 
 from zip_processor import parse_zip_streaming
 from app.ocr import process_image
-from worker.normalization import normalize_strict, normalize_soft
-from shared.docx_section_extractor import extract_section_candidates
-from shared.reference_matcher import select_best_section
+from worker.normalization import normalize_soft_cached, normalize_strict_cached
+from shared.cancellation import CancelToken, JobCancelled
+from shared.candidate_index import build_candidate_index
+from shared.cloud_clients import get_firestore, get_storage
+from shared.cpu_pool import get_cpu_pool
+from shared.metrics import BYTES_DOWNLOADED, IMAGES_PROCESSED, IN_FLIGHT, JOBS_TOTAL, metrics_response
+from shared.reference_store import load_candidates
+from shared.manifest import build_manifest, iter_reused, load_manifest, reuse_plan, save_manifest
+from shared.result_blob import BlobResultSink, open_result_blob
+from shared.result_sink import FirestoreResultSink, iter_job_results
+from shared.sampling import SamplingConfig, sample_into
+from shared.scheduler import get_scheduler, set_scheduler
+from shared.selection_cache import select_with_cache
+from shared.tracing import Trace, export_to_opentelemetry, otel_export_enabled, span, tracing_enabled
+from worker.warmup import WarmupState, warmup_enabled
 
-GCP_PROJECT_ID = "project-d245d8c8-8548-47d2-a04"
 UPLOAD_BUCKET = "ocr-checker-uploads-1018698441568"
 
-db = firestore.Client(project=GCP_PROJECT_ID)
-gcs = storage.Client(project=GCP_PROJECT_ID)
+# Картинок на один проход OCR + пакетного матчинга (ограничивает память на OCR-тексты)
+CHECK_CHUNK = int(os.environ.get("CHECK_CHUNK", "64"))
+# С этого числа результатов они пишутся одним сжатым blob'ом в GCS, а не документами Firestore
+RESULTS_BLOB_MIN_RESULTS = int(os.environ.get("RESULTS_BLOB_MIN_RESULTS", "500"))
 
 app = FastAPI()
 
+warmup_state = WarmupState()
+
+
+@app.on_event("startup")
+async def _startup_warmup():
+    # Прогрев до первого job: импорты python-docx/lxml, клиенты Vision/Firestore/GCS, матчинг
+    if warmup_enabled():
+        report = await asyncio.to_thread(warmup_state.ensure)
+        print("WORKER_WARMUP=" + json.dumps(report, ensure_ascii=False))
+        # Поднимаем процессы пула заранее, чтобы первый большой DOCX не ждал их старта
+        await asyncio.to_thread(get_cpu_pool().start)
+
+
+@app.on_event("shutdown")
+def _shutdown_cpu_pool():
+    get_cpu_pool().shutdown()
+    set_scheduler(None)
+
+
+@app.get("/warmup")
+async def warmup():
+    """Startup probe: 200 once the instance is warm, 503 if a required step failed."""
+    report = await asyncio.to_thread(warmup_state.ensure)
+    return JSONResponse(report, status_code=200 if report["ok"] else 503)
+
 
 def _update_job(job_id: str, **fields):
+    from google.cloud import firestore
+
     fields["updated_at"] = firestore.SERVER_TIMESTAMP
-    db.collection("jobs").document(job_id).update(fields)
+    get_firestore().collection("jobs").document(job_id).update(fields)
+
+
+def _outcome(result: dict) -> str:
+    manual = result.get("selection", {}).get("manual_required", False)
+    return "pass" if result["match"] and not manual else "manual"
+
+
+def _ocr_file(img_file_path, cancel=None):
+    """OCR one image file; None if the job was cancelled before the call."""
+    # Checkpoint между картинками: после отмены Vision больше не вызывается
+    if cancel is not None and cancel.cancelled:
+        return None
+    with span("read_image"):
+        with open(img_file_path, "rb") as f:
+            img_bytes = f.read()
+    return process_image(img_bytes)
+
+
+def _check_images(matches, section_number, section_name, references=None, cancel=None, ocr=None) -> dict:
+    """OCR each image and compare it with the best matching reference section.
+
+    With an `ocr` job queue (shared.scheduler) the OCR calls run on the shared
+    pool, interleaved with other jobs; otherwise one by one in this thread.
+    With a `cancel` token, images not yet OCR'd at cancellation are dropped
+    (fewer results than `matches`).
+    """
+    results = {}
+    if references is None:
+        references = {}  # (sha256, filename, language) -> (candidates, candidate_index)
+    checked = []  # (img_path, ocr_text, ref_text, ref_key)
+    for img_path, img_file_path, ref_text, ref_bytes, language in matches:
+        if cancel is not None and cancel.cancelled:
+            break
+
+        # 1. Extract OCR text (в пуле — Future, результат забираем после разбора референсов)
+        ocr_text = ocr.submit(_ocr_file, img_file_path, cancel) if ocr is not None else _ocr_file(img_file_path, cancel)
+        
+        # Derive DOCX filename from img_path (texts/banner_01_(en).docx)
+        # img_path format: "images/banner_01_(en).png"
+        # ref_path format: "texts/banner_01_(en).docx"
+        ref_path = img_path.replace("images/", "texts/").rsplit(".", 1)[0]
+        # Try common extensions
+        for ext in [".docx", ".txt"]:
+            potential_ref = ref_path + ext
+            # Check if this matches any key in original texts dict
+            # Since we don't have direct access, use img_path stem as fallback
+            break
+        docx_filename = os.path.basename(ref_path + ".docx")
+        
+        # 2. Extract section candidates from reference DOCX (once per distinct DOCX in the job)
+        ref_key = None
+        if ref_bytes and ref_bytes[:2] == b'PK':  # Check if it's a ZIP/DOCX
+            ref_key = (hashlib.sha256(ref_bytes).hexdigest(), docx_filename, language)
+            if ref_key not in references:
+                try:
+                    parsed = load_candidates(
+                        ref_bytes, docx_filename, language,
+                        extract=get_cpu_pool().parse_reference, docx_sha256=ref_key[0],
+                    )
+                    references[ref_key] = (parsed, build_candidate_index(parsed, normalize_soft_cached))
+                except Exception as e:
+                    print(f"Warning: Failed to extract sections from {docx_filename}: {e}")
+                    references[ref_key] = ([], None)
+        checked.append((img_path, ocr_text, ref_text, ref_key))
+    if ocr is not None:
+        checked = [(img_path, future.result(), ref_text, ref_key) for img_path, future, ref_text, ref_key in checked]
+    checked = [c for c in checked if c[1] is not None]  # None: отменено до вызова OCR
+    
+    # 3. Select best sections: one batched call per reference document
+    by_reference = {}
+    for pos, (_, _, _, ref_key) in enumerate(checked):
+        if ref_key is not None and references[ref_key][0]:
+            by_reference.setdefault(ref_key, []).append(pos)
+    selections = {}
+    for ref_key, positions in by_reference.items():
+        candidates, candidate_index = references[ref_key]
+        # Решения, уже принятые для того же OCR-текста и DOCX (в этом или прошлых job'ах), не пересчитываются
+        batch = select_with_cache(
+            [checked[pos][1] for pos in positions],
+            candidates,
+            lambda texts: get_cpu_pool().select_batch(
+                ocr_texts=texts,
+                candidates=candidates,
+                section_number=section_number,
+                section_name=section_name,
+                candidate_index=candidate_index,
+            ),
+            docx_sha256=ref_key[0],
+            language=ref_key[2],
+            section_number=section_number,
+            section_name=section_name,
+        )
+        selections.update(zip(positions, batch))
+    
+    for pos, (img_path, ocr_text, ref_text, _) in enumerate(checked):
+        selection = selections.get(pos)
+        if selection is not None:
+            selected_ref_text = selection.chosen_text
+            is_match = normalize_strict_cached(ocr_text) == normalize_strict_cached(selected_ref_text)
+            
+            results[img_path] = {
+                "image": img_path,
+                "reference": selected_ref_text,
+                "ocr": ocr_text,
+                "match": is_match,
+                "selection": selection.to_dict(),  # Add selection metadata
+            }
+        else:
+            # Fallback to old behavior (full ref_text comparison)
+            is_match = normalize_strict_cached(ocr_text) == normalize_strict_cached(ref_text)
+            
+            results[img_path] = {
+                "image": img_path,
+                "reference": ref_text,
+                "ocr": ocr_text,
+                "match": is_match,
+                "selection": {
+                    "warnings": ["No candidates extracted, using full text"],
+                    "manual_required": False,
+                },
+            }
+        IMAGES_PROCESSED.labels(outcome=_outcome(results[img_path])).inc()
+    return results
+
+
+def _iter_checked(matches, section_number, section_name, cancel=None, ocr=None):
+    """_check_images chunk by chunk, so only one chunk's OCR texts are held at a time."""
+    references = {}  # разобранные DOCX переиспользуются между чанками
+    for start in range(0, len(matches), CHECK_CHUNK):
+        # Checkpoint перед каждым OCR-чанком
+        if cancel is not None:
+            cancel.check()
+        chunk = matches[start:start + CHECK_CHUNK]
+        results = _check_images(chunk, section_number, section_name, references, cancel, ocr)
+        # Уже распознанные картинки чанка сохраняются, остальные отменены
+        yield from results.values()
+        if len(results) < len(chunk):
+            raise JobCancelled(cancel.job_id)
+
+
+def _open_base_job(bucket, base_job_id):
+    """(manifest, lazily read per-image results) of a previous job, or (None, ()) if it can't be reused."""
+    doc = get_firestore().collection("jobs").document(base_job_id).get()
+    data = doc.to_dict() if doc.exists else None
+    if not data or data.get("status") != "DONE":
+        return None, ()
+    manifest = load_manifest(bucket, base_job_id)
+    if manifest is None:
+        return None, ()
+    stored = data.get("result") or {}
+    if stored.get("results_blob"):
+        rows = open_result_blob(stored["results_blob"]).iter_rows()
+    elif stored.get("results") is not None:
+        rows = stored["results"].values()
+    else:
+        rows = iter_job_results(base_job_id)
+    return manifest, rows
+
+
+def _run_job(job_id, bucket, matches, section_number, section_name, sampling, base_job_id=None, cancel=None) -> dict:
+    """Check a job's images, reusing the base job's results for unchanged content.
+
+    Raises JobCancelled (with the partial result) if `cancel` fires mid-job.
+    """
+    with span("manifest"):
+        manifest = build_manifest(matches, section_number, section_name)
+        base_manifest, base_rows = _open_base_job(bucket, base_job_id) if base_job_id else (None, ())
+        reuse = reuse_plan(manifest, base_manifest)
+
+    # Бюджет OCR: стратифицированная выборка по языку/референсу (см. shared.sampling).
+    # Sink выбирается до чтения базовых результатов: reuse — верхняя граница переиспользованного;
+    # при возможной эскалации считаем полное покрытие, а не бюджет
+    reusable = sum(len(paths) for paths in reuse.values())
+    planned = reusable + sampling.max_checked(len(matches) - reusable)
+
+    # Результаты пишутся в jobs/<id>/results по мере готовности; в памяти только агрегаты.
+    # Большие job'ы — одним сжатым колоночным blob'ом (в Firestore только summary и указатель)
+    order = {m[0]: pos for pos, m in enumerate(matches)}
+    if planned >= RESULTS_BLOB_MIN_RESULTS:
+        sink = BlobResultSink(job_id, bucket, order=order)
+    else:
+        sink = FirestoreResultSink(job_id, order=order)
+
+    # Sink закрывается при любом исходе: spool большого job'а лежит в /tmp (на Cloud Run это RAM)
+    with closing(sink):
+        # Базовые результаты читаются потоком прямо в sink: в памяти только пути переиспользованных картинок
+        reused = set()
+        if reuse:
+            with span("reuse"):
+                for result in iter_reused(reuse, base_manifest, base_rows):
+                    sink.write(result)
+                    reused.add(result["image"])
+        todo = {m[0] for m in matches} - reused
+        expected = len(todo) if sampling.budget <= 0 else min(len(todo), sampling.budget)
+
+        # OCR идёт через общий пул инстанса: чередуется с другими job'ами, маленькие — вперёд
+        try:
+            with get_scheduler().job(job_id, expected) as ocr:
+                plan = sample_into(
+                    [m for m in matches if m[0] in todo], sampling,
+                    lambda batch: _iter_checked(batch, section_number, section_name, cancel, ocr),
+                    sink,
+                )
+        except JobCancelled as e:
+            # Частичный результат: то, что успели проверить до отмены (manifest не сохраняем —
+            # отменённый job не может быть base job)
+            sink.flush()
+            e.partial = {"total": len(matches), "summary": sink.aggregates.to_dict(), "cancelled": True}
+            _attach_results(e.partial, sink)
+            raise
+        sink.flush()
+        save_manifest(bucket, job_id, manifest)
+
+        result = {
+            "total": len(matches),
+            "summary": sink.aggregates.to_dict(),
+            "sampling": plan.to_dict(),
+            "incremental": {
+                "base_job_id": base_job_id,
+                "reused": len(reused),
+                "recomputed": sink.aggregates.total - len(reused),
+            },
+        }
+        _attach_results(result, sink)
+        return result
+
+
+def _attach_results(result, sink):
+    # Маленькие job'ы по-прежнему отдают результаты прямо в документе job
+    if sink.inline_results is not None:
+        result["results"] = sink.inline_results
+    if isinstance(sink, BlobResultSink):
+        result["results_blob"] = sink.pointer
+
+
+@app.get("/metrics")
+def metrics():
+    return metrics_response()
 
 
 @app.post("/pubsub/push")
@@ -44,95 +324,67 @@ async def pubsub_push(request: Request):
     # Optional section hints from payload
     section_number = payload.get("section_number")
     section_name = payload.get("section_name")
+    sampling = SamplingConfig.from_env().with_overrides(payload)
+    base_job_id = payload.get("base_job_id")
 
-    _update_job(job_id, status="RUNNING", error=None)
+    trace = Trace("job", record_spans=otel_export_enabled(), attributes={"job_id": job_id}) if tracing_enabled() else None
 
     # gcs_uri: gs://bucket/path
     _, _, bucket_name, *obj_parts = gcs_uri.split("/")
     object_name = "/".join(obj_parts)
 
+    # Job отменили, пока он ждал в очереди: не скачиваем и не запускаем
+    cancel = CancelToken(job_id)
+    if cancel.cancelled:
+        _update_job(job_id, status="CANCELLED")
+        JOBS_TOTAL.labels(status="CANCELLED").inc()
+        return {"ok": True}
+
     tmp_zip = None
     work_dir = None
+    jobs_in_flight = IN_FLIGHT.labels(kind="jobs")
+    jobs_in_flight.inc()
 
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".zip") as tmp:
-            tmp_zip = tmp.name
-            gcs.bucket(bucket_name).blob(object_name).download_to_file(tmp)
+        with trace or nullcontext():
+            with span("firestore"):
+                _update_job(job_id, status="RUNNING", error=None)
+            JOBS_TOTAL.labels(status="RUNNING").inc()
 
-        # Use extended mode to get ref_bytes and language
-        matches, work_dir = parse_zip_streaming(tmp_zip, return_work_dir=True, return_extended=True)
+            try:
+                # Блокирующая работа (GCS, unzip, OCR, матчинг) идёт в потоке, не в event loop
+                with span("download"):
+                    with tempfile.NamedTemporaryFile(delete=False, suffix=".zip") as tmp:
+                        tmp_zip = tmp.name
+                        await asyncio.to_thread(get_storage().bucket(bucket_name).blob(object_name).download_to_file, tmp)
+                BYTES_DOWNLOADED.inc(os.path.getsize(tmp_zip))
+                cancel.check()
 
-        results = {}
-        for img_path, img_file_path, ref_text, ref_bytes, language in list(matches)[:10]:
-            with open(img_file_path, "rb") as f:
-                img_bytes = f.read()
+                # Use extended mode to get ref_bytes and language
+                matches, work_dir = await asyncio.to_thread(
+                    parse_zip_streaming, tmp_zip, return_work_dir=True, return_extended=True
+                )
 
-            # 1. Extract OCR text
-            ocr_text = process_image(img_bytes)
-            
-            # Derive DOCX filename from img_path (texts/banner_01_(en).docx)
-            # img_path format: "images/banner_01_(en).png"
-            # ref_path format: "texts/banner_01_(en).docx"
-            ref_path = img_path.replace("images/", "texts/").rsplit(".", 1)[0]
-            # Try common extensions
-            for ext in [".docx", ".txt"]:
-                potential_ref = ref_path + ext
-                # Check if this matches any key in original texts dict
-                # Since we don't have direct access, use img_path stem as fallback
-                break
-            docx_filename = os.path.basename(ref_path + ".docx")
-            
-            # 2. Extract section candidates from reference DOCX
-            candidates = []
-            if ref_bytes and ref_bytes[:2] == b'PK':  # Check if it's a ZIP/DOCX
-                try:
-                    candidates = extract_section_candidates(ref_bytes, docx_filename, language)
-                except Exception as e:
-                    print(f"Warning: Failed to extract sections from {docx_filename}: {e}")
-            
-            # 3. Select best section
-            if candidates:
-                selection = select_best_section(
-                    ocr_text=ocr_text,
-                    candidates=candidates,
-                    normalize_strict_fn=normalize_strict,
-                    normalize_soft_fn=normalize_soft,
-                    section_number=section_number,
-                    section_name=section_name,
+                result = await asyncio.to_thread(
+                    _run_job, job_id, get_storage().bucket(bucket_name), matches,
+                    section_number, section_name, sampling, base_job_id, cancel,
                 )
-                
-                selected_ref_text = selection.chosen_text
-                is_match = normalize_strict(ocr_text) == normalize_strict(selected_ref_text)
-                
-                results[img_path] = {
-                    "image": img_path,
-                    "reference": selected_ref_text,
-                    "ocr": ocr_text,
-                    "match": is_match,
-                    "selection": selection.to_dict(),  # Add selection metadata
-                }
-            else:
-                # Fallback to old behavior (full ref_text comparison)
-                is_match = normalize_strict(ocr_text) == normalize_strict(ref_text)
-                
-                results[img_path] = {
-                    "image": img_path,
-                    "reference": ref_text,
-                    "ocr": ocr_text,
-                    "match": is_match,
-                    "selection": {
-                        "warnings": ["No candidates extracted, using full text"],
-                        "manual_required": False,
-                    },
-                }
-
-        _update_job(job_id, status="DONE", result={"results": results, "total": len(matches)})
-        return {"ok": True}
+                final_fields = {"status": "DONE", "result": result}
+            except JobCancelled as e:
+                # Временные файлы удаляются в finally; результаты до отмены уже в jobs/<id>/results
+                final_fields = {"status": "CANCELLED", "result": e.partial}
+            except Exception as e:
+                final_fields = {"status": "FAILED", "error": str(e)}
 
-    except Exception as e:
-        _update_job(job_id, status="FAILED", error=str(e))
+        if trace is not None:
+            final_fields["timings"] = trace.summary()
+            if trace.record_spans:
+                export_to_opentelemetry(trace)
+        _update_job(job_id, **final_fields)
+        JOBS_TOTAL.labels(status=final_fields["status"]).inc()
         return {"ok": True}  # Pub/Sub: важно вернуть 2xx, иначе будут ретраи
     finally:
+        jobs_in_flight.dec()
         if tmp_zip and os.path.exists(tmp_zip):
             os.remove(tmp_zip)
         if work_dir:
@@ -9,7 +9,8 @@ from __future__ import annotations
 
 import re
 import unicodedata
-from typing import Final
+from functools import lru_cache
+from typing import Final, Iterable, List, Tuple, Union
 
 # Regex required by spec: "[ ]*\n+[ ]*" -> " "
 _NEWLINES_WITH_ASCII_SPACES_RE: Final[re.Pattern[str]] = re.compile(r"[ ]*\n+[ ]*", flags=re.UNICODE)
@@ -32,6 +33,19 @@ _QUOTES_MAP: Final[dict[str, str]] = {
     "\u201F": '"',  # DOUBLE HIGH-REVERSED-9 QUOTATION MARK
 }
 
+# Built once; str.maketrans used to be rebuilt on every map_quotes_to_ascii call.
+_QUOTES_TABLE: Final[dict[int, str]] = str.maketrans(_QUOTES_MAP)
+
+# Memo cache size (entries) for normalize_both / normalize_batch.
+NORMALIZE_CACHE_SIZE: Final[int] = 8192
+
+# Longer inputs bypass the memo cache so it can't pin large newsletters in memory.
+_MAX_CACHED_LEN: Final[int] = 10_000
+
+# Bump whenever normalize_strict / normalize_soft output can change; persisted
+# normalized forms (reference store) from another version are not reused.
+NORMALIZATION_VERSION: Final[str] = "1"
+
 
 def _rstrip_ascii_space_only(text: str) -> str:
     """Remove only trailing U+0020 ASCII spaces.
@@ -53,7 +67,7 @@ def map_quotes_to_ascii(text: str) -> str:
     if not text:
         return text
     # translate is deterministic and efficient
-    return text.translate(str.maketrans(_QUOTES_MAP))
+    return text.translate(_QUOTES_TABLE)
 
 
 def normalize_strict(text: str | None) -> str:
@@ -115,3 +129,97 @@ def normalize_soft(text: str | None) -> str:
     # Do not add extra stripping beyond what strict already performed.
     t = _WHITESPACE_RUN_RE.sub(" ", t)
     return t
+
+
+def _strict_uncached(text: str) -> str:
+    """normalize_strict for a str, with an ASCII fast path.
+
+    For pure-ASCII input NFC is the identity, casefold equals lower() and no
+    curly quotes can be present, so those steps are skipped. Steps 2-5 are
+    identical to normalize_strict.
+    """
+    if text.isascii():
+        t = _rstrip_ascii_space_only(text)
+        if "\r" in t:
+            t = t.replace("\r\n", "\n").replace("\r", "\n")
+        if "\n" in t:
+            t = _NEWLINES_WITH_ASCII_SPACES_RE.sub(" ", t)
+        return t.lower()
+    return normalize_strict(text)
+
+
+def _both_uncached(text: str) -> Tuple[str, str]:
+    strict = _strict_uncached(text)
+    return strict, _WHITESPACE_RUN_RE.sub(" ", strict)
+
+
+_both_cached = lru_cache(maxsize=NORMALIZE_CACHE_SIZE)(_both_uncached)
+
+# Forms loaded from persisted references (prime_normalize_cache), checked first.
+_primed: dict[str, Tuple[str, str]] = {}
+
+
+def normalize_both(text: str | None) -> Tuple[str, str]:
+    """Return (normalize_strict(text), normalize_soft(text)) in one pass, memoized.
+
+    Soft is derived from the already computed strict form instead of re-running
+    strict. Results are bit-identical to the individual functions.
+    """
+    if text is None:
+        return "", ""
+    primed = _primed.get(text)
+    if primed is not None:
+        return primed
+    if len(text) > _MAX_CACHED_LEN:
+        return _both_uncached(text)
+    return _both_cached(text)
+
+
+def normalize_strict_cached(text: str | None) -> str:
+    """Memoized drop-in for normalize_strict."""
+    return normalize_both(text)[0]
+
+
+def normalize_soft_cached(text: str | None) -> str:
+    """Memoized drop-in for normalize_soft."""
+    return normalize_both(text)[1]
+
+
+def normalize_batch(
+    texts: Iterable[str | None],
+    mode: str = "strict",
+) -> Union[List[str], List[Tuple[str, str]]]:
+    """Normalize many texts at once.
+
+    mode:
+      - "strict": list of normalize_strict results
+      - "soft":   list of normalize_soft results
+      - "both":   list of (strict, soft) tuples
+
+    Repeated inputs (common: the same candidate section for many images) are
+    served from the memo cache.
+    """
+    if mode == "both":
+        return [normalize_both(t) for t in texts]
+    if mode == "strict":
+        return [normalize_both(t)[0] for t in texts]
+    if mode == "soft":
+        return [normalize_both(t)[1] for t in texts]
+    raise ValueError(f"Unknown normalization mode: {mode!r}")
+
+
+def prime_normalize_cache(items: Iterable[Tuple[str, str, str]]) -> None:
+    """Seed the memo with precomputed (text, strict, soft) triples.
+
+    Only feed forms produced under the current NORMALIZATION_VERSION. The
+    primed table is bounded like the LRU and simply starts over when full.
+    """
+    for text, strict, soft in items:
+        if len(_primed) >= NORMALIZE_CACHE_SIZE:
+            _primed.clear()
+        _primed[text] = (strict, soft)
+
+
+def normalize_cache_clear() -> None:
+    _both_cached.cache_clear()
+    _primed.clear()
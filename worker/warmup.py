@@ -0,0 +1,138 @@
+"""
+Worker warm-up: pay one-time costs before the first job arrives.
+
+The first job after a scale-up used to import python-docx/lxml, build the
+Vision client (channel + credentials) and the Firestore/Storage clients,
+and run the matcher cold. `run_warmup()` does all of that on a tiny embedded
+DOCX and reports how long each step took.
+
+It runs from the worker's startup hook (WORKER_WARMUP=1, default) and via
+`GET /warmup`, which Cloud Run can use as a startup probe.
+"""
+
+from __future__ import annotations
+
+import io
+import os
+import threading
+import time
+import zipfile
+from typing import Any, Callable, Dict, Optional
+
+# Minimal WordprocessingML package: a header + text paragraph and a one-cell
+# table, so both the paragraph and the table extraction paths get exercised.
+_CONTENT_TYPES_XML = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/word/document.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+    '</Types>'
+)
+_RELS_XML = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="word/document.xml"/>'
+    '</Relationships>'
+)
+_DOCUMENT_XML = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"><w:body>'
+    '<w:p><w:r><w:t>1) BANNER</w:t></w:r></w:p>'
+    '<w:p><w:r><w:t>Buy now – limited “offer”</w:t></w:r></w:p>'
+    '<w:p/>'
+    '<w:tbl><w:tr><w:tc><w:p><w:r><w:t>2) EMAIL</w:t></w:r></w:p></w:tc>'
+    '<w:tc><w:p><w:r><w:t>Subscribe to %displayname% news</w:t></w:r></w:p></w:tc></w:tr></w:tbl>'
+    '</w:body></w:document>'
+)
+
+WARMUP_OCR_TEXT = "Buy now - limited \"offer\""
+
+
+def tiny_docx() -> bytes:
+    bio = io.BytesIO()
+    with zipfile.ZipFile(bio, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("[Content_Types].xml", _CONTENT_TYPES_XML)
+        zf.writestr("_rels/.rels", _RELS_XML)
+        zf.writestr("word/document.xml", _DOCUMENT_XML)
+    return bio.getvalue()
+
+
+def _warm_matching() -> None:
+    from shared.docx_section_extractor import extract_section_candidates
+    from shared.reference_matcher import select_best_section
+    from worker.normalization import normalize_soft_cached, normalize_strict_cached
+
+    candidates = extract_section_candidates(tiny_docx(), "warmup_(en).docx", "en")
+    if not candidates:
+        raise RuntimeError("warm-up DOCX produced no candidates")
+    select_best_section(
+        ocr_text=WARMUP_OCR_TEXT,
+        candidates=candidates,
+        normalize_strict_fn=normalize_strict_cached,
+        normalize_soft_fn=normalize_soft_cached,
+    )
+
+
+def _warm_ocr() -> None:
+    from shared.ocr_backends import get_ocr_backend
+
+    get_ocr_backend().warmup()
+
+
+def _warm_cloud_clients() -> None:
+    from shared.cloud_clients import get_firestore, get_storage
+
+    get_firestore()
+    get_storage()
+
+
+# (name, step, required): a failing required step means the instance can't serve jobs
+WARMUP_STEPS = [
+    ("matching", _warm_matching, True),
+    ("ocr_client", _warm_ocr, False),
+    ("cloud_clients", _warm_cloud_clients, False),
+]
+
+
+def run_warmup(steps=None) -> Dict[str, Any]:
+    """Run warm-up steps; never raises, failures are reported per step."""
+    report: Dict[str, Any] = {"ok": True, "steps": {}}
+    started = time.perf_counter()
+    for name, step, required in steps or WARMUP_STEPS:
+        t0 = time.perf_counter()
+        entry: Dict[str, Any] = {}
+        try:
+            step()
+            entry["ok"] = True
+        except Exception as e:
+            entry["ok"] = False
+            entry["error"] = f"{type(e).__name__}: {e}"
+            if required:
+                report["ok"] = False
+        entry["ms"] = round((time.perf_counter() - t0) * 1000, 2)
+        report["steps"][name] = entry
+    report["total_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    return report
+
+
+def warmup_enabled() -> bool:
+    return os.environ.get("WORKER_WARMUP", "1") not in ("0", "false", "False", "")
+
+
+class WarmupState:
+    """Runs warm-up at most once per process and remembers the report."""
+
+    def __init__(self, runner: Callable[[], Dict[str, Any]] = run_warmup):
+        self._runner = runner
+        self._lock = threading.Lock()
+        self.report: Optional[Dict[str, Any]] = None
+
+    def ensure(self) -> Dict[str, Any]:
+        with self._lock:
+            if self.report is None or not self.report["ok"]:
+                self.report = self._runner()
+            return self.report
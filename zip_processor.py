@@ -4,9 +4,152 @@ import os
 import shutil
 from pathlib import Path
 from typing import List, Tuple, Union, Optional, Dict
-from docx import Document
 import io
 import re
+import struct
+
+from shared.tracing import traced
+
+_MiB = 1024 * 1024
+
+# End-of-central-directory (APPNOTE 4.3.16) и его ZIP64-варианты (4.3.14, 4.3.15)
+_EOCD = struct.Struct("<4s4H2LH")
+_EOCD_SIGNATURE = b"PK\x05\x06"
+_ZIP64_LOCATOR = struct.Struct("<4sLQL")
+_ZIP64_LOCATOR_SIGNATURE = b"PK\x06\x07"
+_ZIP64_EOCD = struct.Struct("<4sQ2H2L4Q")
+_ZIP64_EOCD_SIGNATURE = b"PK\x06\x06"
+
+
+class ArchiveLimitError(ValueError):
+    """
+    The archive (or a DOCX inside it) exceeds a resource limit.
+
+    `reason` is one of: entries, uncompressed_bytes, compression_ratio, docx_xml_bytes.
+    """
+
+    def __init__(self, reason: str, message: str):
+        super().__init__(message)
+        self.reason = reason
+
+
+class ArchiveLimits:
+    """
+    Resource limits for uploaded archives, checked before and while inflating:
+
+      - max_entries: entry count from the end-of-central-directory record,
+        checked before the central directory is parsed (also applied to DOCX files)
+      - max_uncompressed_bytes: total of extracted members; declared sizes are
+        checked up front, actual bytes are counted while streaming
+      - max_ratio: per-member uncompressed/compressed ratio, once a member has
+        inflated more than ratio_floor_bytes (small text files compress well)
+      - max_docx_xml_bytes: XML parts of one DOCX, from declared sizes (zipfile
+        never inflates a member beyond its declared size)
+
+    Env: ZIP_MAX_ENTRIES (20000), ZIP_MAX_UNCOMPRESSED_BYTES (2 GiB),
+    ZIP_MAX_RATIO (100), DOCX_MAX_XML_BYTES (64 MiB).
+    """
+
+    def __init__(
+        self,
+        max_entries: Optional[int] = None,
+        max_uncompressed_bytes: Optional[int] = None,
+        max_ratio: Optional[float] = None,
+        max_docx_xml_bytes: Optional[int] = None,
+        ratio_floor_bytes: int = _MiB,
+    ):
+        env = os.environ
+        self.max_entries = int(env.get("ZIP_MAX_ENTRIES", "20000")) if max_entries is None else max_entries
+        self.max_uncompressed_bytes = (
+            int(env.get("ZIP_MAX_UNCOMPRESSED_BYTES", str(2048 * _MiB)))
+            if max_uncompressed_bytes is None else max_uncompressed_bytes
+        )
+        self.max_ratio = float(env.get("ZIP_MAX_RATIO", "100")) if max_ratio is None else max_ratio
+        self.max_docx_xml_bytes = (
+            int(env.get("DOCX_MAX_XML_BYTES", str(64 * _MiB))) if max_docx_xml_bytes is None else max_docx_xml_bytes
+        )
+        self.ratio_floor_bytes = ratio_floor_bytes
+
+
+def _zip_entry_count(fileobj) -> Optional[int]:
+    """Total entries from the end-of-central-directory record, or None if there is none."""
+    fileobj.seek(0, os.SEEK_END)
+    size = fileobj.tell()
+    # EOCD — последние 22 байта, за ним может идти комментарий до 64 KiB
+    tail_start = max(0, size - _EOCD.size - 0xFFFF)
+    fileobj.seek(tail_start)
+    tail = fileobj.read()
+    pos = tail.rfind(_EOCD_SIGNATURE)
+    if pos < 0 or pos + _EOCD.size > len(tail):
+        return None
+    entries = _EOCD.unpack_from(tail, pos)[4]
+
+    # ZIP64: locator стоит прямо перед EOCD, запись ZIP64 EOCD — прямо перед locator'ом
+    eocd_offset = tail_start + pos
+    zip64_offset = eocd_offset - _ZIP64_LOCATOR.size - _ZIP64_EOCD.size
+    if zip64_offset >= 0:
+        fileobj.seek(zip64_offset)
+        block = fileobj.read(_ZIP64_EOCD.size + _ZIP64_LOCATOR.size)
+        locator = _ZIP64_LOCATOR.unpack_from(block, _ZIP64_EOCD.size)
+        record = _ZIP64_EOCD.unpack_from(block)
+        if locator[0] == _ZIP64_LOCATOR_SIGNATURE and record[0] == _ZIP64_EOCD_SIGNATURE:
+            entries = record[7]
+    return entries
+
+
+def _check_entry_count(fileobj, limits: ArchiveLimits, what: str) -> None:
+    # Число записей из end-of-central-directory: infolist() на миллионе записей сам по себе съест память
+    entries = _zip_entry_count(fileobj)
+    if entries is None:
+        return  # не ZIP — ZipFile сам выдаст BadZipFile
+    if entries > limits.max_entries:
+        raise ArchiveLimitError("entries", f"{what} has {entries} entries, limit is {limits.max_entries}")
+
+
+def check_docx_limits(docx_bytes: bytes, name: str, limits: Optional[ArchiveLimits] = None) -> None:
+    """Reject a DOCX whose entry count or XML size exceeds the limits, without inflating it."""
+    limits = limits or ArchiveLimits()
+    buf = io.BytesIO(docx_bytes)
+    _check_entry_count(buf, limits, name)
+    try:
+        with zipfile.ZipFile(buf) as zf:
+            xml_bytes = sum(i.file_size for i in zf.infolist() if i.filename.lower().endswith((".xml", ".rels")))
+    except zipfile.BadZipFile:
+        return  # битый DOCX разбирается (и падает) как раньше
+    if xml_bytes > limits.max_docx_xml_bytes:
+        raise ArchiveLimitError(
+            "docx_xml_bytes", f"{name}: {xml_bytes} bytes of XML, limit is {limits.max_docx_xml_bytes}"
+        )
+
+
+class _InflateBudget:
+    """Counts inflated bytes per member and per archive against ArchiveLimits."""
+
+    def __init__(self, limits: ArchiveLimits):
+        self.limits = limits
+        self.total = 0
+
+    def copy(self, zf: zipfile.ZipFile, info: zipfile.ZipInfo, write) -> None:
+        limits = self.limits
+        member = 0
+        with zf.open(info) as src:
+            while True:
+                chunk = src.read(_MiB)
+                if not chunk:
+                    break
+                member += len(chunk)
+                self.total += len(chunk)
+                if self.total > limits.max_uncompressed_bytes:
+                    raise ArchiveLimitError(
+                        "uncompressed_bytes",
+                        f"Archive inflates to more than {limits.max_uncompressed_bytes} bytes (at {info.filename})",
+                    )
+                if member > limits.ratio_floor_bytes and member / max(info.compress_size, 1) > limits.max_ratio:
+                    raise ArchiveLimitError(
+                        "compression_ratio",
+                        f"{info.filename}: compression ratio above {limits.max_ratio:g}:1",
+                    )
+                write(chunk)
 
 
 # Language code: en, ru, he, pt-PT, zh-Hans, es-419, etc.
@@ -51,11 +194,13 @@ def _extract_language_from_filename(filename: str) -> Optional[str]:
     return _extract_language_from_stem(Path(filename).stem)
 
 
+@traced("unzip")
 def parse_zip_streaming(
     zip_path: str,
     *,
     return_work_dir: bool = False,
     return_extended: bool = False,
+    limits: Optional[ArchiveLimits] = None,
 ) -> Union[
     List[Tuple[str, str, str]],
     List[Tuple[str, str, str, Optional[bytes], str]],
@@ -73,14 +218,22 @@ def parse_zip_streaming(
       - return_extended=True returns ref_bytes (original .docx bytes if available, else None)
         and language code extracted from reference filename if possible.
       - return_work_dir works the same: if True, returns (matches, work_dir).
+
+    Raises ArchiveLimitError when the archive exceeds `limits` (ArchiveLimits
+    from env by default); extraction stops at the first violation.
     """
+    limits = limits or ArchiveLimits()
     work_dir = tempfile.mkdtemp(prefix="ocr_zip_")
 
     images: Dict[str, str] = {}
     texts: Dict[str, bytes] = {}  # path -> bytes
 
     try:
+        with open(zip_path, "rb") as f:
+            _check_entry_count(f, limits, "Archive")
+
         with zipfile.ZipFile(zip_path) as zf:
+            members = []  # (info, kind)
             for info in zf.infolist():
                 name = info.filename
 
@@ -90,17 +243,35 @@ def parse_zip_streaming(
                 name_lower = name.lower()
 
                 if name.startswith("images/") and name_lower.endswith((".png", ".jpg", ".jpeg", ".webp")):
+                    members.append((info, "image"))
+                if name.startswith("texts/") and name_lower.endswith((".txt", ".docx")):
+                    members.append((info, "text"))
+
+            # Заявленные размеры проверяем до распаковки, фактические — по ходу (_InflateBudget)
+            declared = sum(info.file_size for info, _ in members)
+            if declared > limits.max_uncompressed_bytes:
+                raise ArchiveLimitError(
+                    "uncompressed_bytes",
+                    f"Archive declares {declared} uncompressed bytes, limit is {limits.max_uncompressed_bytes}",
+                )
+
+            budget = _InflateBudget(limits)
+            for info, kind in members:
+                name = info.filename
+                if kind == "image":
                     base_name = os.path.basename(name)
                     tmp_img_path = os.path.join(work_dir, base_name)
 
-                    with zf.open(info) as src, open(tmp_img_path, "wb") as dst:
-                        shutil.copyfileobj(src, dst, length=1024 * 1024)
+                    with open(tmp_img_path, "wb") as dst:
+                        budget.copy(zf, info, dst.write)
 
                     images[name] = tmp_img_path
-
-                if name.startswith("texts/") and name_lower.endswith((".txt", ".docx")):
-                    with zf.open(info) as src:
-                        texts[name] = src.read()
+                else:
+                    buf = io.BytesIO()
+                    budget.copy(zf, info, buf.write)
+                    texts[name] = buf.getvalue()
+                    if name.lower().endswith(".docx"):
+                        check_docx_limits(texts[name], name, limits)
 
         # Build index of reference files by detected language (if any)
         texts_by_lang: Dict[str, List[str]] = {}
@@ -173,6 +344,7 @@ def parse_zip_streaming(
         raise
 
 
+@traced("reference_text")
 def extract_text(file_bytes: bytes, ext: str) -> str:
     ext = ext.lower()
 
@@ -180,6 +352,9 @@ def extract_text(file_bytes: bytes, ext: str) -> str:
         return file_bytes.decode("utf-8", errors="ignore").strip()
 
     if ext == ".docx":
+        # python-docx/lxml импортируем лениво: это заметная часть холодного старта
+        from docx import Document
+
         doc = Document(io.BytesIO(file_bytes))
         return "\n".join(p.text.strip() for p in doc.paragraphs if p.text.strip())
 